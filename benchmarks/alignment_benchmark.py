@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Measures the throughput of the face alignment model (CoordinateAlignmentModel) for the offline processing.
+
+The face boxes are detected once up front so only the landmark prediction is measured. The first row uses
+`get_landmarks()` for every frame (like the EyeTracker does), all other rows use `get_landmarks_batch()` with the given
+batch sizes. The max. landmark difference to the single-frame results is reported as well to make sure the batches
+don't change the results.
+
+The second table compares the preprocessing of a single face (warp and copy into the bound input array) with the
+preallocated staging buffers against the previous version with the `mx.nd.array()` round-trip. Besides the latency the
+peak memory allocated per call is measured with tracemalloc; note that tracemalloc only sees the numpy allocations, the
+memory mxnet allocates for `mx.nd.array()` comes on top for the previous version.
+
+Usage (from the repository root):
+    python -m benchmarks.alignment_benchmark --frames path/to/frames --batch_sizes 1 4 8 16
+"""
+
+import argparse
+import pathlib
+import time
+import tracemalloc
+import cv2
+import mxnet as mx
+import numpy as np
+from benchmarks.benchmark_utils import load_frames, latency_summary, print_table, time_calls
+from benchmarks.quantization_report import detect_biggest_face, get_landmarks
+from post_processing_service.face_alignment import CoordinateAlignmentModel
+from tracking_service.face_detector import MxnetDetectionModel
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def run_single(face_alignment, frames, bboxes):
+    landmarks, durations = [], []
+    start_time = time.perf_counter()
+    for frame, bbox in zip(frames, bboxes):
+        frame_start = time.perf_counter()
+        landmarks.append(get_landmarks(face_alignment, frame, bbox))
+        durations.append(time.perf_counter() - frame_start)
+    return landmarks, durations, len(frames) / (time.perf_counter() - start_time)
+
+
+def run_batched(face_alignment, frames, bboxes, batch_size):
+    landmarks, durations = [], []
+    start_time = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        batch_start = time.perf_counter()
+        landmarks.extend(face_alignment.get_landmarks_batch(frames[i:i + batch_size], bboxes[i:i + batch_size]))
+        durations.append(time.perf_counter() - batch_start)
+    return landmarks, durations, len(frames) / (time.perf_counter() - start_time)
+
+
+def legacy_preprocess(face_alignment, image, bbox):
+    # the preprocessing before the staging buffers were introduced
+    M = face_alignment._get_transform(bbox)
+    cropped = cv2.warpAffine(image, M, face_alignment.input_shape, borderValue=0.0)
+    inp = mx.nd.array(cropped[..., ::-1].transpose(2, 0, 1)[None, ...])
+    face_alignment.exec_group.data_arrays[0][0][1][:] = inp.astype(np.float32)
+
+
+def staged_preprocess(face_alignment, image, bbox):
+    inp, _ = face_alignment._preprocess(image, bbox)
+    face_alignment.exec_group.data_arrays[0][0][1][:] = inp
+
+
+def measure_allocations(function, arguments):
+    """
+    Returns the peak memory (in KiB) that numpy / python allocate during every single call.
+    """
+    peaks = []
+    tracemalloc.start()
+    for args in arguments:
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - current_before) / 1024)
+    tracemalloc.stop()
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the face alignment throughput for several batch sizes.")
+    parser.add_argument("-f", "--frames", help="folder with the stored frames", type=str, required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=500)
+    parser.add_argument("-b", "--batch_sizes", help="batch sizes to test", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, .6, gpu=-1)
+    face_alignment = CoordinateAlignmentModel(f"{weights_path / '2d106det'}", 0, gpu=-1)
+
+    frames, bboxes = [], []
+    for frame in load_frames(args.frames, args.num_frames):
+        bbox = detect_biggest_face(face_detector, frame)
+        if bbox is not None:
+            frames.append(frame)
+            bboxes.append(bbox)
+    print(f"{len(frames)} frames with a face")
+
+    run_single(face_alignment, frames[:10], bboxes[:10])  # warm up
+    reference_landmarks, durations, fps = run_single(face_alignment, frames, bboxes)
+    rows = [{"mode": "get_landmarks", "batch_size": 1, "fps": fps, "max_diff_px": 0.0,
+             **latency_summary(durations)}]
+
+    for batch_size in args.batch_sizes:
+        run_batched(face_alignment, frames[:2 * batch_size], bboxes[:2 * batch_size], batch_size)  # warm up
+        landmarks, durations, fps = run_batched(face_alignment, frames, bboxes, batch_size)
+        max_difference = max(np.abs(reference - result).max()
+                             for reference, result in zip(reference_landmarks, landmarks))
+        rows.append({"mode": "get_landmarks_batch", "batch_size": batch_size, "fps": fps,
+                     "max_diff_px": max_difference, **latency_summary(durations)})
+
+    # the latencies are per call, i.e. per batch for the batched mode
+    print_table(rows, ["mode", "batch_size", "fps", "max_diff_px", "mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+
+    face_alignment._set_batch_size(1)
+    arguments = [(face_alignment, frame, bbox) for frame, bbox in zip(frames, bboxes)]
+    rows = []
+    for mode, function in [("mx.nd.array round-trip", legacy_preprocess), ("staging buffers", staged_preprocess)]:
+        _, durations = time_calls(function, arguments)
+        peaks = measure_allocations(function, arguments)
+        rows.append({"preprocessing": mode, **latency_summary(durations), "mean_peak_kib": np.mean(peaks)})
+
+    print()
+    print_table(rows, ["preprocessing", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "mean_peak_kib"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Small helpers shared by the benchmark scripts in this folder. All benchmarks are meant to be started from the
+repository root, e.g. `python -m benchmarks.quantization_report --frames path/to/frames`.
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def list_frame_paths(frame_folder, max_frames=None):
+    """
+    Returns the (sorted) paths of all images in the given folder. The images that were recorded during the study
+    contain the timestamp in their name, so sorting them by name keeps them in their recording order.
+    """
+    frame_paths = sorted(os.path.join(frame_folder, name) for name in os.listdir(frame_folder)
+                         if name.lower().endswith(IMAGE_EXTENSIONS))
+    if max_frames is not None:
+        frame_paths = frame_paths[:max_frames]
+    if len(frame_paths) == 0:
+        raise FileNotFoundError(f"No frames found in {frame_folder}!")
+    return frame_paths
+
+
+def load_frames(frame_folder, max_frames=None):
+    """
+    Reads the stored frame corpus into memory so the disk access isn't part of the measured time.
+    """
+    return [cv2.imread(path) for path in list_frame_paths(frame_folder, max_frames)]
+
+
+def latency_summary(latencies):
+    """
+    Takes a list of durations in seconds and returns the mean and some percentiles in milliseconds.
+    """
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000
+    if latencies_ms.size == 0:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0}
+
+    return {"mean_ms": latencies_ms.mean(),
+            "p50_ms": np.percentile(latencies_ms, 50),
+            "p90_ms": np.percentile(latencies_ms, 90),
+            "p99_ms": np.percentile(latencies_ms, 99),
+            }
+
+
+def time_calls(function, arguments, warmup=3):
+    """
+    Calls the given function once for every entry in arguments (which are unpacked) and returns the results and the
+    duration of every single call. The first `warmup` calls are executed but not measured.
+    """
+    for args in arguments[:warmup]:
+        function(*args)
+
+    results, durations = [], []
+    for args in arguments:
+        start_time = time.perf_counter()
+        results.append(function(*args))
+        durations.append(time.perf_counter() - start_time)
+    return results, durations
+
+
+def print_table(rows, columns):
+    """
+    Prints a list of dicts as a simple text table with the given columns.
+    """
+    widths = [max(len(column), *(len(format_value(row.get(column))) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(format_value(row.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.3f}"
+    return str(value)
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the offline blink detection over the landmarks of a whole difficulty with the per-frame BlinkDetector (EAR of
+both eyes with `eye_aspect_ratio()` and `detect_blinks()` for every frame) and times a sweep over diff_threshold, for
+which the offline version only has to calculate the eye aspect ratios once.
+
+The landmarks are taken from a landmark cache file of the EyeTracker if one is given, otherwise synthetic landmarks with
+some blinks are used.
+
+Usage (from the repository root):
+    python -m benchmarks.blink_detection_benchmark --landmark_cache path/to/landmark_cache/hard.npz --fps 14.7
+"""
+
+import argparse
+import pathlib
+import time
+import numpy as np
+from benchmarks.benchmark_utils import print_table
+from post_processing.eye_tracking.image_utils import EYE_BOUND, eye_aspect_ratio
+from post_processing.eye_tracking.landmark_cache import LandmarkCache
+from post_processing_service.blink_detector import BlinkDetector
+from post_processing_service.offline_blink_detector import get_eye_aspect_ratios, get_blink_metrics
+
+
+def create_landmarks(num_frames, fps, seed=0):
+    """
+    Random landmarks around the same face; the vertical eye landmarks are moved to the eye center for a few frames
+    about every 5 seconds to simulate blinks.
+    """
+    random_generator = np.random.default_rng(seed)
+    landmarks = np.tile(random_generator.uniform(100, 400, (1, 106, 2)), (num_frames, 1, 1))
+    landmarks += random_generator.normal(0, 0.3, landmarks.shape)
+    for eye_bound in EYE_BOUND:
+        # the upper and lower eye landmarks are 10 pixels away from the horizontal ones
+        landmarks[:, eye_bound[1:4], 1] = landmarks[:, [eye_bound[0]], 1] - 10
+        landmarks[:, eye_bound[5:8], 1] = landmarks[:, [eye_bound[0]], 1] + 10
+        landmarks[:, eye_bound[4], 1] = landmarks[:, eye_bound[0], 1]
+        landmarks[:, eye_bound[4], 0] = landmarks[:, eye_bound[0], 0] + 30
+
+    for blink_start in range(int(fps), num_frames - 5, int(5 * fps)):
+        for eye_bound in EYE_BOUND:
+            landmarks[blink_start: blink_start + 3, [*eye_bound[1:4], *eye_bound[5:8]], 1] = \
+                landmarks[blink_start: blink_start + 3, [eye_bound[0]], 1]
+    return landmarks
+
+
+def detect_blinks_per_frame(landmarks, fps, diff_threshold):
+    blink_detector = BlinkDetector(show_annotation=False)
+    blink_detector.set_participant_fps(fps)
+    for eye_markers in np.take(landmarks, EYE_BOUND, axis=1):
+        ratio = (eye_aspect_ratio(eye_markers[1]) + eye_aspect_ratio(eye_markers[0])) / 2.0
+        blink_detector.set_current_values(None, eye_markers[1], eye_markers[0], (0, 0), (0, 0),
+                                          eye_aspect_ratio=ratio)
+        blink_detector.detect_blinks(diff_threshold)
+    return blink_detector.get_blink_metrics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the offline against the per-frame blink detection.")
+    parser.add_argument("-l", "--landmark_cache", help="landmark cache file (.npz) of one difficulty", type=str,
+                        default=None)
+    parser.add_argument("-n", "--num_frames", help="number of synthetic frames", type=int, default=20000)
+    parser.add_argument("--fps", help="fps of the recording", type=float, default=14.7)
+    parser.add_argument("-t", "--thresholds", help="diff_threshold values of the sweep", type=float, nargs="+",
+                        default=[0.02, 0.03, 0.04, 0.045, 0.05, 0.06, 0.08])
+    args = parser.parse_args()
+
+    if args.landmark_cache is not None:
+        landmarks = LandmarkCache.load(pathlib.Path(args.landmark_cache)).get_values("landmarks")
+    else:
+        landmarks = create_landmarks(args.num_frames, args.fps)
+
+    rows = []
+    per_frame_duration, offline_duration = 0.0, 0.0
+    start_time = time.perf_counter()
+    eye_aspect_ratios = get_eye_aspect_ratios(landmarks)
+    ratio_duration = time.perf_counter() - start_time
+    for diff_threshold in args.thresholds:
+        start_time = time.perf_counter()
+        per_frame_metrics = detect_blinks_per_frame(landmarks, args.fps, diff_threshold)
+        per_frame_duration += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        offline_metrics = get_blink_metrics(eye_aspect_ratios, args.fps, diff_threshold)
+        offline_duration += time.perf_counter() - start_time
+
+        max_difference = max(abs(per_frame_metrics[name] - offline_metrics[name]) for name in per_frame_metrics)
+        rows.append({"diff_threshold": diff_threshold, "total_blinks": offline_metrics["total_blinks"],
+                     "avg_blink_duration_in_ms": offline_metrics["avg_blink_duration_in_ms"],
+                     "max_metric_difference": max_difference})
+
+    print(f"{len(landmarks)} frames, {len(args.thresholds)} thresholds: per frame {per_frame_duration:.2f} s, offline "
+          f"{ratio_duration + offline_duration:.3f} s (eye aspect ratios {ratio_duration * 1000:.1f} ms), speedup: "
+          f"{per_frame_duration / (ratio_duration + offline_duration):.0f}x")
+    print_table(rows, ["diff_threshold", "total_blinks", "avg_blink_duration_in_ms", "max_metric_difference"])
+
+
+if __name__ == "__main__":
+    main()
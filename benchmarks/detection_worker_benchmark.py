@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the face detection in the tracking thread (in-process) with the detection in a separate process that gets
+the frames via shared memory (see tracking_service/detection_worker.py).
+
+To simulate the other work of the tracking system (gui, png encoding, 7z compression and the upload) some python
+threads that hold the GIL most of the time can be started in the main process with `--gil_threads`.
+
+Usage (from the repository root):
+    python -m benchmarks.detection_worker_benchmark --frames path/to/frames --gil_threads 0 2
+"""
+
+import argparse
+import pathlib
+import threading
+import time
+from benchmarks.benchmark_utils import load_frames, latency_summary, print_table
+from tracking.tracking_utils import find_face_mxnet_resized
+from tracking_service.detection_worker import DetectionWorker
+from tracking_service.face_detector import MxnetDetectionModel
+
+model_path = pathlib.Path(__file__).parent.parent / "weights" / "16and32"
+
+
+def hold_gil(stop_event):
+    while not stop_event.is_set():
+        x = 0
+        for i in range(10000):
+            x += i * i
+
+
+def run_in_process(frames, scale):
+    face_detector = MxnetDetectionModel(f"{model_path}", 0, scale, gpu=-1)
+    for frame in frames[:5]:
+        find_face_mxnet_resized(face_detector, frame, show_result=False)  # warm up
+
+    latencies, faces = [], 0
+    start_time = time.perf_counter()
+    for frame in frames:
+        frame_start = time.perf_counter()
+        faces += find_face_mxnet_resized(face_detector, frame, show_result=False) is not None
+        latencies.append(time.perf_counter() - frame_start)
+
+    return latencies, len(frames) / (time.perf_counter() - start_time), faces, 0
+
+
+def run_worker_process(frames, scale, num_slots):
+    worker = DetectionWorker(model_path, frames[0].shape, scale=scale, num_slots=num_slots)
+    worker.start()
+
+    latencies = []
+
+    def collect(faces):
+        for submit_time, _ in faces:
+            latencies.append(time.perf_counter() - submit_time)
+
+    start_time = time.perf_counter()
+    for frame in frames:
+        # submit every frame; if all slots are busy wait for the next result (the capture would simply go on and drop
+        # the frame in the tracking system, but here the throughput should be measured)
+        while not worker.submit(frame, time.perf_counter()):
+            collect(worker.get_faces(timeout=1))
+        collect(worker.get_faces())
+    collect(worker.stop())
+    throughput = len(frames) / (time.perf_counter() - start_time)
+
+    # only frames with a face return a result, so the latency can be measured only for these
+    return latencies, throughput, len(latencies), worker.dropped_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the in-process face detection with the detection "
+                                                 "process.")
+    parser.add_argument("-f", "--frames", help="folder with the stored frames (all frames need the same size)",
+                        type=str, required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=500)
+    parser.add_argument("-s", "--scale", help="scale of the face detector", type=float, default=.6)
+    parser.add_argument("--slots", help="number of ring buffer slots", type=int, default=4)
+    parser.add_argument("--gil_threads", help="numbers of GIL holding threads to test", type=int, nargs="+",
+                        default=[0, 2])
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.num_frames)
+    rows = []
+    for gil_threads in args.gil_threads:
+        for mode in ["in-process", "worker process"]:
+            stop_event = threading.Event()
+            threads = [threading.Thread(target=hold_gil, args=(stop_event,), daemon=True) for _ in range(gil_threads)]
+            for thread in threads:
+                thread.start()
+
+            if mode == "in-process":
+                latencies, throughput, faces, dropped_frames = run_in_process(frames, args.scale)
+            else:
+                latencies, throughput, faces, dropped_frames = run_worker_process(frames, args.scale, args.slots)
+
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+            rows.append({"mode": mode, "gil_threads": gil_threads, "fps": throughput, "faces": faces,
+                         "full_buffer_waits": dropped_frames, **latency_summary(latencies)})
+
+    print_table(rows, ["mode", "gil_threads", "fps", "faces", "full_buffer_waits", "mean_ms", "p50_ms", "p90_ms",
+                       "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Sweeps the input scale of the face detector (the `scale` parameter of the MxnetDetectionModel) and the additional
+pre-resize of the frame (like the 0.5 in `find_face_mxnet_resized()` of the tracker) over a stored frame corpus.
+
+For every combination the following is reported:
+- the effective scale, i.e. the size of the detector input relative to the original frame
+- the latency percentiles of the whole detection (pre-resize included)
+- the detection rate, i.e. the fraction of frames with at least one face
+- the box jitter: the mean movement of the box center and the mean change of the box width between consecutive frames
+  in pixels of the original frame (the corpus should show a mostly still face, like the study recordings)
+- the mean IoU with the boxes of the combination with the highest effective scale, which serves as the reference
+
+Usage (from the repository root):
+    python -m benchmarks.detector_scale_benchmark --frames path/to/frames --scales 0.4 0.6 1.0 --resize 1.0 0.5
+"""
+
+import argparse
+import itertools
+import pathlib
+import cv2
+import numpy as np
+from benchmarks.benchmark_utils import load_frames, latency_summary, time_calls, print_table
+from benchmarks.quantization_report import box_iou
+from tracking_service.face_detector import MxnetDetectionModel
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def detect_face(face_detector, frame, resize_factor):
+    """
+    Returns the most confident face box in the coordinates of the original frame or None if no face was found.
+    """
+    if resize_factor != 1.0:
+        frame = cv2.resize(frame, (0, 0), fx=resize_factor, fy=resize_factor, interpolation=cv2.INTER_AREA)
+
+    face_box = face_detector.find_biggest_box(np.array(list(face_detector.detect(frame))))
+    if face_box is None:
+        return None
+    return face_box[:4] / resize_factor
+
+
+def box_jitter(boxes):
+    """
+    Returns the mean movement of the box center and the mean absolute change of the box width between consecutive
+    frames; frame pairs where one of the frames has no face are skipped.
+    """
+    center_movements, width_changes = [], []
+    for previous_box, box in zip(boxes, boxes[1:]):
+        if previous_box is None or box is None:
+            continue
+        previous_center = (previous_box[:2] + previous_box[2:4]) / 2
+        center = (box[:2] + box[2:4]) / 2
+        center_movements.append(np.linalg.norm(center - previous_center))
+        width_changes.append(abs((box[2] - box[0]) - (previous_box[2] - previous_box[0])))
+
+    if len(center_movements) == 0:
+        return None, None
+    return np.mean(center_movements), np.mean(width_changes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks speed and detection quality of the face detector for "
+                                                 "several scale and pre-resize combinations.")
+    parser.add_argument("-f", "--frames", help="folder with the stored frames", type=str, required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=500)
+    parser.add_argument("-s", "--scales", help="detector scales to test", type=float, nargs="+",
+                        default=[0.4, 0.6, 0.8, 1.0])
+    parser.add_argument("-r", "--resize", help="pre-resize factors to test (1.0 means no pre-resize)", type=float,
+                        nargs="+", default=[1.0, 0.5])
+    parser.add_argument("-t", "--threshold", help="confidence threshold of the face detector", type=float, default=0.6)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.num_frames)
+    frame_height, frame_width = frames[0].shape[:2]
+
+    results = []
+    for scale, resize_factor in itertools.product(args.scales, args.resize):
+        input_shape = (round(frame_height * resize_factor), round(frame_width * resize_factor))
+        face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, scale, gpu=-1, thd=args.threshold,
+                                            input_shapes=[input_shape])
+        boxes, durations = time_calls(lambda frame: detect_face(face_detector, frame, resize_factor),
+                                      [(frame,) for frame in frames])
+        results.append((scale, resize_factor, boxes, durations))
+
+    # the combination with the biggest detector input should be the most accurate one
+    _, _, reference_boxes, _ = max(results, key=lambda result: result[0] * result[1])
+
+    rows = []
+    for scale, resize_factor, boxes, durations in results:
+        center_jitter, width_jitter = box_jitter(boxes)
+        ious = [box_iou(reference, box) for reference, box in zip(reference_boxes, boxes)
+                if reference is not None and box is not None]
+        rows.append({"scale": scale, "resize": resize_factor, "effective_scale": scale * resize_factor,
+                     **latency_summary(durations),
+                     "detection_rate": sum(box is not None for box in boxes) / len(boxes),
+                     "center_jitter_px": center_jitter, "width_jitter_px": width_jitter,
+                     "iou_to_reference": np.mean(ious) if len(ious) > 0 else None})
+
+    rows.sort(key=lambda row: row["effective_scale"])
+    print(f"{len(frames)} frames with {frame_width}x{frame_height} pixels")
+    print_table(rows, ["scale", "resize", "effective_scale", "mean_ms", "p50_ms", "p90_ms", "p99_ms",
+                       "detection_rate", "center_jitter_px", "width_jitter_px", "iou_to_reference"])
+
+
+if __name__ == "__main__":
+    main()
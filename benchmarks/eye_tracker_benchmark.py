@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Per-frame timing breakdown of the EyeTracker stages with and without the production mode.
+
+The frames are processed like the frames of an evaluation participant (so no eye region images are kept in memory);
+the log folder that is created for this is removed again at the end. Nothing is saved to disk.
+
+Usage (from the repository root):
+    python -m benchmarks.eye_tracker_benchmark --frames path/to/frames --fps 30
+"""
+
+import argparse
+import os
+import shutil
+import time
+from benchmarks.benchmark_utils import load_frames, print_table
+from post_processing.eye_tracking.eye_tracker import EyeTracker
+from post_processing.post_processing_constants import evaluation_download_folder
+from tracking.FpsMeasuring import StageTimer
+
+BENCHMARK_PARTICIPANT = "eye_tracker_benchmark"
+
+
+def run_eye_tracker(frames, fps, production_mode, skip_closed_eyes):
+    stage_timer = StageTimer()
+    eye_tracker = EyeTracker(production_mode=production_mode, skip_closed_eyes=skip_closed_eyes,
+                             stage_timer=stage_timer)
+    eye_tracker.set_current_participant(BENCHMARK_PARTICIPANT, fps, is_evaluation_data=True)
+    eye_tracker.set_current_difficulty("benchmark")
+
+    for frame in frames[:5]:
+        eye_tracker.process_current_frame(frame, BENCHMARK_PARTICIPANT, "benchmark", 0)  # warm up
+    stage_timer.reset()
+
+    start_time = time.perf_counter()
+    for i, frame in enumerate(frames):
+        eye_tracker.process_current_frame(frame, BENCHMARK_PARTICIPANT, "benchmark", i)
+    duration = time.perf_counter() - start_time
+
+    return stage_timer.get_summary(num_frames=len(frames)), len(frames) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the EyeTracker stages with and without production mode.")
+    parser.add_argument("-f", "--frames", help="folder with consecutive frames of one recording", type=str,
+                        required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=300)
+    parser.add_argument("--fps", help="recording fps of the frames (for the blink detection)", type=float, default=30)
+    parser.add_argument("-s", "--skip_closed_eyes", help="skip the eye stages for closed eyes in both modes",
+                        action="store_true")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.num_frames)
+    log_folder = os.path.join(evaluation_download_folder, BENCHMARK_PARTICIPANT)
+    remove_log_folder = not os.path.exists(log_folder)
+
+    try:
+        summary_before, fps_before = run_eye_tracker(frames, args.fps, False, args.skip_closed_eyes)
+        summary_after, fps_after = run_eye_tracker(frames, args.fps, True, args.skip_closed_eyes)
+    finally:
+        if remove_log_folder and os.path.exists(log_folder):
+            shutil.rmtree(log_folder)
+
+    rows = []
+    for stage in dict.fromkeys([*summary_before, *summary_after]):
+        before = summary_before.get(stage, {}).get("ms_per_frame", 0.0)
+        after = summary_after.get(stage, {}).get("ms_per_frame", 0.0)
+        rows.append({"stage": stage, "before_ms": before, "production_ms": after, "saved_ms": before - after})
+    rows.append({"stage": "total", "before_ms": sum(row["before_ms"] for row in rows),
+                 "production_ms": sum(row["production_ms"] for row in rows),
+                 "saved_ms": sum(row["saved_ms"] for row in rows)})
+
+    print(f"fps before: {fps_before:.2f}, fps with production mode: {fps_after:.2f}")
+    print_table(rows, ["stage", "before_ms", "production_ms", "saved_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the chunked numeric buffer of the GazeMovementTracker with the previous version that appended every frame to
+the DataFrame (which copies the whole DataFrame for every frame).
+
+The eye data is synthetic; the time is measured for adding all frames of one difficulty and creating the DataFrame
+that is written to the csv file (nothing is saved to disk). The previous version is only measured up to
+--max_append_frames frames as it gets quadratically slower.
+
+Usage (from the repository root):
+    python -m benchmarks.gaze_movement_benchmark --frames 5000 20000 100000
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.benchmark_utils import print_table
+from post_processing_service.gaze_movement_tracker import GazeMovementTracker, EYE_MOVEMENT_COLUMNS
+
+
+def create_eye_data(num_frames, seed=0):
+    random_generator = np.random.default_rng(seed)
+    positions = random_generator.normal(300, 20, (num_frames, 4, 2)).tolist()
+    sizes = random_generator.normal(30, 5, (num_frames, 4)).tolist()
+    return [(*map(tuple, frame_positions), *frame_sizes, "benchmark", "participant_1", str(1637000000000 + 33 * i))
+            for i, (frame_positions, frame_sizes) in enumerate(zip(positions, sizes))]
+
+
+def append_data_frames(eye_data):
+    """
+    The previous version of `GazeMovementTracker.save_eye_data_to_data_frame()` (DataFrame.append was removed in
+    pandas 2, the concatenation is what it did internally).
+    """
+    movement_df = pd.DataFrame(columns=EYE_MOVEMENT_COLUMNS)
+    for left_pupil, right_pupil, left_eye, right_eye, left_x, left_y, right_x, right_y, difficulty, participant, \
+            timestamp in eye_data:
+        row = {'participant': participant, 'difficulty': difficulty, 'left_pupil_position': left_pupil,
+               'right_pupil_position': right_pupil, 'left_eye_position': left_eye, 'right_eye_position': right_eye,
+               'left_eye_size_x': left_x, 'right_eye_size_x': right_x, 'left_eye_size_y': left_y,
+               'right_eye_size_y': right_y, 'time_stamp': timestamp}
+        if hasattr(movement_df, "append"):
+            movement_df = movement_df.append(row, ignore_index=True)
+        else:
+            movement_df = pd.concat([movement_df, pd.DataFrame([row], columns=EYE_MOVEMENT_COLUMNS)],
+                                    ignore_index=True)
+    return movement_df
+
+
+def fill_buffer(eye_data):
+    movement_tracker = GazeMovementTracker()
+    for frame_data in eye_data:
+        movement_tracker.save_eye_data_to_data_frame(*frame_data)
+    return movement_tracker.get_data_frame()
+
+
+def measure(function, eye_data):
+    start_time = time.perf_counter()
+    result = function(eye_data)
+    return result, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the eye movement data collection per difficulty.")
+    parser.add_argument("-f", "--frames", help="numbers of frames per difficulty", type=int, nargs="+",
+                        default=[5000, 20000, 100000])
+    parser.add_argument("--max_append_frames", help="max. number of frames for the previous version", type=int,
+                        default=20000)
+    args = parser.parse_args()
+
+    rows = []
+    for num_frames in args.frames:
+        eye_data = create_eye_data(num_frames)
+        buffer_df, buffer_duration = measure(fill_buffer, eye_data)
+        row = {"frames": num_frames, "buffer_s": buffer_duration,
+               "buffer_us_per_frame": buffer_duration / num_frames * 1e6}
+
+        if num_frames <= args.max_append_frames:
+            append_df, append_duration = measure(append_data_frames, eye_data)
+            row.update({"append_s": append_duration, "append_us_per_frame": append_duration / num_frames * 1e6,
+                        "speedup": append_duration / buffer_duration,
+                        "same_csv": append_df.to_csv(index=False) == buffer_df.to_csv(index=False)})
+        rows.append(row)
+
+    print_table(rows, ["frames", "append_s", "buffer_s", "append_us_per_frame", "buffer_us_per_frame", "speedup",
+                       "same_csv"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares `HeadPoseEstimator.get_head_pose()` (solvePnP from the predefined pose plus the reprojection of the head pose
+box) with the pose-only `get_euler_angle()` (solvePnP warm-started from the last pose, no reprojection).
+
+The landmarks are synthetic: the 3d object points of the model are projected with a slowly changing head pose (like
+in a video of a participant) and some pixel noise is added. This way no models are needed and the true euler angles
+are known.
+
+Usage (from the repository root):
+    python -m benchmarks.head_pose_benchmark --num_frames 2000
+"""
+
+import argparse
+import pathlib
+import cv2
+import numpy as np
+from benchmarks.benchmark_utils import latency_summary, time_calls, print_table
+from post_processing_service.head_pose import HeadPoseEstimator
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def create_landmark_sequence(head_pose_estimator, num_frames, frame_size, noise, seed=0):
+    """
+    Returns 68 projected landmarks per frame for a head that slowly turns and moves around the predefined pose.
+    """
+    random_generator = np.random.default_rng(seed)
+    width, height = frame_size
+    camera_matrix = np.array([[width, 0, width / 2.0], [0, width, height / 2.0], [0, 0, 1]])
+
+    time_steps = np.arange(num_frames)
+    rotation_offsets = np.stack([0.15 * np.sin(time_steps / 40), 0.25 * np.sin(time_steps / 70),
+                                 0.1 * np.sin(time_steps / 55)], axis=1)
+    translation_offsets = np.stack([30 * np.sin(time_steps / 90), 20 * np.sin(time_steps / 60),
+                                    150 * np.sin(time_steps / 120)], axis=1)
+
+    landmark_sequence = []
+    for rotation_offset, translation_offset in zip(rotation_offsets, translation_offsets):
+        r_vec = np.asarray(head_pose_estimator.r_vec, dtype=np.float64) + rotation_offset
+        t_vec = np.asarray(head_pose_estimator.t_vec, dtype=np.float64) + translation_offset
+        image_points, _ = cv2.projectPoints(head_pose_estimator.object_pts, r_vec, t_vec, camera_matrix, None)
+        landmark_sequence.append(image_points.reshape(-1, 2) + random_generator.normal(0, noise, (68, 2)))
+    return landmark_sequence
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the head pose estimation with and without warm start.")
+    parser.add_argument("-n", "--num_frames", help="number of synthetic frames", type=int, default=2000)
+    parser.add_argument("--noise", help="std. deviation of the landmark noise in pixels", type=float, default=0.5)
+    parser.add_argument("--width", help="frame width", type=int, default=640)
+    parser.add_argument("--height", help="frame height", type=int, default=480)
+    args = parser.parse_args()
+
+    head_pose_estimator = HeadPoseEstimator(f"{weights_path / 'object_points.npy'}")
+    head_pose_estimator.set_camera_matrix(args.width, args.height)
+    landmark_sequence = create_landmark_sequence(head_pose_estimator, args.num_frames, (args.width, args.height),
+                                                 args.noise)
+    arguments = [(landmarks,) for landmarks in landmark_sequence]
+
+    def set_camera_matrix_and_get_head_pose(landmarks):
+        # the previous version of the EyeTracker created the camera matrix again for every frame
+        head_pose_estimator.cam_matrix = np.array([[args.width, 0, args.width / 2.0],
+                                                   [0, args.width, args.height / 2.0], [0, 0, 1]])
+        return head_pose_estimator.get_head_pose(landmarks)[1]
+
+    reference_angles, reference_durations = time_calls(set_camera_matrix_and_get_head_pose, arguments)
+
+    def set_camera_matrix_and_get_euler_angle(landmarks):
+        head_pose_estimator.set_camera_matrix(args.width, args.height)
+        return head_pose_estimator.get_euler_angle(landmarks)
+
+    head_pose_estimator.reset_pose()
+    time_calls(set_camera_matrix_and_get_euler_angle, arguments[:3], warmup=0)  # warm up
+    head_pose_estimator.reset_pose()
+    angles, durations = time_calls(set_camera_matrix_and_get_euler_angle, arguments, warmup=0)
+
+    angle_differences = np.abs(np.array(reference_angles) - np.array(angles)).reshape(len(angles), -1)
+    rows = [{"mode": "get_head_pose", **latency_summary(reference_durations), "max_angle_diff": 0.0},
+            {"mode": "get_euler_angle", **latency_summary(durations), "max_angle_diff": angle_differences.max()}]
+    print_table(rows, ["mode", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_angle_diff"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Measures the import time and the memory (RSS) of the packages that can provide the tflite interpreter for the iris
+model, and of the iris module itself (which picks the lightest installed one, see `iris_localization.py`).
+
+Every import runs in a fresh python process so nothing is cached from a previous import; packages that aren't
+installed are skipped.
+
+Usage (from the repository root):
+    python -m benchmarks.import_benchmark --repeats 3
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import numpy as np
+from benchmarks.benchmark_utils import print_table
+
+IMPORTS = {
+    "tensorflow": "import tensorflow as tf; tf.lite.Interpreter",
+    "tflite_runtime": "import tflite_runtime.interpreter",
+    "ai_edge_litert": "import ai_edge_litert.interpreter",
+    "iris_localization": "import post_processing_service.iris_localization",
+}
+
+MEASURE_SCRIPT = """
+import json, time, psutil
+rss_before = psutil.Process().memory_info().rss
+start_time = time.perf_counter()
+{statement}
+duration = time.perf_counter() - start_time
+print(json.dumps({{"seconds": duration, "rss_mib": psutil.Process().memory_info().rss / 2 ** 20,
+                  "added_rss_mib": (psutil.Process().memory_info().rss - rss_before) / 2 ** 20}}))
+"""
+
+
+def measure_import(statement):
+    result = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT.format(statement=statement)], capture_output=True,
+                            text=True)
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares import time and memory of the tflite interpreter packages.")
+    parser.add_argument("-r", "--repeats", help="number of measurements per package", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for name, statement in IMPORTS.items():
+        measurements = [measure_import(statement) for _ in range(args.repeats)]
+        if any(measurement is None for measurement in measurements):
+            rows.append({"import": name, "mean_s": "not installed"})
+            continue
+
+        row = {"import": name}
+        for key, column in [("seconds", "mean_s"), ("rss_mib", "rss_mib"), ("added_rss_mib", "added_rss_mib")]:
+            row[column] = np.mean([measurement[key] for measurement in measurements])
+        if name == "iris_localization":
+            backend = subprocess.run([sys.executable, "-c", "import post_processing_service.iris_localization as il; "
+                                                            "print(il.INTERPRETER_PACKAGE)"],
+                                     capture_output=True, text=True)
+            row["import"] = f"{name} ({backend.stdout.strip()})"
+        rows.append(row)
+
+    print_table(rows, ["import", "mean_s", "rss_mib", "added_rss_mib"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the latency of the iris localization for both eyes with two single-eye calls (`get_mesh()`, the previous
+version of `EyeTracker.__find_pupils()`) and with one batched call (`get_meshes()`) for several thread counts with and
+without the XNNPACK delegate.
+
+The eye widths and centers are calculated from the landmarks of the stored frames in the same way as in the EyeTracker,
+so the face detection and alignment only run once up front and aren't part of the measurement.
+
+Usage (from the repository root):
+    python -m benchmarks.iris_benchmark --frames path/to/frames --threads 1 2 4
+"""
+
+import argparse
+import itertools
+import pathlib
+import numpy as np
+from benchmarks.benchmark_utils import load_frames, latency_summary, time_calls, print_table
+from benchmarks.quantization_report import detect_biggest_face, get_landmarks, get_eye_centers
+from post_processing_service.face_alignment import CoordinateAlignmentModel
+from post_processing_service.iris_localization import IrisLocalizationModel
+from tracking_service.face_detector import MxnetDetectionModel
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def get_eye_inputs(frames):
+    face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, .6, gpu=-1)
+    face_alignment = CoordinateAlignmentModel(f"{weights_path / '2d106det'}", 0, gpu=-1)
+
+    eye_inputs = []
+    for frame in frames:
+        bbox = detect_biggest_face(face_detector, frame)
+        if bbox is None:
+            continue
+        landmarks = get_landmarks(face_alignment, frame, bbox)
+        eye_centers = get_eye_centers(landmarks, face_alignment.eye_bound)[[1, 0]]
+        eye_lengths = (landmarks[[39, 93]] - landmarks[[35, 89]])[:, 0]
+        eye_inputs.append((frame, (eye_lengths[1], eye_lengths[0]), (eye_centers[0], eye_centers[1])))
+    return eye_inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the single-eye and the batched iris localization.")
+    parser.add_argument("-f", "--frames", help="folder with the stored frames", type=str, required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=500)
+    parser.add_argument("-t", "--threads", help="thread counts to test; 0 lets tflite decide", type=int, nargs="+",
+                        default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    eye_inputs = get_eye_inputs(load_frames(args.frames, args.num_frames))
+    print(f"{len(eye_inputs)} frames with a face")
+
+    rows = []
+    for threads, use_xnnpack in itertools.product(args.threads, [True, False]):
+        iris_locator = IrisLocalizationModel(f"{weights_path / 'iris_landmark.tflite'}",
+                                             num_threads=threads if threads > 0 else None, use_xnnpack=use_xnnpack)
+
+        def get_both_meshes(frame, lengths, centers):
+            return [iris_locator.get_mesh(frame, length, center) for length, center in zip(lengths, centers)]
+
+        single_results, single_durations = time_calls(get_both_meshes, eye_inputs)
+        batch_results, batch_durations = time_calls(iris_locator.get_meshes, eye_inputs)
+        max_difference = max(np.abs(np.array(single) - np.array(batched)).max()
+                             for single, batched in zip(single_results, batch_results))
+
+        for mode, durations in [("2x get_mesh", single_durations), ("get_meshes", batch_durations)]:
+            rows.append({"mode": mode, "threads": threads if threads > 0 else "auto", "xnnpack": use_xnnpack,
+                         **latency_summary(durations), "max_diff_px": max_difference})
+
+    print_table(rows, ["mode", "threads", "xnnpack", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_diff_px"])
+
+
+if __name__ == "__main__":
+    main()
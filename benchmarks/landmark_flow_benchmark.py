@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the landmarks propagated with optical flow (LandmarkFlowTracker, the `landmark_flow` option of the
+EyeTracker) with the landmarks of the full model (face detection and alignment on every frame) on a stored frame
+corpus. The frames have to be consecutive frames of one recording.
+
+For every keyframe interval the fraction of frames that skipped the model inference, the throughput and the landmark
+error against the full model are reported. The error is measured like in the quantization report: the NME is the mean
+landmark distance normalized by the inter-ocular distance, the drift is the distance between the eye centers.
+
+Usage (from the repository root):
+    python -m benchmarks.landmark_flow_benchmark --frames path/to/frames --intervals 5 10 20
+"""
+
+import argparse
+import pathlib
+import time
+import cv2
+import numpy as np
+from benchmarks.benchmark_utils import load_frames, print_table
+from benchmarks.quantization_report import detect_biggest_face, landmark_errors
+from post_processing_service.face_alignment import CoordinateAlignmentModel
+from post_processing_service.landmark_flow_tracker import LandmarkFlowTracker
+from tracking_service.face_detector import MxnetDetectionModel
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def predict_landmarks(face_detector, face_alignment, frame):
+    bbox = detect_biggest_face(face_detector, frame)
+    if bbox is None:
+        return None
+    return next(face_alignment.get_landmarks(frame, [bbox], calibrate=True)).copy()
+
+
+def flow_landmarks(face_detector, face_alignment, flow_tracker, frame):
+    # the same steps as in `EyeTracker.process_current_frame()`
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    propagated_landmarks = flow_tracker.propagate(gray_frame)
+    if propagated_landmarks is not None:
+        return face_alignment._calibrate(propagated_landmarks, .8).copy()
+
+    flow_tracker.reset()
+    landmarks = predict_landmarks(face_detector, face_alignment, frame)
+    if landmarks is not None:
+        flow_tracker.set_keyframe(gray_frame, landmarks)
+    return landmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the optical flow landmark propagation with the full model.")
+    parser.add_argument("-f", "--frames", help="folder with consecutive frames of one recording", type=str,
+                        required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=1000)
+    parser.add_argument("-i", "--intervals", help="keyframe intervals to test", type=int, nargs="+",
+                        default=[5, 10, 20])
+    parser.add_argument("--max_flow_error", help="max. flow error of the flow tracker", type=float, default=8.0)
+    parser.add_argument("--max_motion", help="max. median landmark motion in pixels of the flow tracker", type=float,
+                        default=1.5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.num_frames)
+    face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, .6, gpu=-1)
+    face_alignment = CoordinateAlignmentModel(f"{weights_path / '2d106det'}", 0, gpu=-1)
+    eye_bound = face_alignment.eye_bound
+
+    start_time = time.perf_counter()
+    reference_landmarks = [predict_landmarks(face_detector, face_alignment, frame) for frame in frames]
+    rows = [{"mode": "full model", "fps": len(frames) / (time.perf_counter() - start_time), "skip_fraction": 0.0,
+             "mean_nme": 0.0, "p90_nme": 0.0, "max_nme": 0.0, "mean_drift_px": 0.0}]
+
+    for interval in args.intervals:
+        face_alignment.pre_landmarks = None  # start with a new calibration state like the reference
+        flow_tracker = LandmarkFlowTracker(interval, args.max_flow_error, args.max_motion)
+
+        start_time = time.perf_counter()
+        landmarks = [flow_landmarks(face_detector, face_alignment, flow_tracker, frame) for frame in frames]
+        fps = len(frames) / (time.perf_counter() - start_time)
+
+        errors = [landmark_errors(reference, result, eye_bound) for reference, result in zip(reference_landmarks,
+                                                                                            landmarks)
+                  if reference is not None and result is not None]
+        nmes = np.array([nme for nme, _ in errors])
+        drifts = np.concatenate([drift for _, drift in errors])
+        rows.append({"mode": f"flow (interval {interval})", "fps": fps, "skip_fraction": flow_tracker.skip_fraction,
+                     "mean_nme": nmes.mean(), "p90_nme": np.percentile(nmes, 90), "max_nme": nmes.max(),
+                     "mean_drift_px": drifts.mean()})
+
+    print_table(rows, ["mode", "fps", "skip_fraction", "mean_nme", "p90_nme", "max_nme", "mean_drift_px"])
+
+
+if __name__ == "__main__":
+    main()
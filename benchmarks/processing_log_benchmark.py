@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Compares the load time of the typed processing log (npz) with the processing log csv file that has to be parsed.
+
+Both files are written for synthetic rows with the same value types as the ones the EyeTracker logs (tuples, numpy
+arrays and missing values for closed eyes) into a temporary folder that is removed again at the end.
+
+Usage (from the repository root):
+    python -m benchmarks.processing_log_benchmark --num_rows 20000
+"""
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+import numpy as np
+from benchmarks.benchmark_utils import latency_summary, print_table
+from post_processing.eye_tracking.ProcessingLogger import ProcessingLogger, ProcessingData, load_processing_log, \
+    parse_processing_log_csv
+
+BENCHMARK_DIFFICULTY = "benchmark"
+
+
+class BenchmarkLogger(ProcessingLogger):
+    def __init__(self, participant_folder):
+        super().__init__()
+        self.__participant_folder = participant_folder
+
+    def get_participant_folder(self):
+        return self.__participant_folder
+
+
+def write_processing_log(participant_folder, num_rows, seed=0):
+    random_generator = np.random.default_rng(seed)
+    logger = BenchmarkLogger(participant_folder)
+    logger.set_participant("benchmark", evaluation_study_data=True)
+    logger.set_difficulty(BENCHMARK_DIFFICULTY)
+
+    for i in range(num_rows):
+        eyes_closed = random_generator.random() < 0.05
+        roll, pitch, yaw = random_generator.normal(0, 10, 3)
+        eye_centers = random_generator.normal(300, 20, (2, 2))
+        pupils = None if eyes_closed else random_generator.integers(250, 350, (2, 2))
+        logger.log_frame_data(frame_id=str(1637000000000 + 33 * i), data={
+            ProcessingData.HEAD_POS_ROLL_PITCH_YAW.name: (roll, pitch, yaw),
+            ProcessingData.LEFT_EYE_CENTER.name: eye_centers[0],
+            ProcessingData.RIGHT_EYE_CENTER.name: eye_centers[1],
+            ProcessingData.LEFT_EYE_WIDTH.name: random_generator.normal(40, 2),
+            ProcessingData.RIGHT_EYE_WIDTH.name: random_generator.normal(40, 2),
+            ProcessingData.LEFT_EYE_HEIGHT.name: random_generator.normal(12, 2),
+            ProcessingData.RIGHT_EYE_HEIGHT.name: random_generator.normal(12, 2),
+            ProcessingData.LEFT_PUPIL_POS.name: None if pupils is None else pupils[0],
+            ProcessingData.RIGHT_PUPIL_POS.name: None if pupils is None else pupils[1],
+            ProcessingData.LEFT_PUPIL_DIAMETER.name: None if eyes_closed else int(random_generator.integers(3, 9)),
+            ProcessingData.RIGHT_PUPIL_DIAMETER.name: None if eyes_closed else int(random_generator.integers(3, 9)),
+            ProcessingData.EYES_CLOSED.name: eyes_closed,
+        })
+    logger.save_tracking_data()
+
+
+def time_loads(load_function, argument, repeats):
+    durations, result = [], None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = load_function(argument)
+        durations.append(time.perf_counter() - start_time)
+    return result, durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the load time of the typed and the csv processing log.")
+    parser.add_argument("-n", "--num_rows", help="number of logged frames", type=int, default=20000)
+    parser.add_argument("-r", "--repeats", help="number of loads per format", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        write_processing_log(pathlib.Path(temp_folder), args.num_rows)
+        difficulty_folder = pathlib.Path(temp_folder) / "post_processing_data" / BENCHMARK_DIFFICULTY
+        csv_path = difficulty_folder / f"processing_log_{BENCHMARK_DIFFICULTY}.csv"
+        npz_path = difficulty_folder / f"processing_log_{BENCHMARK_DIFFICULTY}.npz"
+
+        csv_df, csv_durations = time_loads(parse_processing_log_csv, csv_path, args.repeats)
+        typed_df, typed_durations = time_loads(load_processing_log, difficulty_folder, args.repeats)
+        sizes = {"csv": os.path.getsize(csv_path), "npz": os.path.getsize(npz_path)}
+
+    value_columns = [column for column in typed_df.columns if column not in ("date", "frame_id")]
+    max_difference = np.nanmax(np.abs(csv_df[value_columns].to_numpy(np.float64) -
+                                      typed_df[value_columns].to_numpy(np.float64)))
+    rows = [{"format": "csv (parsed)", **latency_summary(csv_durations), "size_mb": sizes["csv"] / 1e6},
+            {"format": "npz (typed)", **latency_summary(typed_durations), "size_mb": sizes["npz"] / 1e6}]
+    print(f"{args.num_rows} rows, speedup: {np.mean(csv_durations) / np.mean(typed_durations):.1f}x, max. value "
+          f"difference: {max_difference:.2e}")
+    print_table(rows, ["format", "mean_ms", "p50_ms", "p90_ms", "size_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Accuracy regression report for the int8 models created with `weights/quantize_models.py`.
+
+The quantized face detector and face alignment model are compared with the float models on a stored frame corpus:
+- box IoU between the most confident float and int8 face boxes (and the number of frames where only one finds a face)
+- landmark NME, i.e. the mean landmark distance normalized by the inter-ocular distance of the float landmarks
+- eye center drift in pixels (the eye centers are calculated the same way as in the EyeTracker)
+
+The landmarks are compared twice: once with the same (float) face box for both alignment models to see the error of
+the quantized alignment model alone and once end-to-end with the int8 detector box for the int8 alignment model.
+
+Usage (from the repository root):
+    python -m benchmarks.quantization_report --frames path/to/frames
+"""
+
+import argparse
+import pathlib
+import numpy as np
+from benchmarks.benchmark_utils import load_frames, latency_summary, time_calls, print_table
+from post_processing_service.face_alignment import CoordinateAlignmentModel
+from tracking_service.face_detector import MxnetDetectionModel
+
+weights_path = pathlib.Path(__file__).parent.parent / "weights"
+
+
+def box_iou(box_a, box_b):
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return intersection / (area_a + area_b - intersection)
+
+
+def get_eye_centers(landmarks, eye_bound):
+    return np.average(np.take(landmarks, eye_bound, axis=0), axis=1)
+
+
+def landmark_errors(reference_landmarks, landmarks, eye_bound):
+    """
+    Returns the normalized mean error (NME) of the landmarks and the drift of both eye centers in pixels.
+    """
+    reference_eye_centers = get_eye_centers(reference_landmarks, eye_bound)
+    inter_ocular_distance = np.linalg.norm(reference_eye_centers[0] - reference_eye_centers[1])
+
+    nme = np.mean(np.linalg.norm(reference_landmarks - landmarks, axis=1)) / inter_ocular_distance
+    eye_center_drift = np.linalg.norm(reference_eye_centers - get_eye_centers(landmarks, eye_bound), axis=1)
+    return nme, eye_center_drift
+
+
+def detect_biggest_face(face_detector, frame):
+    return face_detector.find_biggest_box(np.array(list(face_detector.detect(frame))))
+
+
+def get_landmarks(face_alignment, frame, bbox):
+    return next(face_alignment.get_landmarks(frame, [bbox], calibrate=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the int8 models with the float models.")
+    parser.add_argument("-f", "--frames", help="folder with the stored frames", type=str, required=True)
+    parser.add_argument("-n", "--num_frames", help="max. number of frames", type=int, default=1000)
+    parser.add_argument("-s", "--scale", help="scale of the face detector", type=float, default=.6)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.num_frames)
+    detector_prefix, alignment_prefix = f"{weights_path / '16and32'}", f"{weights_path / '2d106det'}"
+
+    float_detector = MxnetDetectionModel(detector_prefix, 0, args.scale, gpu=-1)
+    int8_detector = MxnetDetectionModel(detector_prefix, 0, args.scale, gpu=-1, quantized=True)
+    float_alignment = CoordinateAlignmentModel(alignment_prefix, 0, gpu=-1)
+    int8_alignment = CoordinateAlignmentModel(alignment_prefix, 0, gpu=-1, quantized=True)
+    eye_bound = float_alignment.eye_bound
+
+    float_boxes, float_times = time_calls(lambda f: detect_biggest_face(float_detector, f), [(f,) for f in frames])
+    int8_boxes, int8_times = time_calls(lambda f: detect_biggest_face(int8_detector, f), [(f,) for f in frames])
+
+    ious, missed_faces, additional_faces = [], 0, 0
+    alignment_nme, alignment_drift, end_to_end_nme, end_to_end_drift = [], [], [], []
+    float_alignment_times, int8_alignment_times = [], []
+
+    for frame, float_box, int8_box in zip(frames, float_boxes, int8_boxes):
+        if float_box is None:
+            additional_faces += int8_box is not None
+            continue
+        if int8_box is None:
+            missed_faces += 1
+            continue
+        ious.append(box_iou(float_box, int8_box))
+
+        [reference_landmarks], [duration] = time_calls(get_landmarks, [(float_alignment, frame, float_box)], warmup=0)
+        float_alignment_times.append(duration)
+        [int8_landmarks], [duration] = time_calls(get_landmarks, [(int8_alignment, frame, float_box)], warmup=0)
+        int8_alignment_times.append(duration)
+
+        nme, drift = landmark_errors(reference_landmarks, int8_landmarks, eye_bound)
+        alignment_nme.append(nme)
+        alignment_drift.extend(drift)
+
+        nme, drift = landmark_errors(reference_landmarks, get_landmarks(int8_alignment, frame, int8_box), eye_bound)
+        end_to_end_nme.append(nme)
+        end_to_end_drift.extend(drift)
+
+    print(f"\n[INFO] Compared {len(frames)} frames; faces in both: {len(ious)}, missed by int8: {missed_faces}, "
+          f"only found by int8: {additional_faces}\n")
+
+    accuracy_rows = [
+        {"metric": "box IoU", "mean": np.mean(ious), "median": np.median(ious), "min": np.min(ious)},
+        {"metric": "landmark NME (same box)", "mean": np.mean(alignment_nme), "median": np.median(alignment_nme),
+         "max": np.max(alignment_nme)},
+        {"metric": "eye center drift px (same box)", "mean": np.mean(alignment_drift),
+         "median": np.median(alignment_drift), "max": np.max(alignment_drift)},
+        {"metric": "landmark NME (end-to-end)", "mean": np.mean(end_to_end_nme), "median": np.median(end_to_end_nme),
+         "max": np.max(end_to_end_nme)},
+        {"metric": "eye center drift px (end-to-end)", "mean": np.mean(end_to_end_drift),
+         "median": np.median(end_to_end_drift), "max": np.max(end_to_end_drift)},
+    ]
+    print_table(accuracy_rows, ["metric", "mean", "median", "min", "max"])
+
+    print()
+    latency_rows = [
+        {"model": "detector float32", **latency_summary(float_times)},
+        {"model": "detector int8", **latency_summary(int8_times)},
+        {"model": "alignment float32", **latency_summary(float_alignment_times)},
+        {"model": "alignment int8", **latency_summary(int8_alignment_times)},
+    ]
+    print_table(latency_rows, ["model", "mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Measures how the resource governor settings of the tracker trade tracker fps for game fps.
+
+The game is replaced by a few cpu-burning processes that each count how many fixed-size chunks of work ("frames") they
+get done per second. For every governor setting the face detector runs in its own process (so the thread limits can be
+applied before mxnet is imported) next to the burning processes and both frame rates are measured. The first row
+always shows the game fps without any tracking running at the same time.
+
+Usage (from the repository root):
+    python -m benchmarks.resource_governor_benchmark --threads 0 1 2 --cores "" "2,3" --lower_priority
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import pathlib
+import time
+import numpy as np
+from benchmarks.benchmark_utils import print_table, load_frames
+from tracking.ResourceGovernor import ResourceGovernor
+
+
+def burn_cpu(frame_counter, stop_event, work_per_frame=20000):
+    # pure python work so every process uses exactly one core, like the main loop of a game
+    while not stop_event.is_set():
+        x = 0
+        for i in range(work_per_frame):
+            x += i * i
+        with frame_counter.get_lock():
+            frame_counter.value += 1
+
+
+def run_tracker(governor_settings, frame_folder, scale, ready_event, stop_event, result_queue):
+    governor = ResourceGovernor(*governor_settings)
+    governor.apply()
+    # import mxnet only after the thread limits have been set
+    from tracking.tracking_utils import find_face_mxnet_resized
+    from tracking_service.face_detector import MxnetDetectionModel
+
+    weights_path = pathlib.Path(__file__).parent.parent / "weights"
+    face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, scale, gpu=-1)
+
+    if frame_folder is not None:
+        frames = load_frames(frame_folder, max_frames=200)
+    else:
+        frames = [np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(20)]
+
+    for frame in frames[:5]:
+        find_face_mxnet_resized(face_detector, frame, show_result=False)  # warm up
+
+    ready_event.set()
+    frame_count = 0
+    start_time = time.perf_counter()
+    for frame in itertools.cycle(frames):
+        if stop_event.is_set():
+            break
+        find_face_mxnet_resized(face_detector, frame, show_result=False)
+        frame_count += 1
+
+    result_queue.put(frame_count / (time.perf_counter() - start_time))
+
+
+def measure(context, governor_settings, args):
+    frame_counter = context.Value("l", 0)
+    game_stop_event, tracker_stop_event = context.Event(), context.Event()
+    ready_event, result_queue = context.Event(), context.Queue()
+
+    tracker = None
+    if governor_settings is not None:
+        tracker = context.Process(target=run_tracker, args=(governor_settings, args.frames, args.scale, ready_event,
+                                                            tracker_stop_event, result_queue))
+        tracker.start()
+        ready_event.wait()  # don't measure the model loading
+
+    game_processes = [context.Process(target=burn_cpu, args=(frame_counter, game_stop_event))
+                      for _ in range(args.game_processes)]
+    for process in game_processes:
+        process.start()
+
+    time.sleep(args.duration)
+    with frame_counter.get_lock():
+        game_frames = frame_counter.value
+    game_stop_event.set()
+    tracker_stop_event.set()
+
+    tracker_fps = result_queue.get() if tracker is not None else 0.0
+    for process in game_processes + ([tracker] if tracker is not None else []):
+        process.join()
+
+    return game_frames / args.duration, tracker_fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the tracker and 'game' fps for several resource "
+                                                 "governor settings.")
+    parser.add_argument("-f", "--frames", help="folder with frames for the detector (random frames if not set)",
+                        type=str, default=None)
+    parser.add_argument("-t", "--threads", help="inference thread limits to test; 0 means no limit", type=int,
+                        nargs="+", default=[0, 1, 2])
+    parser.add_argument("-c", "--cores", help="comma separated core lists to test; an empty string means all cores",
+                        type=str, nargs="+", default=[""])
+    parser.add_argument("-l", "--lower_priority", help="test with and without lower process priority",
+                        action="store_true")
+    parser.add_argument("-g", "--game_processes", help="number of cpu burning processes that simulate the game",
+                        type=int, default=2)
+    parser.add_argument("-d", "--duration", help="measuring duration per setting in seconds", type=float, default=10)
+    parser.add_argument("-s", "--scale", help="scale of the face detector", type=float, default=.6)
+    args = parser.parse_args()
+
+    # spawn a fresh interpreter for every tracker so mxnet is imported only after the thread limits are set
+    context = multiprocessing.get_context("spawn")
+
+    baseline_game_fps, _ = measure(context, None, args)
+    rows = [{"threads": "-", "cores": "-", "lower_priority": "-", "tracker_fps": "-",
+             "game_fps": baseline_game_fps, "game_fps_loss_%": 0.0}]
+
+    priorities = [False, True] if args.lower_priority else [False]
+    for threads, cores, lower_priority in itertools.product(args.threads, args.cores, priorities):
+        core_list = [int(core) for core in cores.split(",")] if cores else None
+        settings = (threads if threads > 0 else None, core_list, lower_priority)
+
+        game_fps, tracker_fps = measure(context, settings, args)
+        rows.append({"threads": threads if threads > 0 else "all", "cores": cores if cores else "all",
+                     "lower_priority": lower_priority, "tracker_fps": tracker_fps, "game_fps": game_fps,
+                     "game_fps_loss_%": 100 * (1 - game_fps / baseline_game_fps)})
+
+    print_table(rows, ["threads", "cores", "lower_priority", "tracker_fps", "game_fps", "game_fps_loss_%"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,123 @@
 import pandas as pd
 import numpy as np
 import os
-import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PUPIL_MOVEMENT_COLUMNS = ['participant', 'difficulty', 'left_pupil_movement_x', 'left_pupil_movement_y',
+                          'right_pupil_movement_x', 'right_pupil_movement_y', 'average_pupil_movement_x',
+                          'average_pupil_movement_y', 'average_pupil_movement_distance', 'movement_angle',
+                          'strong_movement', 'direction_change', 'time_difference', 'time_stamp']
+POSITION_COLUMNS = ['left_pupil_position', 'right_pupil_position', 'left_eye_position', 'right_eye_position']
+SIZE_COLUMNS = ['left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y', 'right_eye_size_y']
+
+
+def load_eye_movement_data(eye_movement_path):
+    """
+    Returns the columns of an eye movement file of the GazeMovementTracker as dict of numpy arrays; the positions are
+    split into '<position>_x' and '<position>_y'. The npz file next to the csv file is used if there is one, so the
+    position strings don't have to be parsed.
+    """
+    npz_path = eye_movement_path.removesuffix(".csv") + ".npz"
+    if os.path.exists(npz_path):
+        with np.load(npz_path) as eye_movement_file:
+            eye_movement_data = {column: eye_movement_file[column] for column in eye_movement_file.files}
+        num_rows = len(eye_movement_data["time_stamp"])
+        eye_movement_data["participant"] = np.full(num_rows, str(eye_movement_data["participant"]), dtype=object)
+        eye_movement_data["difficulty"] = np.full(num_rows, str(eye_movement_data["difficulty"]), dtype=object)
+        return eye_movement_data
+
+    eye_movement_df = pd.read_csv(eye_movement_path)
+    eye_movement_data = {column: eye_movement_df[column].to_numpy() for column in
+                         ['participant', 'difficulty', 'time_stamp', *SIZE_COLUMNS]}
+    if len(eye_movement_df) == 0:
+        # e.g. a difficulty where no face was found in any frame
+        for column in POSITION_COLUMNS:
+            eye_movement_data[f"{column}_x"] = eye_movement_data[f"{column}_y"] = np.empty(0)
+        return eye_movement_data
+
+    for column in POSITION_COLUMNS:
+        # the positions are written as "(x, y)"
+        positions = eye_movement_df[column].str[1:-1].str.split(", ", expand=True).astype(float).to_numpy()
+        eye_movement_data[f"{column}_x"], eye_movement_data[f"{column}_y"] = positions[:, 0], positions[:, 1]
+    return eye_movement_data
+
+
+def calculate_pupil_movement_data(eye_movement_data):
+    """
+    Calculates the pupil movement between every frame and its previous frame for all frames at once (the first frame
+    has no movement). Returns a DataFrame with the PUPIL_MOVEMENT_COLUMNS.
+    """
+    def get_movement(pupil_position, eye_position, eye_size):
+        # the change of the pupil position relative to the eye position, normalized to the current eye size
+        relative_position = eye_movement_data[pupil_position] - eye_movement_data[eye_position]
+        return (relative_position[:-1] - relative_position[1:]) / eye_movement_data[eye_size][1:]
+
+    left_movement_x = get_movement('left_pupil_position_x', 'left_eye_position_x', 'left_eye_size_x')
+    left_movement_y = get_movement('left_pupil_position_y', 'left_eye_position_y', 'left_eye_size_y')
+    right_movement_x = get_movement('right_pupil_position_x', 'right_eye_position_x', 'right_eye_size_x')
+    right_movement_y = get_movement('right_pupil_position_y', 'right_eye_position_y', 'right_eye_size_y')
+
+    average_movement_x = (right_movement_x + left_movement_x) / 2
+    average_movement_y = (right_movement_y + left_movement_y) / 2
+    average_movement_distance = np.sqrt(average_movement_x ** 2 + average_movement_y ** 2)
+
+    # angle between the average movement and the x axis; 0 if there was no movement
+    with np.errstate(invalid="ignore", divide="ignore"):
+        movement_angle = np.arccos(average_movement_x / average_movement_distance)
+    movement_angle[np.isnan(movement_angle)] = 0
+
+    # Check if it was a strong movement and if the direction changed by more than 90° and less than 270°
+    direction_change = ((movement_angle > 90) & (movement_angle < 270)).astype(int)
+    strong_movement = (average_movement_distance > 0.02).astype(int)
+
+    # Calculate time difference inbetween images (this is outdated, since we "interpolated" images to a time difference
+    # of 100ms)
+    time_stamps = eye_movement_data['time_stamp']
+    time_difference = np.diff(time_stamps.astype(np.int64))
+
+    def with_first_row(values):
+        # For the first row we add empty values into the dataframe
+        return np.concatenate([np.zeros(1, dtype=values.dtype), values])
+
+    return pd.DataFrame({'participant': eye_movement_data['participant'],
+                         'difficulty': eye_movement_data['difficulty'],
+                         'left_pupil_movement_x': with_first_row(left_movement_x),
+                         'left_pupil_movement_y': with_first_row(left_movement_y),
+                         'right_pupil_movement_x': with_first_row(right_movement_x),
+                         'right_pupil_movement_y': with_first_row(right_movement_y),
+                         'average_pupil_movement_x': with_first_row(average_movement_x),
+                         'average_pupil_movement_y': with_first_row(average_movement_y),
+                         'average_pupil_movement_distance': with_first_row(average_movement_distance),
+                         'movement_angle': with_first_row(movement_angle),
+                         'strong_movement': with_first_row(strong_movement),
+                         'direction_change': with_first_row(direction_change),
+                         'time_difference': with_first_row(time_difference),
+                         'time_stamp': time_stamps}, columns=PUPIL_MOVEMENT_COLUMNS)
+
+
+def calculate_file_pupil_movement(eye_movement_path, output_dir_path):
+    """
+    Calculates and saves the pupil movement of one eye movement file. Returns the path of the new file and the number
+    of rows (None if the file doesn't contain any frames).
+    """
+    eye_movement_data = load_eye_movement_data(eye_movement_path)
+    if len(eye_movement_data['time_stamp']) == 0:
+        return None, 0
+
+    pupil_movement_df = calculate_pupil_movement_data(eye_movement_data)
+
+    participant, difficulty = pupil_movement_df['participant'].iloc[-1], pupil_movement_df['difficulty'].iloc[-1]
+    pupil_movement_path = os.path.join(output_dir_path, f"pupil_movement_{participant}_{difficulty}.csv")
+    pupil_movement_df.to_csv(pupil_movement_path)
+    return pupil_movement_path, len(pupil_movement_df)
 
 
 class PupilMovementCalculation:
 
-    def calculate_pupil_movement(self, is_evaluation_data: bool):
+    def calculate_pupil_movement(self, is_evaluation_data: bool, num_workers=None):
+        """
+        Processes the eye movement files in parallel with num_workers processes (all cpu cores if None).
+        """
         if is_evaluation_data:
             input_dir_path = os.path.join(os.path.dirname(__file__), "data", "evaluation_eye_movement_data")
             output_dir_path = os.path.join(os.path.dirname(__file__), "data", "evaluation_pupil_movement_data")
@@ -14,160 +125,26 @@ class PupilMovementCalculation:
             input_dir_path = os.path.join(os.path.dirname(__file__), "data", "eye_movement_data")
             output_dir_path = os.path.join(os.path.dirname(__file__), "data", "pupil_movement_data")
 
-        for filename in os.listdir(input_dir_path):
-            print("\n####################\nStarting pupil movement calculation\n####################\n")
-            print(f"Reading in : {filename}")
-            pupil_movement_df = pd.DataFrame(columns=['participant', 'difficulty', 'left_pupil_movement_x',
-                                                      'left_pupil_movement_y',
-                                                      'right_pupil_movement_x',
-                                                      'right_pupil_movement_y',
-                                                      'average_pupil_movement_x',
-                                                      'average_pupil_movement_y',
-                                                      'average_pupil_movement_distance', 'movement_angle',
-                                                      'strong_movement', 'direction_change', 'time_difference',
-                                                      'time_stamp'])
-
-            eye_movement_df_path = os.path.join(input_dir_path, filename)
-            eye_movement_df = pd.read_csv(eye_movement_df_path, converters={"column_name": eval})
-
-            rowCount = eye_movement_df.shape[0]
-            print(f"length: {rowCount}")
-            last_left_pupil_position = None
-            last_right_pupil_position = None
-            last_left_eye_position = None
-            last_right_eye_position = None
-            last_time_stamp = None
-            first_row = True
-            for index, row in eye_movement_df.iterrows():
-
-                # show progress
-                if index % int(rowCount / 10) == 0:
-                    print(f"Calculating pupil movement done: {index / int(rowCount / 100):.2f} %")
-
-                left_pupil_position = row["left_pupil_position"][1:-1].split(", ")
-
-                right_pupil_position = row["right_pupil_position"][1:-1].split(", ")
-
-                left_eye_position = row["left_eye_position"][1:-1].split(", ")
-
-                right_eye_position = row["right_eye_position"][1:-1].split(", ")
-
-                left_eye_size_x = row["left_eye_size_x"]
-                right_eye_size_x = row["right_eye_size_x"]
-                left_eye_size_y = row["left_eye_size_y"]
-                right_eye_size_y = row["right_eye_size_y"]
-                difficulty = row["difficulty"]
-                participant = row["participant"]
-                timestamp = row["time_stamp"]
-
-                if not first_row:
-                    #   calculate change in pupil position depending on eye position, normalized to eye size
-
-                    x_movement_left_pupil = ((float(last_left_pupil_position[0]) - float(last_left_eye_position[0])) - (
-                            float(left_pupil_position[0]) - float(left_eye_position[0]))) / left_eye_size_x
-                    y_movement_left_pupil = ((float(last_left_pupil_position[1]) - float(last_left_eye_position[1])) - (
-                            float(left_pupil_position[1]) - float(left_eye_position[1]))) / left_eye_size_y
-
-                    left_pupil_movement = (x_movement_left_pupil, y_movement_left_pupil)
-
-                    x_movement_right_pupil = ((float(last_right_pupil_position[0]) - float(
-                        last_right_eye_position[0])) - (float(right_pupil_position[0]) - float(right_eye_position[0]))) / right_eye_size_x
-
-                    y_movement_right_pupil = ((float(last_right_pupil_position[1]) - float(
-                        last_right_eye_position[1])) - (float(right_pupil_position[1]) - float(right_eye_position[1]))) / right_eye_size_y
-
-                    right_pupil_movement = (x_movement_right_pupil, y_movement_right_pupil)
-
-                    average_pupil_movement = [(x_movement_right_pupil + x_movement_left_pupil) / 2,
-                                              (y_movement_right_pupil + y_movement_left_pupil) / 2]
-                    average_pupil_movement_distance = np.sqrt(
-                        average_pupil_movement[0] ** 2 + average_pupil_movement[1] ** 2)
-
-                    # Calculate time difference inbetween images (this is outdated, since we "interpolated"
-                    # images to a time difference of 100ms)
-
-                    time_difference = None
-                    time_difference = int(timestamp) - int(last_time_stamp)
-
-                    # Calculate angle of the eye_movement
-                    standard_vector = (1, 0)
-                    angle = self.__calculate_angle(standard_vector, average_pupil_movement)
-
-                    # Check if it was a strong movement and if the direction changed by more than 90° and less than 270°
-                    direction_change = 0
-                    if 270 > angle > 90:
-                        direction_change = 1
-                    strong_movement = 0
-                    if average_pupil_movement_distance > 0.02:
-                        strong_movement = 1
-
-                    # Write data to dataframe
-                    pupil_movement_df = pupil_movement_df.append({'participant': participant, 'difficulty': difficulty,
-                                                                  'left_pupil_movement_x': left_pupil_movement[0],
-                                                                  'left_pupil_movement_y': left_pupil_movement[1],
-                                                                  'right_pupil_movement_x': right_pupil_movement[0],
-                                                                  'right_pupil_movement_y': right_pupil_movement[1],
-                                                                  'average_pupil_movement_x': average_pupil_movement[0],
-                                                                  'average_pupil_movement_y': average_pupil_movement[1],
-                                                                  'average_pupil_movement_distance': average_pupil_movement_distance,
-                                                                  'movement_angle': angle,
-                                                                  'strong_movement': strong_movement,
-                                                                  'direction_change': direction_change,
-                                                                  'time_difference': time_difference,
-                                                                  'time_stamp': timestamp},
-                                                                 ignore_index=True)
-                # For the first row we add empty values into the dataframe
+        if not os.path.exists(output_dir_path):
+            os.mkdir(output_dir_path)
+
+        print("\n####################\nStarting pupil movement calculation\n####################\n")
+        # the GazeMovementTracker saves every difficulty as csv and as npz file, `load_eye_movement_data()` uses the
+        # npz file if it exists
+        eye_movement_paths = [os.path.join(input_dir_path, filename) for filename in os.listdir(input_dir_path)
+                              if filename.endswith(".csv")]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(calculate_file_pupil_movement, eye_movement_path, output_dir_path):
+                       eye_movement_path for eye_movement_path in eye_movement_paths}
+            for future in as_completed(futures):
+                pupil_movement_path, row_count = future.result()
+                if pupil_movement_path is None:
+                    print(f"[WARNING] No frames in {os.path.basename(futures[future])}!")
                 else:
-                    pupil_movement_df = pupil_movement_df.append({'participant': participant, 'difficulty': difficulty,
-                                                                  'left_pupil_movement_x': 0,
-                                                                  'left_pupil_movement_y': 0,
-                                                                  'right_pupil_movement_x': 0,
-                                                                  'right_pupil_movement_y': 0,
-                                                                  'average_pupil_movement_x': 0,
-                                                                  'average_pupil_movement_y': 0,
-                                                                  'average_pupil_movement_distance': 0,
-                                                                  'movement_angle': 0,
-                                                                  'strong_movement': 0,
-                                                                  'direction_change': 0,
-                                                                  'time_difference': 0,
-                                                                  'time_stamp': timestamp},
-                                                                 ignore_index=True)
-                first_row = False
-                last_left_pupil_position = left_pupil_position
-                last_right_pupil_position = right_pupil_position
-                last_left_eye_position = left_eye_position
-                last_right_eye_position = right_eye_position
-                last_time_stamp = timestamp
-
-            if not os.path.exists(output_dir_path):
-                os.mkdir(output_dir_path)
-
-            pupil_movement_path = os.path.join(output_dir_path, f"pupil_movement_{participant}_{difficulty}.csv")
-            pupil_movement_df.to_csv(pupil_movement_path)
+                    print(f"Calculated the pupil movement for {os.path.basename(futures[future])} ({row_count} rows)")
 
         print("\n####################\nFinished pupil movement calculation!\n####################\n")
 
-    def __calculate_angle(self, p1, p2):
-        # ang1 = np.arctan2(*p1[::-1])
-        # ang2 = np.arctan2(*p2[::-1])
-        # return np.rad2deg((ang1 - ang2) % (2 * np.pi))
-
-        vector_1 = p1
-
-        vector_2 = p2
-
-        unit_vector_1 = vector_1 / np.linalg.norm(vector_1)
-
-        unit_vector_2 = vector_2 / np.linalg.norm(vector_2)
-
-        dot_product = np.dot(unit_vector_1, unit_vector_2)
-
-        angle = np.arccos(dot_product)
-        if not math.isnan(angle):
-            return angle
-        else:
-            return 0
-
     def calculate_frequencies(self, data_array):
         try:
             # highest_quartile_list = sorted((data_array))[int(len(data_array)*0.75):]
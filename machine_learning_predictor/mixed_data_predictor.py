@@ -18,6 +18,7 @@ from machine_learning_predictor.ml_utils import set_random_seed, split_train_tes
     calculate_prediction_results, get_suitable_sample_size, load_saved_model, predict_new_data
 from post_processing.post_processing_constants import evaluation_download_folder, download_folder, \
     post_processing_log_folder
+from post_processing.eye_tracking.ProcessingLogger import load_processing_log
 from machine_learning_predictor.mixed_data_generator import MixedDataGenerator
 from machine_learning_predictor.classifier import DifficultyImageClassifier
 from sklearn.preprocessing import StandardScaler
@@ -63,15 +64,17 @@ def merge_participant_eye_tracking_logs(participant_list, dataset_type: DatasetT
                     blink_log["difficulty_level"] = difficulty_dir
                     blink_dataframe = pd.concat([blink_dataframe, blink_log])
 
-                elif "processing_log" in element:
-                    eye_log_path = os.path.join(difficulty_dir_path, difficulty_dir, element)
-                    eye_log = pd.read_csv(eye_log_path, sep=";")
-                    eye_log["participant"] = participant
-                    eye_log["difficulty_level"] = difficulty_dir
-                    if test_mode:
-                        eye_log = eye_log[:test_subset_size]
+            # the processing log is already split into typed columns (ROLL, PITCH, YAW, LEFT_PUPIL_POS_X, ...)
+            eye_log = load_processing_log(os.path.join(difficulty_dir_path, difficulty_dir))
+            if eye_log is None:
+                # e.g. a folder without a processing log
+                continue
+            eye_log["participant"] = participant
+            eye_log["difficulty_level"] = difficulty_dir
+            if test_mode:
+                eye_log = eye_log[:test_subset_size]
 
-                    eye_log_dataframe = pd.concat([eye_log_dataframe, eye_log])
+            eye_log_dataframe = pd.concat([eye_log_dataframe, eye_log])
 
             # participant_5 has 5 rows less for category "easy" than the rest after the eye tracking part so we simply
             # duplicate the last row in the dataframe so every participant has the same amount of data rows
@@ -95,37 +98,8 @@ def merge_participant_eye_tracking_logs(participant_list, dataset_type: DatasetT
     # see https://stackoverflow.com/questions/29576430/shuffle-dataframe-rows
     # blink_dataframe_ordered = blink_dataframe_ordered.sample(frac=1)
 
-    # remove all '(', ')', '[' and ']' in the dataframe
-    eye_log_dataframe_ordered.replace(to_replace=r"[\(\)\[\]]", value="", regex=True, inplace=True)
-
-    # remove all trailing and leading whitespaces
-    eye_log_dataframe_ordered.columns = eye_log_dataframe_ordered.columns.str.strip()
-    cols = eye_log_dataframe_ordered.select_dtypes(['object']).columns
-    eye_log_dataframe_ordered[cols] = eye_log_dataframe_ordered[cols].apply(lambda x: x.str.strip())
-
-    # split columns so every column contains only one value
-    eye_log_dataframe_ordered[['ROLL', 'PITCH', 'YAW']] = \
-        eye_log_dataframe_ordered.HEAD_POS_ROLL_PITCH_YAW.str.split(", ", expand=True, )
-
-    eye_log_dataframe_ordered[['LEFT_PUPIL_POS_X', 'LEFT_PUPIL_POS_Y']] = \
-        eye_log_dataframe_ordered.LEFT_PUPIL_POS.str.split(" +", expand=True)  # " +" selects one or more whitespaces
-    eye_log_dataframe_ordered[['RIGHT_PUPIL_POS_X', 'RIGHT_PUPIL_POS_Y']] = \
-        eye_log_dataframe_ordered.RIGHT_PUPIL_POS.str.split(" +", expand=True)
-    eye_log_dataframe_ordered[['LEFT_EYE_CENTER_X', 'LEFT_EYE_CENTER_Y']] = \
-        eye_log_dataframe_ordered.LEFT_EYE_CENTER.str.split(" +", expand=True)
-    eye_log_dataframe_ordered[['RIGHT_EYE_CENTER_X', 'RIGHT_EYE_CENTER_Y']] = \
-        eye_log_dataframe_ordered.RIGHT_EYE_CENTER.str.split(" +", expand=True)
-
     # remove unnecessary columns
-    eye_log_dataframe_ordered = eye_log_dataframe_ordered.drop(['date', 'HEAD_POS_ROLL_PITCH_YAW', 'LEFT_EYE_CENTER',
-                                                                'RIGHT_EYE_CENTER', 'LEFT_PUPIL_POS', 'RIGHT_PUPIL_POS'
-                                                                ], axis=1)
-    # convert object data types back to floats
-    string_dtypes = ['ROLL', 'PITCH', 'YAW', 'LEFT_PUPIL_POS_X', 'LEFT_PUPIL_POS_Y', 'RIGHT_PUPIL_POS_X',
-                     'RIGHT_PUPIL_POS_Y', 'LEFT_EYE_CENTER_X', 'LEFT_EYE_CENTER_Y', 'RIGHT_EYE_CENTER_X',
-                     'RIGHT_EYE_CENTER_Y']
-    eye_log_dataframe_ordered[string_dtypes] = eye_log_dataframe_ordered[string_dtypes].astype(float)
-    # print(eye_log_dataframe_ordered.dtypes)
+    eye_log_dataframe_ordered = eye_log_dataframe_ordered.drop(['date'], axis=1)
 
     # save as csv files
     if dataset_type == DatasetType.TRAIN:
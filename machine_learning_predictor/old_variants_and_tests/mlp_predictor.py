@@ -50,7 +50,7 @@ def merge_participant_eye_tracking_logs(participant_list, is_train_data):
                     blink_log["difficulty_level"] = difficulty_dir
                     blink_dataframe = pd.concat([blink_dataframe, blink_log])
 
-                elif "processing_log" in element:
+                elif "processing_log" in element and element.endswith(".csv"):
                     eye_log_path = os.path.join(difficulty_dir_path, difficulty_dir, element)
                     eye_log = pd.read_csv(eye_log_path, sep=";")
                     eye_log["participant"] = participant
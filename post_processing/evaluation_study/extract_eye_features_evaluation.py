@@ -10,14 +10,29 @@ import cv2
 import pandas as pd
 from post_processing.assign_load_classes import get_timestamp_from_image
 from post_processing.eye_tracking.eye_tracker import EyeTracker
+from post_processing.eye_tracking.frame_pipeline import FramePipeline
 from post_processing.eye_tracking.image_utils import show_image_window
+from post_processing.eye_tracking.landmark_cache import CACHE_READ, CACHE_WRITE
 from post_processing.post_processing_constants import evaluation_download_folder, post_processing_log_folder
 from post_processing.extract_downloaded_data import get_fps_info
+from post_processing.parallel_eye_feature_extraction import collect_difficulty_tasks, run_parallel_extraction, \
+    run_sharded_extraction
+from tracking.FpsMeasuring import FpsMeasurer
 
+# number of frames between two progress messages in the headless mode
+PROGRESS_INTERVAL = 500
 
-def process_images(eye_tracker, participants_folders=list[str]):
+
+def process_images(eye_tracker, participants_folders=list[str], headless=False, use_pipeline=False):
+    """
+    If headless is True, no OpenCV windows are used (so no display is needed) and the progress is printed instead.
+    With use_pipeline the frames of a difficulty are processed by the threaded FramePipeline (always headless).
+    """
     frame_count = 0
     start_time = time.time()
+    fps_measurer = FpsMeasurer().start()
+    pipeline = FramePipeline(eye_tracker) if use_pipeline else None
+    headless = headless or use_pipeline
 
     # iterate over and process all images associated with a difficulty level (easy, medium and hard)
     for participant in os.listdir(evaluation_download_folder):
@@ -53,20 +68,29 @@ def process_images(eye_tracker, participants_folders=list[str]):
 
             # create a subset of the df that contains only the rows with this difficulty level
             sub_df = labeled_images_df[labeled_images_df.difficulty == difficulty_level]
-            for idx, row in sub_df.iterrows():
-                image_path = row["image_path"]
-                current_image = cv2.imread(image_path)
-
-                # get the original timestamp from image so it can be associated later
-                image_timestamp = get_timestamp_from_image(image_path)
-                processed_frame = eye_tracker.process_current_frame(current_image, participant, difficulty_level,
-                                                                    image_timestamp)
-
-                frame_count += 1
-                show_image_window(processed_frame, window_name="evaluation_processed_frame", x_pos=120, y_pos=150)
-                # press q to skip to next participant / load level
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            if pipeline is not None:
+                frame_count += pipeline.process(sub_df.image_path.tolist(), participant, difficulty_level)
+                print(f"[INFO] {frame_count} frames processed ({frame_count / (time.time() - start_time):.2f} fps)")
+            else:
+                for idx, row in sub_df.iterrows():
+                    image_path = row["image_path"]
+                    current_image = cv2.imread(image_path)
+
+                    # get the original timestamp from image so it can be associated later
+                    image_timestamp = get_timestamp_from_image(image_path)
+                    processed_frame = eye_tracker.process_current_frame(current_image, participant, difficulty_level,
+                                                                        image_timestamp)
+
+                    frame_count = fps_measurer.update()
+                    if headless:
+                        if frame_count % PROGRESS_INTERVAL == 0:
+                            print(f"[INFO] {frame_count} frames processed ({fps_measurer.get_current_fps():.2f} fps)")
+                        continue
+
+                    show_image_window(processed_frame, window_name="evaluation_processed_frame", x_pos=120, y_pos=150)
+                    # press q to skip to next participant / load level
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
 
             eye_tracker.movement_tracker.save_data(participant, difficulty_level, evaluation_study_data=True)
             # after we finished one difficulty folder, log all information that was recorded for it
@@ -77,15 +101,35 @@ def process_images(eye_tracker, participants_folders=list[str]):
     duration = time.time() - start_time
     print(f"[INFO]: Frame Count: {frame_count}")
     print(f"[INFO]: Duration: {duration} seconds")
+    print(f"[INFO]: Throughput: {frame_count / duration if duration > 0 else 0:.2f} fps")
+    if pipeline is not None:
+        pipeline.print_utilization()
 
     # cleanup
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
     sys.exit(0)
 
 
-def start_extracting_evaluation_eye_features(participant_list=list[str], enable_annotation=False):
-    eye_tracker = EyeTracker(enable_annotation, debug_active=False)
-    process_images(eye_tracker, participant_list)
+def start_extracting_evaluation_eye_features(participant_list=list[str], enable_annotation=False, headless=False,
+                                             num_workers=1, shard_frames=False, use_pipeline=False,
+                                             landmark_cache_mode=None):
+    if num_workers != 1:
+        tasks = collect_difficulty_tasks(evaluation_download_folder, participant_list, is_evaluation_data=True)
+        if shard_frames and landmark_cache_mode != CACHE_READ:
+            # a single evaluation session is long enough to keep all workers busy on its own
+            run_sharded_extraction(tasks, num_workers or None, enable_annotation,
+                                   cache_landmarks=landmark_cache_mode == CACHE_WRITE)
+        else:
+            run_parallel_extraction(tasks, num_workers or None, enable_annotation,
+                                    landmark_cache_mode=landmark_cache_mode)
+        return
+
+    if (headless or use_pipeline) and enable_annotation:
+        print("[WARNING] Annotations need OpenCV windows and are disabled in the headless mode!")
+        enable_annotation = False
+    eye_tracker = EyeTracker(enable_annotation, debug_active=False, landmark_cache_mode=landmark_cache_mode)
+    process_images(eye_tracker, participant_list, headless=headless, use_pipeline=use_pipeline)
 
 
 if __name__ == "__main__":
@@ -93,9 +137,25 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Eye feature postprocessing system for the evaluation data.")
     parser.add_argument("-a", "--enable_annotation", help="If enabled the tracked face parts are shown in "
                                                           "separate frames", action="store_true")
+    parser.add_argument("--pipeline", help="If enabled decoding, inference, feature extraction and logging run on "
+                                           "separate threads (always headless)", action="store_true")
+    parser.add_argument("--headless", help="If enabled no OpenCV windows are shown (no display needed) and the "
+                                           "progress is printed instead", action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of worker processes that process the participants and "
+                                                "difficulties in parallel (always headless); 0 uses all cpu cores",
+                        type=int, default=1)
+    parser.add_argument("--shard_frames", help="If enabled the workers split up the frames of every difficulty instead "
+                                               "of processing whole difficulties in parallel", action="store_true")
+    parser.add_argument("--landmark_cache", help="'write' stores the face boxes, landmarks, head poses and iris "
+                                                 "landmarks of every difficulty next to the data, 'read' extracts the "
+                                                 "features from this cache without running the models",
+                        choices=[CACHE_WRITE, CACHE_READ], default=None)
     args = parser.parse_args()
     annotation_enabled = args.enable_annotation
 
     # for easier debugging; select the participants that should be processed; pass empty list to process all
     participants = []
-    start_extracting_evaluation_eye_features(participant_list=participants, enable_annotation=annotation_enabled)
+    start_extracting_evaluation_eye_features(participant_list=participants, enable_annotation=annotation_enabled,
+                                             headless=args.headless, num_workers=args.workers,
+                                             shard_frames=args.shard_frames, use_pipeline=args.pipeline,
+                                             landmark_cache_mode=args.landmark_cache)
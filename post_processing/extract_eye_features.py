@@ -12,39 +12,53 @@ from datetime import datetime
 import pandas as pd
 from post_processing.assign_load_classes import get_timestamp_from_image
 from post_processing.eye_tracking.eye_tracker import EyeTracker
+from post_processing.eye_tracking.frame_pipeline import FramePipeline
 from post_processing.eye_tracking.image_utils import show_image_window
+from post_processing.eye_tracking.landmark_cache import CACHE_READ, CACHE_WRITE
 from post_processing.post_processing_constants import download_folder, post_processing_log_folder
 from post_processing.extract_downloaded_data import get_fps_info
+from post_processing.parallel_eye_feature_extraction import collect_difficulty_tasks, run_parallel_extraction, \
+    run_sharded_extraction
+from tracking.FpsMeasuring import FpsMeasurer
 
+# number of frames between two progress messages in the headless mode
+PROGRESS_INTERVAL = 500
+# used for the blink detection in the debug mode if the capture doesn't report its fps
+DEFAULT_DEBUG_FPS = 30
 
-def debug_postprocess(enable_annotation, video_file_path):
+
+def debug_postprocess(enable_annotation, video_file_path, landmark_flow=False):
     """
-    Used for debugging the eye tracker functionality "live" with own webcam or video file.
+    Used for debugging the eye tracker functionality "live" with own webcam or video file. Nothing is logged.
     """
     # uses the webcam or a given video file for the processing & annotation instead of the images from the participants
-    if args.video_file:
+    if video_file_path:
         # use a custom threaded video captures to increase fps;
         # see https://www.pyimagesearch.com/2015/12/21/increasing-webcam-fps-with-python-and-opencv/
         from post_processing.eye_tracking.ThreadedFileVideoCapture import FileVideoStream
-        capture = FileVideoStream(path=video_file_path, transform=None)
+        capture = FileVideoStream(path=video_file_path, transform=None).start()
+        video_width, video_height = capture.get_stream_dimensions()
+        capture_fps = capture.get_stream_fps()
     else:
         # fall back to webcam (0) if no input video was provided
         capture = cv2.VideoCapture(0)
+        video_width, video_height = capture.get(3), capture.get(4)
+        capture_fps = capture.get(cv2.CAP_PROP_FPS)
 
-    video_width, video_height = capture.get(3), capture.get(4)
-    print(f"Capture Width: {video_width}, Capture Height: {video_height}")
-    eye_tracker = EyeTracker(enable_annotation, debug_active=True)
+    print(f"Capture Width: {video_width}, Capture Height: {video_height}, Capture FPS: {capture_fps}")
+    eye_tracker = EyeTracker(enable_annotation, debug_active=True, landmark_flow=landmark_flow)
+    eye_tracker.set_camera_matrix(video_width, video_height)
+    eye_tracker.blink_detector.set_participant_fps(capture_fps if capture_fps > 0 else DEFAULT_DEBUG_FPS)
 
     c = 0
     start_time = datetime.now()
     while True:
-        return_val, curr_frame = capture.read()
+        curr_frame = capture.read() if video_file_path else capture.read()[1]
         if curr_frame is None:
             break
         c += 1
 
-        eye_tracker.set_camera_matrix(video_width, video_height)
-        processed_frame = eye_tracker.process_current_frame(curr_frame)
+        processed_frame = eye_tracker.process_debug_frame(curr_frame)
 
         # show fps in output image
         elapsed_time = (datetime.now() - start_time).total_seconds()
@@ -55,10 +69,14 @@ def debug_postprocess(enable_annotation, video_file_path):
 
         # press q to quit this loop
         if cv2.waitKey(1) & 0xFF == ord('q'):
-            # eye_tracker.stop_tracking()
-            cv2.destroyAllWindows()
             break
 
+    if video_file_path:
+        capture.stop()
+    else:
+        capture.release()
+    cv2.destroyAllWindows()
+
 
 def create_eye_region_csv(participant_folder, image_folder_name):
     post_processing_path = os.path.join(download_folder, participant_folder, post_processing_log_folder)
@@ -84,9 +102,16 @@ def create_eye_region_csv(participant_folder, image_folder_name):
     print(f"Finished writing eye region csv file for {participant_folder}.")
 
 
-def process_images(eye_tracker, participants_folders=list[str]):
+def process_images(eye_tracker, participants_folders=list[str], headless=False, use_pipeline=False):
+    """
+    If headless is True, no OpenCV windows are used (so no display is needed) and the progress is printed instead.
+    With use_pipeline the frames of a difficulty are processed by the threaded FramePipeline (always headless).
+    """
     frame_count = 0
     start_time = time.time()
+    fps_measurer = FpsMeasurer().start()
+    pipeline = FramePipeline(eye_tracker) if use_pipeline else None
+    headless = headless or use_pipeline
 
     # iterate over and process all images associated with a difficulty level (easy, medium and hard)
     for participant in os.listdir(download_folder):
@@ -122,20 +147,29 @@ def process_images(eye_tracker, participants_folders=list[str]):
 
             # create a subset of the df that contains only the rows with this difficulty level
             sub_df = labeled_images_df[labeled_images_df.difficulty == difficulty_level]
-            for idx, row in sub_df.iterrows():
-                image_path = row["image_path"]
-                current_image = cv2.imread(image_path)
-
-                # get the original timestamp from image so it can be associated later
-                image_timestamp = get_timestamp_from_image(image_path)
-                processed_frame = eye_tracker.process_current_frame(current_image, participant, difficulty_level,
-                                                                    image_timestamp)
-
-                frame_count += 1
-                show_image_window(processed_frame, window_name="processed_frame", x_pos=120, y_pos=150)
-                # press q to skip to next participant / load level
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            if pipeline is not None:
+                frame_count += pipeline.process(sub_df.image_path.tolist(), participant, difficulty_level)
+                print(f"[INFO] {frame_count} frames processed ({frame_count / (time.time() - start_time):.2f} fps)")
+            else:
+                for idx, row in sub_df.iterrows():
+                    image_path = row["image_path"]
+                    current_image = cv2.imread(image_path)
+
+                    # get the original timestamp from image so it can be associated later
+                    image_timestamp = get_timestamp_from_image(image_path)
+                    processed_frame = eye_tracker.process_current_frame(current_image, participant, difficulty_level,
+                                                                        image_timestamp)
+
+                    frame_count = fps_measurer.update()
+                    if headless:
+                        if frame_count % PROGRESS_INTERVAL == 0:
+                            print(f"[INFO] {frame_count} frames processed ({fps_measurer.get_current_fps():.2f} fps)")
+                        continue
+
+                    show_image_window(processed_frame, window_name="processed_frame", x_pos=120, y_pos=150)
+                    # press q to skip to next participant / load level
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
 
             eye_tracker.movement_tracker.save_data(participant, difficulty_level, evaluation_study_data=False)
             # after we finished one difficulty folder, log all information that was recorded for it
@@ -151,19 +185,63 @@ def process_images(eye_tracker, participants_folders=list[str]):
     duration = time.time() - start_time
     print(f"[INFO]: Frame Count: {frame_count}")
     print(f"[INFO]: Duration: {duration} seconds")
+    print(f"[INFO]: Throughput: {frame_count / duration if duration > 0 else 0:.2f} fps")
+    if pipeline is not None:
+        pipeline.print_utilization()
 
     # cleanup
     # eye_tracker.stop_tracking()
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
     sys.exit(0)
 
 
-def start_extracting_eye_features(participant_list=list[str], debug=False, enable_annotation=False, video_file_path=None):
+def start_extracting_eye_features(participant_list=list[str], debug=False, enable_annotation=False, video_file_path=None,
+                                  landmark_flow=False, skip_closed_eyes=False, production_mode=False, headless=False,
+                                  num_workers=1, shard_frames=False, use_pipeline=False, landmark_cache_mode=None):
+    """
+    num_workers > 1 processes the participants and difficulties in parallel worker processes (see
+    parallel_eye_feature_extraction.py); 0 uses all cpu cores. With shard_frames the workers process the frames of
+    one difficulty at a time instead.
+    landmark_cache_mode CACHE_WRITE stores the model outputs in the landmark cache, CACHE_READ uses this cache instead
+    of the models (see landmark_cache.py).
+    """
     if debug:
-        debug_postprocess(enable_annotation, video_file_path)
+        debug_postprocess(enable_annotation, video_file_path, landmark_flow)
+        return
+
+    if landmark_flow:
+        # the study images are face crops with different sizes and origins, the landmarks can't be propagated between
+        # them (see LandmarkFlowTracker)
+        print("[WARNING] The landmark flow only works for the full frames of the debug mode (webcam or video file) "
+              "and is disabled for the images of the participants!")
+        landmark_flow = False
+
+    if num_workers != 1:
+        tasks = collect_difficulty_tasks(download_folder, participant_list, is_evaluation_data=False)
+        if shard_frames and landmark_cache_mode == CACHE_READ:
+            print("[WARNING] The cached landmarks don't need the sharded frames, the difficulties are processed in "
+                  "parallel instead!")
+            shard_frames = False
+        if shard_frames:
+            finished_participants = run_sharded_extraction(tasks, num_workers or None, enable_annotation,
+                                                           skip_closed_eyes, production_mode,
+                                                           cache_landmarks=landmark_cache_mode == CACHE_WRITE)
+        else:
+            finished_participants = run_parallel_extraction(tasks, num_workers or None, enable_annotation,
+                                                            landmark_flow, skip_closed_eyes, production_mode,
+                                                            landmark_cache_mode)
+        for participant in finished_participants:
+            print(f"Creating csv file for eye regions of {participant} ...")
+            create_eye_region_csv(participant, image_folder_name="eye_regions")
     else:
-        eye_tracker = EyeTracker(enable_annotation, debug_active=False)
-        process_images(eye_tracker, participant_list)
+        if (headless or use_pipeline) and enable_annotation:
+            print("[WARNING] Annotations need OpenCV windows and are disabled in the headless mode!")
+            enable_annotation = False
+        eye_tracker = EyeTracker(enable_annotation, debug_active=False, landmark_flow=landmark_flow,
+                                 skip_closed_eyes=skip_closed_eyes, production_mode=production_mode,
+                                 landmark_cache_mode=landmark_cache_mode)
+        process_images(eye_tracker, participant_list, headless=headless, use_pipeline=use_pipeline)
 
 
 if __name__ == "__main__":
@@ -174,14 +252,43 @@ if __name__ == "__main__":
     # setup an argument parser to enable command line parameters
     parser = argparse.ArgumentParser(description="Postprocessing system to find the useful data in the recorded "
                                                  "images.")
-    parser.add_argument("-v", "--video_file", help="path to a video file to be used instead of the webcam", type=str)
+    parser.add_argument("-d", "--debug", help="If enabled the frames of the webcam or the video file are processed "
+                                              "live instead of the images of the participants (nothing is logged)",
+                        action="store_true")
+    parser.add_argument("-v", "--video_file", help="path to a video file to be used instead of the webcam in the debug "
+                                                   "mode", type=str)
     parser.add_argument("-a", "--enable_annotation", help="If enabled the tracked face parts are shown in "
                                                           "separate frames", action="store_true")
+    parser.add_argument("-l", "--landmark_flow", help="If enabled the landmarks of stable frames are propagated with "
+                                                      "optical flow instead of running the alignment model (only for "
+                                                      "the full frames of the debug mode, not for the face crops)",
+                        action="store_true")
+    parser.add_argument("-s", "--skip_closed_eyes", help="If enabled the iris and pupil detection is skipped for "
+                                                         "frames with closed eyes", action="store_true")
+    parser.add_argument("-p", "--production_mode", help="If enabled only the logged values are computed (no debug "
+                                                        "images, thresholds or gaze drawings)", action="store_true")
+    parser.add_argument("--pipeline", help="If enabled decoding, inference, feature extraction and logging run on "
+                                           "separate threads (always headless)", action="store_true")
+    parser.add_argument("--headless", help="If enabled no OpenCV windows are shown (no display needed) and the "
+                                           "progress is printed instead", action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of worker processes that process the participants and "
+                                                "difficulties in parallel (always headless); 0 uses all cpu cores",
+                        type=int, default=1)
+    parser.add_argument("--shard_frames", help="If enabled the workers split up the frames of every difficulty instead "
+                                               "of processing whole difficulties in parallel", action="store_true")
+    parser.add_argument("--landmark_cache", help="'write' stores the face boxes, landmarks, head poses and iris "
+                                                 "landmarks of every difficulty next to the data, 'read' extracts the "
+                                                 "features from this cache without running the models",
+                        choices=[CACHE_WRITE, CACHE_READ], default=None)
     args = parser.parse_args()
     annotation_enabled = args.enable_annotation
     video_file = args.video_file
 
     # for easier debugging; select the participants that should be processed; pass empty list to process all
     participants = ["participant_18"]
-    start_extracting_eye_features(debug=False, participant_list=participants, enable_annotation=annotation_enabled,
-                                  video_file_path=video_file)
+    start_extracting_eye_features(debug=args.debug, participant_list=participants, enable_annotation=annotation_enabled,
+                                  video_file_path=video_file, landmark_flow=args.landmark_flow,
+                                  skip_closed_eyes=args.skip_closed_eyes, production_mode=args.production_mode,
+                                  headless=args.headless, num_workers=args.workers,
+                                  shard_frames=args.shard_frames, use_pipeline=args.pipeline,
+                                  landmark_cache_mode=args.landmark_cache)
@@ -1,4 +1,6 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
 from typing import Any
@@ -12,17 +14,60 @@ from post_processing.post_processing_constants import download_folder, post_proc
 ProcessingData = Enum("ProcessingData", "HEAD_POS_ROLL_PITCH_YAW LEFT_EYE_CENTER RIGHT_EYE_CENTER LEFT_EYE_WIDTH "
                                         "RIGHT_EYE_WIDTH LEFT_EYE_HEIGHT RIGHT_EYE_HEIGHT LEFT_PUPIL_POS "
                                         "RIGHT_PUPIL_POS LEFT_PUPIL_DIAMETER "
-                                        "RIGHT_PUPIL_DIAMETER")  # FACE_LANDMARKS
+                                        "RIGHT_PUPIL_DIAMETER EYES_CLOSED")  # FACE_LANDMARKS
+
+# the columns of the typed processing log (a npz file with one array per column, see `load_processing_log()`): the
+# tuples and arrays are split into one float32 column per value, missing values are NaN
+TYPED_COLUMNS = {
+    ProcessingData.HEAD_POS_ROLL_PITCH_YAW.name: ["ROLL", "PITCH", "YAW"],
+    ProcessingData.LEFT_EYE_CENTER.name: ["LEFT_EYE_CENTER_X", "LEFT_EYE_CENTER_Y"],
+    ProcessingData.RIGHT_EYE_CENTER.name: ["RIGHT_EYE_CENTER_X", "RIGHT_EYE_CENTER_Y"],
+    ProcessingData.LEFT_EYE_WIDTH.name: ["LEFT_EYE_WIDTH"],
+    ProcessingData.RIGHT_EYE_WIDTH.name: ["RIGHT_EYE_WIDTH"],
+    ProcessingData.LEFT_EYE_HEIGHT.name: ["LEFT_EYE_HEIGHT"],
+    ProcessingData.RIGHT_EYE_HEIGHT.name: ["RIGHT_EYE_HEIGHT"],
+    ProcessingData.LEFT_PUPIL_POS.name: ["LEFT_PUPIL_POS_X", "LEFT_PUPIL_POS_Y"],
+    ProcessingData.RIGHT_PUPIL_POS.name: ["RIGHT_PUPIL_POS_X", "RIGHT_PUPIL_POS_Y"],
+    ProcessingData.LEFT_PUPIL_DIAMETER.name: ["LEFT_PUPIL_DIAMETER"],
+    ProcessingData.RIGHT_PUPIL_DIAMETER.name: ["RIGHT_PUPIL_DIAMETER"],
+}
+# stored as bool instead of float32
+BOOLEAN_COLUMNS = [ProcessingData.EYES_CLOSED.name]
+
+
+# number of rows that are collected before they are appended to the csv file
+ROW_CHUNK_SIZE = 1000
+# the images are written on a small pool of threads; at most MAX_PENDING_IMAGES images wait for it, after that
+# `log_image()` blocks until one of them is written so the memory doesn't grow if the disk is slower than the processing
+IMAGE_WRITER_THREADS = 2
+MAX_PENDING_IMAGES = 64
 
 
 # noinspection PyAttributeOutsideInit
 class ProcessingLogger:
+    """
+    Appends the logged rows to the csv file of the current difficulty in chunks and writes the images in the
+    background while the frames are processed, so only the last chunk and a few images are kept in memory.
+    `save_tracking_data()` has to be called at the end of every difficulty to write the remaining rows and wait for
+    the images.
+
+    Every difficulty gets a typed processing log (processing_log_<difficulty>.npz) with numeric columns that can be
+    loaded without parsing any strings (see `load_processing_log()`); the csv file with the tuples and arrays as
+    strings is still written for compatibility.
+    """
+
     def __init__(self):
         self.__log_folder = post_processing_log_folder
 
         self.__log_tag = "processing_logger"
         self.__processed_data = []
-        self.__image_data = []
+        self.__columns = None
+        self.__typed_chunks = []
+
+        self.__image_writer = None
+        self.__image_slots = threading.BoundedSemaphore(MAX_PENDING_IMAGES)
+        self.__image_error = None
+        self.__image_folders = set()
 
         self.__is_evaluation_study_data = False
 
@@ -34,44 +79,117 @@ class ProcessingLogger:
         self.current_difficulty_level = difficulty
         self.__start_logging()
 
-    def __start_logging(self):
+    def get_participant_folder(self):
         if self.__is_evaluation_study_data:
-            participant_folder = pathlib.Path(__file__).parent.parent / "evaluation_study" / evaluation_download_folder\
-                                 / self.current_participant
-        else:
-            participant_folder = pathlib.Path(__file__).parent.parent / download_folder / self.current_participant
+            return pathlib.Path(__file__).parent.parent / "evaluation_study" / evaluation_download_folder \
+                   / self.current_participant
+        return pathlib.Path(__file__).parent.parent / download_folder / self.current_participant
 
+    def __start_logging(self):
+        participant_folder = self.get_participant_folder()
         self.__folder_path = participant_folder / self.__log_folder / self.current_difficulty_level
         self.__log_file_path = self.__folder_path / f"processing_log_{self.current_difficulty_level}.csv"
+        self.__typed_log_file_path = self.__folder_path / f"processing_log_{self.current_difficulty_level}.npz"
 
         # create log folder if it doesn't exist yet
         if not self.__folder_path.is_dir():
             os.makedirs(self.__folder_path)  # use 'makedirs()' to automatically create any missing parent dirs as well
 
+        # the first chunk of this difficulty overwrites an old log file and writes the header
+        self.__processed_data.clear()
+        self.__columns = None
+        self.__typed_chunks.clear()
+        self.__image_folders.clear()
+
     def log_frame_data(self, frame_id: float, data: dict[ProcessingData, Any]):
         # ** unpacks the dictionary as key-value pairs
         self.__processed_data.append({'date': datetime.now(), 'frame_id': frame_id, **data})
+        if len(self.__processed_data) >= ROW_CHUNK_SIZE:
+            self.__write_rows()
+
+    def __write_rows(self):
+        is_first_chunk = self.__columns is None
+        if is_first_chunk:
+            self.__columns = list(self.__processed_data[0].keys()) if self.__processed_data else None
+        # object columns so every value is written the same way, no matter which other values are in its chunk
+        tracking_df = pd.DataFrame(self.__processed_data, columns=self.__columns, dtype=object)
+        tracking_df.to_csv(self.__log_file_path, sep=";", index=False, mode="w" if is_first_chunk else "a",
+                           header=is_first_chunk)
+        self.__typed_chunks.append(self.__get_typed_columns(self.__processed_data))
+        self.__processed_data.clear()
+
+    @staticmethod
+    def __get_typed_columns(rows):
+        typed_columns = {"date": np.array([row["date"] for row in rows], dtype="datetime64[us]"),
+                         "frame_id": [row["frame_id"] for row in rows]}
+        for key, column_names in TYPED_COLUMNS.items():
+            values = np.full((len(rows), len(column_names)), np.nan, dtype=np.float32)
+            for i, row in enumerate(rows):
+                if row.get(key) is not None:
+                    values[i] = np.ravel(row[key])
+            for j, column_name in enumerate(column_names):
+                typed_columns[column_name] = values[:, j]
+        for key in BOOLEAN_COLUMNS:
+            typed_columns[key] = np.array([bool(row.get(key)) for row in rows], dtype=bool)
+        return typed_columns
+
+    def __write_typed_log(self):
+        typed_columns = {column: np.concatenate([chunk[column] for chunk in self.__typed_chunks])
+                         for column in self.__typed_chunks[0] if column != "frame_id"}
+        frame_ids = [frame_id for chunk in self.__typed_chunks for frame_id in chunk["frame_id"]]
+        try:
+            # the frame ids are the timestamps of the images
+            typed_columns["frame_id"] = np.array(frame_ids, dtype=np.int64)
+        except (ValueError, TypeError):
+            typed_columns["frame_id"] = np.array(frame_ids, dtype=str)
+        np.savez(self.__typed_log_file_path, **typed_columns)
+        self.__typed_chunks.clear()
 
     def log_image(self, dirname: str, filename: str, image: np.ndarray, timestamp: float):
-        if not self.__is_evaluation_study_data:
-            self.__image_data.append((dirname, filename, image, timestamp))
-
-    def save_tracking_data(self):
-        tracking_df = pd.DataFrame(self.__processed_data)
-        tracking_df.to_csv(self.__log_file_path, sep=";", index=False)
-        self.__processed_data.clear()  # reset tracking data
-
         # only save smaller images for the training data, not for the evaluation participants
-        if not self.__is_evaluation_study_data:
-            for entry in self.__image_data:
-                self.__save_image(*entry)
-            self.__image_data.clear()
+        if self.__is_evaluation_study_data:
+            return
 
-    def __save_image(self, dirname: str, filename: str, image: np.ndarray, timestamp: float):
         path = self.__folder_path / dirname
-        if not path.is_dir():
-            path.mkdir()
+        if dirname not in self.__image_folders:
+            path.mkdir(exist_ok=True)
+            self.__image_folders.add(dirname)
+
+        if self.__image_writer is None:
+            self.__image_writer = ThreadPoolExecutor(max_workers=IMAGE_WRITER_THREADS, thread_name_prefix="SaveImages")
+        self.__image_slots.acquire()
+        # the image is usually a view of the whole frame, the copy makes sure only the small region is kept alive
+        future = self.__image_writer.submit(self.__save_image, path, filename, image.copy(), timestamp)
+        future.add_done_callback(self.__on_image_saved)
+
+    def __on_image_saved(self, future):
+        self.__image_slots.release()
+        if future.exception() is not None and self.__image_error is None:
+            self.__image_error = future.exception()
+
+    def __wait_for_images(self):
+        # all slots are free again once every pending image is written
+        for _ in range(MAX_PENDING_IMAGES):
+            self.__image_slots.acquire()
+        for _ in range(MAX_PENDING_IMAGES):
+            self.__image_slots.release()
+
+        if self.__image_error is not None:
+            image_error, self.__image_error = self.__image_error, None
+            raise image_error
 
+    def save_tracking_data(self):
+        """
+        Writes the remaining rows of the current difficulty and waits until all of its images are written.
+        """
+        if self.__processed_data or self.__columns is None:
+            self.__write_rows()
+        self.__write_typed_log()
+        self.__columns = None
+        self.__wait_for_images()
+
+    @staticmethod
+    def __save_image(path: pathlib.Path, filename: str, image: np.ndarray, timestamp: float):
         # check if empty first as it crashes if given an empty array (e.g. if face / eyes not fully visible)
         if image.size:
             cv2.imwrite(f'{path / filename}__{timestamp}.png', image)
@@ -82,3 +200,51 @@ class ProcessingLogger:
         blink_log_path = os.path.join(self.__folder_path, f"{self.current_difficulty_level}_blink_log.csv")
         df = pd.DataFrame(blink_info_dict, index=[0])
         df.to_csv(blink_log_path, sep=",", index=False)
+
+
+def load_processing_log(difficulty_folder):
+    """
+    Loads the processing log of a difficulty folder (e.g. post_processing_data/easy) as a DataFrame with the typed
+    columns (see TYPED_COLUMNS). Uses the npz file if there is one, otherwise the csv file of older runs is parsed.
+    Returns None if the folder doesn't contain a processing log.
+    """
+    difficulty_folder = pathlib.Path(difficulty_folder)
+    typed_log_file_path = difficulty_folder / f"processing_log_{difficulty_folder.name}.npz"
+    if typed_log_file_path.is_file():
+        with np.load(typed_log_file_path) as typed_log:
+            columns = ["date", "frame_id", *BOOLEAN_COLUMNS, *(name for names in TYPED_COLUMNS.values()
+                                                              for name in names)]
+            return pd.DataFrame({column: typed_log[column] for column in columns})
+
+    csv_file_path = difficulty_folder / f"processing_log_{difficulty_folder.name}.csv"
+    if not csv_file_path.is_file():
+        return None
+    return parse_processing_log_csv(csv_file_path)
+
+
+def parse_processing_log_csv(csv_file_path):
+    """
+    Converts a processing log csv file with the tuples and arrays as strings to the typed columns. Columns that are
+    missing in the logs of older runs (e.g. EYES_CLOSED) are filled with False or NaN.
+    """
+    log_df = pd.read_csv(csv_file_path, sep=";")
+    typed_columns = {"date": pd.to_datetime(log_df["date"]), "frame_id": log_df["frame_id"]}
+    for key in BOOLEAN_COLUMNS:
+        if key not in log_df.columns:
+            typed_columns[key] = np.zeros(len(log_df), dtype=bool)
+            continue
+        # astype(bool) would turn the string "False" and missing values into True
+        typed_columns[key] = log_df[key].astype(str).str.strip().str.lower().isin(["true", "1", "1.0"]).to_numpy()
+    for key, column_names in TYPED_COLUMNS.items():
+        if key not in log_df.columns:
+            for column_name in column_names:
+                typed_columns[column_name] = np.full(len(log_df), np.nan, dtype=np.float32)
+            continue
+        # e.g. "(1.0, 2.0, 3.0)" or "[270.1 250.3]" (newer numpy versions write the scalars in the tuples as
+        # "np.float64(1.0)"); remove the brackets and split at the commas and whitespaces
+        values = log_df[key].astype(str).str.replace(r"np\.\w+\(", "", regex=True) \
+            .str.replace(r"[\(\)\[\],]", " ", regex=True).str.split(expand=True)
+        values = values.reindex(columns=range(len(column_names)))
+        for j, column_name in enumerate(column_names):
+            typed_columns[column_name] = pd.to_numeric(values[j], errors="coerce").astype(np.float32)
+    return pd.DataFrame(typed_columns)
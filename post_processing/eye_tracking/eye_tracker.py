@@ -1,21 +1,24 @@
 import pathlib
-import threading
+from contextlib import nullcontext
 import cv2
 import numpy as np
-import pyautogui as pyautogui
 from numpy import sin, cos, pi, arctan
 from numpy.linalg import norm
 from post_processing.eye_tracking.ProcessingLogger import ProcessingLogger, ProcessingData
-from post_processing.eye_tracking.image_utils import detect_pupils, apply_threshold, show_image_window
+from post_processing.eye_tracking.image_utils import detect_pupils, apply_threshold, show_image_window, \
+    eye_aspect_ratio
+from post_processing.eye_tracking.landmark_cache import LandmarkCache, Face, CACHE_READ, CACHE_WRITE
+from post_processing.post_processing_constants import landmark_cache_folder
 from post_processing_service.blink_detector import BlinkDetector
 from post_processing_service.saccade_fixation_detector import SaccadeFixationDetector
-from post_processing_service.face_alignment import CoordinateAlignmentModel
+from post_processing_service.face_alignment import CoordinateAlignmentModel, LandmarkTemporalFilter
 from tracking.TrackingLogger import get_timestamp
 from tracking_service.face_detector import MxnetDetectionModel
 from tracking.tracking_utils import extract_image_region
 from post_processing_service.head_pose import HeadPoseEstimator
 from post_processing_service.iris_localization import IrisLocalizationModel
 from post_processing_service.gaze_movement_tracker import GazeMovementTracker
+from post_processing_service.landmark_flow_tracker import LandmarkFlowTracker
 
 
 # we need:
@@ -32,11 +35,43 @@ from post_processing_service.gaze_movement_tracker import GazeMovementTracker
 # noinspection PyAttributeOutsideInit
 class EyeTracker:
 
-    def __init__(self, enable_annotation=False, debug_active=False, gpu_ctx=-1):
+    def __init__(self, enable_annotation=False, debug_active=False, gpu_ctx=-1, landmark_flow=False,
+                 inference_threads=None, skip_closed_eyes=False, production_mode=False, stage_timer=None,
+                 landmark_cache_mode=None, load_models=True):
+        """
+        Args:
+            load_models: if False, the face detection, alignment and iris models aren't loaded, e.g. if the eye tracker
+                         only runs the stages that need the frames in order (`filter_landmarks()` and
+                         `record_features()`) and the other stages run elsewhere
+            landmark_cache_mode: CACHE_WRITE stores the face boxes, landmarks, head poses and iris landmarks of every
+                                 difficulty in a landmark cache (see landmark_cache.py); CACHE_READ uses the cache
+                                 instead of the face detection, alignment and iris models (which aren't even loaded)
+            production_mode: if True, only the values that are logged are computed, i.e. the gaze direction and the
+                             masked and thresholded eye images (which are only needed for annotations) are skipped and
+                             the frame isn't copied; annotations can't be enabled in this mode
+            stage_timer: optional StageTimer (see tracking/FpsMeasuring.py) that measures the time of every stage
+            skip_closed_eyes: if True, the iris localization, the gaze estimation and the pupil detection are skipped
+                              for frames where the eyes are closed (see BlinkDetector.EYE_CLOSED_EAR_THRESHOLD); the
+                              pupil values of these frames are logged as empty
+            inference_threads: number of threads for the iris model; if None tflite decides on its own
+            landmark_flow: if True, the landmarks of stable frames are propagated with optical flow from the last frame
+                           instead of running the face detection and alignment (see LandmarkFlowTracker); only for
+                           full frames of a video, not for the face crops of the study images
+        """
         self.__debug = debug_active
         self.__annotation_enabled = enable_annotation
+        self.__skip_closed_eyes = skip_closed_eyes
+        self.__production_mode = production_mode
+        if production_mode and enable_annotation:
+            print("[WARNING] Annotations are not available in the production mode and are disabled!")
+            self.__annotation_enabled = False
+        self.stage_timer = stage_timer
+        self.__landmark_cache_mode = landmark_cache_mode
+        self.landmark_cache = LandmarkCache() if landmark_cache_mode is not None else None
+        if landmark_cache_mode == CACHE_READ and landmark_flow:
+            print("[WARNING] The landmark flow isn't needed with the cached landmarks and is disabled!")
+            landmark_flow = False
 
-        self.__screenWidth, self.__screenHeight = pyautogui.size()
         self.gaze_left, self.gaze_right = None, None
 
         self.__init_logger()
@@ -46,10 +81,18 @@ class EyeTracker:
         self.movement_tracker = GazeMovementTracker()
 
         weights_path = pathlib.Path(__file__).parent.parent.parent / "weights"
-        self.face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, .6, gpu=gpu_ctx)
-        self.face_alignment = CoordinateAlignmentModel(f"{weights_path / '2d106det'}", 0, gpu=gpu_ctx)
-        self.iris_locator = IrisLocalizationModel(f"{weights_path / 'iris_landmark.tflite'}")
+        # the frames are face crops of different sizes, so the anchors are created the first time a size appears and
+        # only kept in memory
+        if landmark_cache_mode == CACHE_READ or not load_models:
+            self.face_detector, self.face_alignment, self.iris_locator = None, None, None
+        else:
+            self.face_detector = MxnetDetectionModel(f"{weights_path / '16and32'}", 0, .6, gpu=gpu_ctx)
+            self.face_alignment = CoordinateAlignmentModel(f"{weights_path / '2d106det'}", 0, gpu=gpu_ctx)
+            self.iris_locator = IrisLocalizationModel(f"{weights_path / 'iris_landmark.tflite'}",
+                                                      num_threads=inference_threads)
+        self.landmark_filter = LandmarkTemporalFilter(threshold=.8)
         self.head_pose_estimator = HeadPoseEstimator(f"{weights_path / 'object_points.npy'}")
+        self.landmark_flow_tracker = LandmarkFlowTracker() if landmark_flow else None
 
     def __init_logger(self):
         self.__logger = ProcessingLogger()
@@ -67,12 +110,34 @@ class EyeTracker:
 
     def set_current_difficulty(self, difficulty):
         self.__logger.set_difficulty(difficulty)
+        # every difficulty is a separate recording, so the head pose, the landmark filter and the flow tracker shouldn't
+        # start from the last frame of the previous one (this also makes the results of a difficulty independent of
+        # the order in which the difficulties are processed, see parallel_eye_feature_extraction.py)
+        self.head_pose_estimator.reset_pose()
+        self.landmark_filter.reset()
+        if self.landmark_flow_tracker is not None:
+            self.landmark_flow_tracker.reset()
+
+        if self.__landmark_cache_mode == CACHE_WRITE:
+            self.landmark_cache.clear()
+        elif self.__landmark_cache_mode == CACHE_READ:
+            cache_path = self.__get_landmark_cache_path()
+            if not cache_path.is_file():
+                raise FileNotFoundError(f"No landmark cache found at {cache_path}; the difficulty has to be processed "
+                                        f"with the models and the landmark cache mode '{CACHE_WRITE}' first!")
+            self.landmark_cache = LandmarkCache.load(cache_path)
+
+    def __get_landmark_cache_path(self):
+        return self.__logger.get_participant_folder() / landmark_cache_folder / \
+               f"{self.__logger.current_difficulty_level}.npz"
 
     def reset_blink_detector(self):
         self.blink_detector.reset_blink_detection()
 
     def process_current_frame(self, frame: np.ndarray, participant, difficulty, frame_timestamp):
         """
+        Runs all stages for the given frame one after another.
+
         Args:
             frame: video frame in the format [width, height, channels]
             frame_timestamp: timestamp of this frame
@@ -81,95 +146,227 @@ class EyeTracker:
         # processed_frame = preprocess_frame(frame, kernel_size=3, keep_dim=True)
         self.__current_frame = frame
 
-        bboxes = self.face_detector.detect(self.__current_frame)
-        if bboxes is None:
+        for face in self.get_frame_faces(frame, frame_timestamp):
+            features = self.extract_features(frame, *face)
+            self.record_features(features, participant, difficulty, frame_timestamp, frame=frame)
+
+        return self.__current_frame
+
+    def process_debug_frame(self, frame: np.ndarray):
+        """
+        Runs the same stages as `process_current_frame()` for a frame of the webcam or a video file (see
+        `debug_postprocess()` in extract_eye_features.py) but doesn't log anything, so no participant and difficulty
+        have to be set. The fps for the blink detection have to be set with `blink_detector.set_participant_fps()`.
+        """
+        self.__current_frame = frame
+
+        for face in self.get_frame_faces(frame, get_timestamp()):
+            features = self.extract_features(frame, *face)
+            self.blink_detector.set_current_values(frame, *features["eye_markers"], *features["eye_sizes"],
+                                                   eye_aspect_ratio=features["eye_aspect_ratio"])
+            self.blink_detector.detect_blinks()
+
+        return self.__current_frame
+
+    def get_frame_faces(self, frame: np.ndarray, frame_timestamp=None):
+        """
+        All faces in the frame with their filtered landmarks, either propagated with the landmark flow or from
+        `run_inference()`; the frames have to be passed in order. With the landmark cache mode CACHE_READ the cached
+        faces of the frame timestamp are returned instead.
+        """
+        if self.__landmark_cache_mode == CACHE_READ:
+            return self.landmark_cache.get_faces(frame_timestamp)
+
+        faces, propagated_landmarks = None, None
+        if self.landmark_flow_tracker is not None:
+            with self.__time_stage("landmark_flow"):
+                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                propagated_landmarks = self.landmark_flow_tracker.propagate(gray_frame)
+                if propagated_landmarks is not None:
+                    # run the propagated landmarks through the same temporal filter as the predicted ones
+                    faces = [Face(propagated_landmarks)]
+
+        if faces is None:
+            faces = self.run_inference(frame)
+
+            if self.landmark_flow_tracker is not None:
+                # the flow tracker is reset so it doesn't continue from an old keyframe if no face is found
+                self.landmark_flow_tracker.reset()
+
+        filtered_faces = []
+        for face in faces:
+            landmarks = self.filter_landmarks(face.landmarks)
+            if self.landmark_flow_tracker is not None and propagated_landmarks is None:
+                # new keyframe (only one face is expected)
+                self.landmark_flow_tracker.set_keyframe(gray_frame, landmarks)
+            filtered_faces.append(face._replace(landmarks=landmarks))
+        return filtered_faces
+
+    def run_inference(self, frame: np.ndarray):
+        """
+        First stage: face detection and alignment. Returns the face boxes and the unfiltered landmarks of all faces in
+        the frame. Doesn't depend on other frames, so the frames of a sequence can be split up between several
+        processes for this stage (see `run_sharded_extraction()` in parallel_eye_feature_extraction.py).
+        """
+        with self.__time_stage("face_detection"):
+            bboxes = list(self.face_detector.detect(frame))
+        if len(bboxes) == 0 and self.__debug:
             print("No face could be found for this frame!")
+        all_landmarks = self.__time_iteration("face_alignment", self.face_alignment.get_landmarks(frame, bboxes))
+        return [Face(landmarks, face_box=bbox) for bbox, landmarks in zip(bboxes, all_landmarks)]
 
-        for landmarks in self.face_alignment.get_landmarks(self.__current_frame, bboxes, calibrate=True):
-            self.__landmarks = landmarks
+    def filter_landmarks(self, raw_landmarks: np.ndarray):
+        """
+        Second stage: the temporal landmark filter. Has to run in frame order. Returns a copy of the filtered
+        landmarks.
+        """
+        with self.__time_stage("landmark_filter"):
+            filtered_landmarks = self.landmark_filter.update(raw_landmarks)
+            landmarks = filtered_landmarks.copy()
+            # the eye centers replace some of the landmarks in `__get_eye_sizes()`; as this has always happened on the
+            # filter state itself, the next frame is compared with these values as well
+            filtered_landmarks[[92, 38]] = filtered_landmarks[[88, 34]] = self.__get_eye_centers(filtered_landmarks)
+        return landmarks
+
+    def extract_features(self, frame: np.ndarray, landmarks: np.ndarray, face_box=None, head_pose=None,
+                         iris_meshes=None):
+        """
+        Third stage: head pose, eye features, iris, eye crops and pupil diameters of one face. Only the head pose is
+        warm-started from the last frame, apart from that it doesn't depend on other frames. Returns the values that
+        are needed by `record_features()`.
+        A given head pose (pitch, yaw, roll) and iris landmarks (e.g. from the landmark cache) are used instead of
+        calculating them again; the face box is only passed on to the landmark cache.
+        """
+        self.__current_frame = frame
+        # the landmarks as they are passed in, before some of them are replaced by the eye centers
+        face = Face(landmarks.copy(), face_box)
+        self.__landmarks = landmarks
 
-            if self.__annotation_enabled:
-                self.__show_landmarks()
+        if self.__annotation_enabled:
+            self.__show_landmarks()
 
-            # calculate head pose
-            self.set_camera_matrix(frame_width=frame.shape[1], frame_height=frame.shape[0])
-            _, euler_angle = self.head_pose_estimator.get_head_pose(landmarks)
-            self.__pitch, self.__yaw, self.__roll = euler_angle[:, 0]
+        # calculate head pose (the camera matrix is only created again if the frame size changes)
+        with self.__time_stage("head_pose"):
+            if head_pose is None:
+                self.set_camera_matrix(frame_width=frame.shape[1], frame_height=frame.shape[0])
+                head_pose = self.head_pose_estimator.get_euler_angle(landmarks)[:, 0]
+            self.__pitch, self.__yaw, self.__roll = head_pose
 
-            # calculate eye size, iris and pupil positions
+        # calculate eye markers and eye sizes first so the eye aspect ratio is known before the expensive stages
+        with self.__time_stage("eye_features"):
             self.__get_eye_features()
+            # the same average EAR as in the BlinkDetector
+            self.__eye_aspect_ratio = (eye_aspect_ratio(self.__left_eye) + eye_aspect_ratio(self.__right_eye)) / 2.0
+            self.__eyes_closed = self.__eye_aspect_ratio < BlinkDetector.EYE_CLOSED_EAR_THRESHOLD
+        # the iris and pupil positions of closed eyes would be noise anyway
+        skip_eye_stages = self.__skip_closed_eyes and self.__eyes_closed
+
+        self.__left_pupil_diameter, self.__right_pupil_diameter = None, None
+        # without the iris model the pupils can only be found if the iris was cached for this frame
+        if skip_eye_stages or (self.__landmark_cache_mode == CACHE_READ and iris_meshes is None):
+            self.__pupils = None
+        else:
+            with self.__time_stage("iris"):
+                self.__find_pupils(iris_meshes)
 
-            self.__track_gaze()
-
-            if self.__annotation_enabled:
-                self.__draw_face_landmarks()
-                self.iris_locator.draw_eye_markers(self.__eye_markers, self.__current_frame, thickness=1)
+        with self.__time_stage("gaze"):
+            if self.__pupils is None or self.__production_mode:
+                # the gaze direction itself isn't logged
+                self.__convert_eye_values()
+            else:
+                self.__track_gaze()
 
-            # check if user blinked
-            self.blink_detector.set_current_values(self.__current_frame, self.__left_eye, self.__right_eye,
-                                                   (self.__left_eye_width, self.__left_eye_height),
-                                                   (self.__right_eye_width, self.__right_eye_height))
-            self.blink_detector.detect_blinks()
+        if self.__annotation_enabled:
+            self.__draw_face_landmarks()
+            IrisLocalizationModel.draw_eye_markers(self.__eye_markers, self.__current_frame, thickness=1)
 
-            # extract different parts of the eye region and save them as pngs
+        # extract different parts of the eye region and save them as pngs
+        with self.__time_stage("eye_region"):
             eye_region_bbox = self.__extract_eye_region()
-            left_eye_bbox, right_eye_bbox, left_eye_bbox_small, right_eye_bbox_small = self.__extract_eyes()
+        if not skip_eye_stages:
+            with self.__time_stage("eye_crops"):
+                left_eye_bbox, right_eye_bbox = self.__extract_eyes()
+
+            with self.__time_stage("pupil_diameters"):
+                self.__left_pupil_diameter, self.__right_pupil_diameter = detect_pupils(
+                    left_eye_bbox, right_eye_bbox, self.__annotation_enabled)
+
+        iris_meshes = None if self.__pupils is None else np.array([self.__iris_left, self.__iris_right])
+        return {
+            "face": face._replace(head_pose=np.array(head_pose), iris_meshes=iris_meshes),
+            "tracked_data": {
+                ProcessingData.HEAD_POS_ROLL_PITCH_YAW.name: (self.__roll, self.__pitch, self.__yaw),
+                ProcessingData.LEFT_EYE_CENTER.name: self.__eye_centers[0],
+                ProcessingData.RIGHT_EYE_CENTER.name: self.__eye_centers[1],
+                ProcessingData.LEFT_EYE_WIDTH.name: self.__left_eye_width,
+                ProcessingData.RIGHT_EYE_WIDTH.name: self.__right_eye_width,
+                ProcessingData.LEFT_EYE_HEIGHT.name: self.__left_eye_height,
+                ProcessingData.RIGHT_EYE_HEIGHT.name: self.__right_eye_height,
+                ProcessingData.LEFT_PUPIL_POS.name: self.__pupils[0] if self.__pupils is not None else None,
+                ProcessingData.RIGHT_PUPIL_POS.name: self.__pupils[1] if self.__pupils is not None else None,
+                ProcessingData.LEFT_PUPIL_DIAMETER.name: self.__left_pupil_diameter,
+                ProcessingData.RIGHT_PUPIL_DIAMETER.name: self.__right_pupil_diameter,
+                ProcessingData.EYES_CLOSED.name: self.__eyes_closed,
+                # ProcessingData.FACE_LANDMARKS.name: self.__landmarks,
+            },
+            "eye_region": eye_region_bbox,
+            "eye_markers": (self.__left_eye, self.__right_eye),
+            "eye_aspect_ratio": self.__eye_aspect_ratio,
+            "eye_sizes": ((self.__left_eye_width, self.__left_eye_height),
+                          (self.__right_eye_width, self.__right_eye_height)),
+            "eye_movement": ((self.__landmarks[88, 0], self.__landmarks[88, 1]),
+                             (self.__landmarks[38, 0], self.__landmarks[38, 1]),
+                             (self.__landmarks[89, 0], self.__landmarks[87, 1]),
+                             (self.__landmarks[35, 0], self.__landmarks[33, 1]),
+                             self.__landmarks[93, 0] - self.__landmarks[89, 0],
+                             self.__landmarks[87, 1] - self.__landmarks[94, 1],
+                             self.__landmarks[39, 0] - self.__landmarks[35, 0],
+                             self.__landmarks[33, 1] - self.__landmarks[40, 1]),
+        }
+
+    def record_features(self, features: dict, participant, difficulty, frame_timestamp, frame=None):
+        """
+        Last stage: blink detection, processing log and gaze movement data for the features of one face. Has to run in
+        frame order. The frame is only needed for the blink annotations.
+        """
+        # check if user blinked
+        with self.__time_stage("blinks"):
+            self.blink_detector.set_current_values(frame, *features["eye_markers"], *features["eye_sizes"],
+                                                   eye_aspect_ratio=features["eye_aspect_ratio"])
+            self.blink_detector.detect_blinks()
 
-            self.__left_pupil_diameter, self.__right_pupil_diameter = detect_pupils(left_eye_bbox, right_eye_bbox,
-                                                                                    self.__annotation_enabled)
-            self.__log(eye_region_bbox, frame_timestamp)
+        with self.__time_stage("log"):
+            self.__tracked_data.update(features["tracked_data"])
+            self.__logger.log_frame_data(frame_id=frame_timestamp, data=self.__tracked_data)
+            self.__logger.log_image("eye_regions", "region", features["eye_region"], frame_timestamp)
 
-            # new_eye_region = improve_image(eye_region_bbox)
-            # self.__logger.log_image("eye_regions_improved", "region", new_eye_region, get_timestamp())
+        # new_eye_region = improve_image(eye_region_bbox)
+        # self.__logger.log_image("eye_regions_improved", "region", new_eye_region, get_timestamp())
 
-            detect_pupils(cropped_l_e_img=left_eye_bbox, cropped_r_e_img=right_eye_bbox)
+        with self.__time_stage("gaze_movement"):
+            self.movement_tracker.save_eye_data_to_data_frame(*features["eye_movement"], difficulty, participant,
+                                                              frame_timestamp)
 
-            self.movement_tracker.save_eye_data_to_data_frame((self.__landmarks[88, 0], self.__landmarks[88, 1]),
-                                                              (self.__landmarks[38, 0], self.__landmarks[38, 1]),
-                                                              (self.__landmarks[89, 0], self.__landmarks[87, 1]),
-                                                              (self.__landmarks[35, 0], self.__landmarks[33, 1]),
-                                                              self.__landmarks[93, 0] - self.__landmarks[89, 0],
-                                                              self.__landmarks[87, 1] - self.__landmarks[94, 1],
-                                                              self.__landmarks[39, 0] - self.__landmarks[35, 0],
-                                                              self.__landmarks[33, 1] - self.__landmarks[40, 1],
-                                                              difficulty, participant, frame_timestamp)
+        if self.__landmark_cache_mode == CACHE_WRITE:
+            self.landmark_cache.add(frame_timestamp, features["face"])
 
-        return self.__current_frame
+    def __time_stage(self, stage):
+        return self.stage_timer.measure(stage) if self.stage_timer is not None else nullcontext()
 
-    def __log(self, eye_region_bbox, log_timestamp):
-        # fill dict with all relevant data so we don't have to pass all params manually
-        self.__tracked_data.update({
-            ProcessingData.HEAD_POS_ROLL_PITCH_YAW.name: (self.__roll, self.__pitch, self.__yaw),
-            ProcessingData.LEFT_EYE_CENTER.name: self.__eye_centers[0],
-            ProcessingData.RIGHT_EYE_CENTER.name: self.__eye_centers[1],
-            ProcessingData.LEFT_EYE_WIDTH.name: self.__left_eye_width,
-            ProcessingData.RIGHT_EYE_WIDTH.name: self.__right_eye_width,
-            ProcessingData.LEFT_EYE_HEIGHT.name: self.__left_eye_height,
-            ProcessingData.RIGHT_EYE_HEIGHT.name: self.__right_eye_height,
-            ProcessingData.LEFT_PUPIL_POS.name: self.__pupils[0],
-            ProcessingData.RIGHT_PUPIL_POS.name: self.__pupils[1],
-            ProcessingData.LEFT_PUPIL_DIAMETER.name: self.__left_pupil_diameter,
-            ProcessingData.RIGHT_PUPIL_DIAMETER.name: self.__right_pupil_diameter,
-            # ProcessingData.FACE_LANDMARKS.name: self.__landmarks,
-        })
-
-        self.__logger.log_frame_data(frame_id=log_timestamp, data=self.__tracked_data)
-
-        self.__logger.log_image("eye_regions", "region", eye_region_bbox, log_timestamp)
+    def __time_iteration(self, stage, iterable):
+        return self.stage_timer.time_iteration(stage, iterable) if self.stage_timer is not None else iterable
 
     def log_information(self):
         print("Saving log data ...")
         blink_metrics = self.blink_detector.get_blink_metrics()
         self.__logger.log_blink_info(blink_metrics)
+        if self.__landmark_cache_mode == CACHE_WRITE:
+            cache_path = self.__get_landmark_cache_path()
+            self.landmark_cache.save(cache_path)
+            print(f"[INFO] Saved {len(self.landmark_cache)} faces to the landmark cache {cache_path}")
 
-        # save the logs on a background thread so the ui won't freeze during this!
-        self.save_log_thread = threading.Thread(target=self.__save_post_processing_data, name="SaveLogs", daemon=True)
-        self.save_log_thread.start()
-
-        # we still need to wait for it to finish as otherwise the new data would be added to the same list
-        self.save_log_thread.join()
-
-    def __save_post_processing_data(self):
+        # most rows and images were already written in the background while the frames were processed, this only
+        # writes the rest and waits for the last images
         self.__logger.save_tracking_data()
 
     def __show_landmarks(self):
@@ -183,32 +380,40 @@ class EyeTracker:
 
         show_image_window(frame_copy, window_name="numbered_landmarks", x_pos=1000, y_pos=450)
 
+    def __get_eye_centers(self, landmarks):
+        eye_centers = np.average(np.take(landmarks, CoordinateAlignmentModel.eye_bound, axis=0), axis=1)
+        # swap both eye centers as the left eye is actually the right one
+        # (because the defined eye bounds are using the mirrored image)
+        eye_centers[[0, 1]] = eye_centers[[1, 0]]
+        return eye_centers
+
     def __get_eye_features(self):
-        self.__eye_markers = np.take(self.__landmarks, self.face_alignment.eye_bound, axis=0)
+        self.__eye_markers = np.take(self.__landmarks, CoordinateAlignmentModel.eye_bound, axis=0)
         self.__left_eye = self.__eye_markers[1]
         self.__right_eye = self.__eye_markers[0]
 
-        self.__eye_centers = np.average(self.__eye_markers, axis=1)
-        # swap both eye centers as the left eye is actually the right one
-        # (because the defined eye bounds are using the mirrored image)
-        self.__eye_centers[[0, 1]] = self.__eye_centers[[1, 0]]
+        self.__eye_centers = self.__get_eye_centers(self.__landmarks)
         if self.__debug:
             print(f"Eye markers: {self.__eye_markers}")
             print(f"Eye centers: {self.__eye_centers}")
 
-        self.__find_pupils()
         self.__get_eye_sizes()
 
-    def __find_pupils(self):
-        eye_lengths = (self.__landmarks[[39, 93]] - self.__landmarks[[35, 89]])[:, 0]
-        frame_copy = self.__current_frame.copy()
+    def __find_pupils(self, iris_meshes=None):
+        # the frame only needs to be copied if the pupils are drawn on it
+        frame_copy = self.__current_frame if self.__production_mode else self.__current_frame.copy()
 
-        self.__iris_left = self.iris_locator.get_mesh(frame_copy, eye_lengths[1], self.__eye_centers[0])
-        pupil_left, self.__iris_left_radius = self.iris_locator.draw_pupil(
+        if iris_meshes is not None:
+            self.__iris_left, self.__iris_right = iris_meshes
+        else:
+            eye_lengths = (self.__landmarks[[39, 93]] - self.__landmarks[[35, 89]])[:, 0]
+            # both eyes are processed with a single inference
+            self.__iris_left, self.__iris_right = self.iris_locator.get_meshes(
+                frame_copy, (eye_lengths[1], eye_lengths[0]), (self.__eye_centers[0], self.__eye_centers[1]))
+        pupil_left, self.__iris_left_radius = IrisLocalizationModel.draw_pupil(
             self.__iris_left, frame_copy, annotations_on=self.__annotation_enabled, thickness=1)
 
-        self.__iris_right = self.iris_locator.get_mesh(frame_copy, eye_lengths[0], self.__eye_centers[1])
-        pupil_right, self.__iris_right_radius = self.iris_locator.draw_pupil(
+        pupil_right, self.__iris_right_radius = IrisLocalizationModel.draw_pupil(
             self.__iris_right, frame_copy, annotations_on=self.__annotation_enabled, thickness=1)
 
         self.__pupils = np.array([pupil_left, pupil_right])
@@ -284,6 +489,9 @@ class EyeTracker:
                                             left_eye_y_max, padding=padding)
         right_eye_box = extract_image_region(self.__current_frame, right_eye_x_min, right_eye_y_min, right_eye_x_max,
                                              right_eye_y_max, padding=padding)
+        if self.__production_mode:
+            # the masked eye images below are only needed for the annotations
+            return left_eye_box, right_eye_box
 
         # use a mask to get only the eyes themselves
         frame_shape = (self.__current_frame.shape[0], self.__current_frame.shape[1])
@@ -310,7 +518,7 @@ class EyeTracker:
         # if self.__annotation_enabled and left_eye_box_small is not None:
         #     show_image_window(left_eye_box_small, "Left eyebox small", 450, 200)
 
-        return left_eye_box, right_eye_box, left_eye_box_small, right_eye_box_small
+        return left_eye_box, right_eye_box
 
     def __draw_face_landmarks(self):
         frame_copy = self.__current_frame.copy()  # make a copy so we don't edit the original frame
@@ -318,7 +526,24 @@ class EyeTracker:
             cv2.circle(frame_copy, tuple(mark), radius=1, color=(0, 0, 255), thickness=-1)
         show_image_window(frame_copy, window_name="face landmarks", x_pos=800, y_pos=450)
 
+    def __convert_eye_values(self):
+        """
+        Swaps pupils and eye centers back to their original format (as needed for the gaze direction calculation) and
+        shifts the roll angle by 180°. The converted values are logged, so this has to be done for every frame, even
+        if the gaze direction isn't calculated.
+        """
+        if self.__pupils is not None:
+            self.__pupils[[0, 1]] = self.__pupils[[1, 0]]
+        self.__eye_centers[[0, 1]] = self.__eye_centers[[1, 0]]
+
+        if self.__roll < 0:
+            self.__roll += 180
+        else:
+            self.__roll -= 180
+
     def __track_gaze(self):
+        self.__convert_eye_values()
+
         # landmarks[[35, 89]] and landmarks[[39, 93]] are the start and end marks
         # (i.e. the leftmost and rightmost) for each eye
         poi = self.__landmarks[[35, 89]], self.__landmarks[[39, 93]], self.__pupils, self.__eye_centers
@@ -336,11 +561,6 @@ class EyeTracker:
         else:
             zeta = arctan(end_mean[1] / (end_mean[0] + 1e-7))
 
-        if self.__roll < 0:
-            self.__roll += 180
-        else:
-            self.__roll -= 180
-
         real_angle = zeta + self.__roll * pi / 180
         if self.__debug:
             print(f"Gaze angle: {real_angle}°")
@@ -358,10 +578,6 @@ class EyeTracker:
 
         starts, ends, pupils, centers = poi
 
-        # swap pupils and eye centers back to their original format for the gaze direction calculation
-        pupils[[0, 1]] = pupils[[1, 0]]
-        centers[[0, 1]] = centers[[1, 0]]
-
         eye_length = norm(starts - ends, axis=1)
         ic_distance = norm(pupils - centers, axis=1)
         zc_distance = norm(pupils - starts, axis=1)
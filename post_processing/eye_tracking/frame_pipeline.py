@@ -0,0 +1,125 @@
+"""
+Runs the stages of the EyeTracker for the frames of one difficulty on separate threads that are connected with bounded
+queues, so that e.g. the next images are decoded while the models still work on the current one:
+
+    decode (cv2.imread, timestamp) -> inference (detection, alignment, landmark filter) -> features (head pose, iris,
+    eye crops, pupils) -> output (blinks, processing log, gaze movement data)
+
+Every stage runs on exactly one thread, so the frames stay in order and every stateful part of the EyeTracker is only
+used by a single thread. The stages overlap wherever the native code releases the GIL (image decoding, mxnet and tflite
+inference, most of OpenCV).
+"""
+
+import time
+from queue import Queue
+from threading import Thread
+import cv2
+from post_processing.assign_load_classes import get_timestamp_from_image
+
+# put into a queue after the last frame
+END_OF_STREAM = None
+
+
+class FramePipeline:
+    """
+    Usage:
+        pipeline = FramePipeline(eye_tracker)
+        frame_count = pipeline.process(image_paths, participant, difficulty)
+        pipeline.print_utilization()
+    """
+
+    STAGES = ["decode", "inference", "features", "output"]
+
+    def __init__(self, eye_tracker, queue_size=8):
+        self.eye_tracker = eye_tracker
+        self.queue_size = queue_size
+        self.__error = None
+        self.reset_utilization()
+
+    def reset_utilization(self):
+        self.busy_time = {stage: 0.0 for stage in self.STAGES}
+        self.wall_time = 0.0
+
+    def process(self, image_paths, participant, difficulty):
+        """
+        Processes all given images of one difficulty and returns the number of processed frames. Exceptions of a stage
+        are raised again here once all threads have finished.
+        """
+        self.__error = None
+        decoded_frames, faces, features = (Queue(maxsize=self.queue_size) for _ in range(3))
+        frame_count = 0
+
+        def decode(image_path):
+            return cv2.imread(image_path), get_timestamp_from_image(image_path)
+
+        def run_inference(item):
+            frame, frame_timestamp = item
+            return frame, frame_timestamp, self.eye_tracker.get_frame_faces(frame, frame_timestamp)
+
+        def extract_features(item):
+            frame, frame_timestamp, faces = item
+            return frame_timestamp, [self.eye_tracker.extract_features(frame, *face) for face in faces]
+
+        def record_features(item):
+            nonlocal frame_count
+            frame_timestamp, all_features = item
+            for face_features in all_features:
+                self.eye_tracker.record_features(face_features, participant, difficulty, frame_timestamp)
+            frame_count += 1
+
+        threads = [Thread(target=self.__run_source, args=("decode", decode, image_paths, decoded_frames)),
+                   Thread(target=self.__run_stage, args=("inference", run_inference, decoded_frames, faces)),
+                   Thread(target=self.__run_stage, args=("features", extract_features, faces, features)),
+                   Thread(target=self.__run_stage, args=("output", record_features, features, None))]
+
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_time += time.perf_counter() - start_time
+
+        if self.__error is not None:
+            raise self.__error
+        return frame_count
+
+    def __run_source(self, stage, function, items, out_queue):
+        for item in items:
+            if self.__error is not None:
+                break
+            result = self.__call(stage, function, item)
+            if self.__error is None:
+                out_queue.put(result)
+        out_queue.put(END_OF_STREAM)
+
+    def __run_stage(self, stage, function, in_queue, out_queue):
+        for item in iter(in_queue.get, END_OF_STREAM):
+            # after an error in any stage the remaining items are only taken from the queue so no thread blocks
+            if self.__error is not None:
+                continue
+            result = self.__call(stage, function, item)
+            if out_queue is not None and self.__error is None:
+                out_queue.put(result)
+        if out_queue is not None:
+            out_queue.put(END_OF_STREAM)
+
+    def __call(self, stage, function, item):
+        start_time = time.perf_counter()
+        try:
+            return function(item)
+        except Exception as e:
+            self.__error = e
+        finally:
+            self.busy_time[stage] += time.perf_counter() - start_time
+
+    def get_utilization(self):
+        """
+        Returns the fraction of the wall time each stage was busy; the stage closest to 1 is the bottleneck.
+        """
+        return {stage: busy_time / self.wall_time if self.wall_time > 0 else 0.0
+                for stage, busy_time in self.busy_time.items()}
+
+    def print_utilization(self):
+        print("[INFO] Pipeline stage utilization:")
+        for stage, utilization in self.get_utilization().items():
+            print(f"    {stage}: {utilization * 100:.1f} % ({self.busy_time[stage]:.1f} seconds busy)")
@@ -4,6 +4,13 @@ from scipy.spatial import distance as dist
 import cv2
 import numpy as np
 
+# The indices of the 8 landmarks of both eyes in the 106 landmarks of the alignment model (CoordinateAlignmentModel);
+# the eye bounds are based on the 68 facial points used in the predictor,
+# see https://ibug.doc.ic.ac.uk/resources/facial-point-annotations/
+# and slightly adjusted: see https://github.com/lincolnhard/head-pose-estimation
+EYE_BOUND = ([35, 41, 40, 42, 39, 37, 33, 36],
+             [89, 95, 94, 96, 93, 91, 87, 90])
+
 
 def show_image_window(src, window_name, x_pos, y_pos):
     # shows a named opencv window with the given src content at the specified position on the screen
@@ -258,3 +265,19 @@ def eye_aspect_ratio(eye):
     # compute the eye aspect ratio
     ear = (A + B + C) / (3.0 * D)  # 3*D as we have three vertical but only one horizontal coordinate pair
     return ear
+
+
+def eye_aspect_ratios(eyes):
+    """
+    Vectorized version of `eye_aspect_ratio()` for any number of eyes at once.
+
+    Args:
+        eyes: an array with the shape (..., 8, 2), i.e. the 8 landmarks of every eye
+
+    Returns:
+        an array with the eye-aspect-ratios in the shape of the leading dimensions
+    """
+    eyes = np.asarray(eyes, dtype=np.float64)
+    # the three vertical landmark pairs and the horizontal one, the same pairs as in `eye_aspect_ratio()`
+    distances = np.sqrt(np.sum((eyes[..., [1, 2, 3, 0], :] - eyes[..., [7, 6, 5, 4], :]) ** 2, axis=-1))
+    return (distances[..., 0] + distances[..., 1] + distances[..., 2]) / (3.0 * distances[..., 3])
@@ -0,0 +1,82 @@
+"""
+Per-frame store of the model outputs of the EyeTracker (face box, the filtered 106 landmarks, head pose and iris
+landmarks), so that the features of a recording can be extracted again without running the face detection, the
+alignment and the iris model, e.g. after changing the blink thresholds or the eye crops.
+
+The cache of one difficulty is a single uncompressed npz file with one row per detected face; all values are stored as
+float32 and keyed by the frame timestamp (several rows with the same timestamp if there were several faces). Values
+that weren't computed for a face (e.g. the face box of landmarks that were propagated with the landmark flow or the
+iris of closed eyes with skip_closed_eyes) are stored as NaN and returned as None.
+"""
+
+from collections import defaultdict, namedtuple
+import numpy as np
+
+# the modes of the EyeTracker: write the cache while processing the frames or use it instead of the models
+CACHE_WRITE = "write"
+CACHE_READ = "read"
+
+# face_box: (x1, y1, x2, y2, score), landmarks: (106, 2), head_pose: (pitch, yaw, roll) in degrees,
+# iris_meshes: (2, 5, 2) iris landmarks of both eyes in the same order as returned by the iris model
+Face = namedtuple("Face", ["landmarks", "face_box", "head_pose", "iris_meshes"], defaults=[None, None, None])
+
+VALUE_SHAPES = {"landmarks": (106, 2), "face_box": (5,), "head_pose": (3,), "iris_meshes": (2, 5, 2)}
+
+
+class LandmarkCache:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.__timestamps = []
+        self.__values = {name: [] for name in VALUE_SHAPES}
+        self.__rows_per_timestamp = None
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def add(self, frame_timestamp, face: Face):
+        self.__timestamps.append(str(frame_timestamp))
+        for name, shape in VALUE_SHAPES.items():
+            value = getattr(face, name)
+            self.__values[name].append(np.full(shape, np.nan) if value is None else np.reshape(value, shape))
+
+    def get_faces(self, frame_timestamp):
+        """
+        Returns the cached faces of the frame with the given timestamp (an empty list if no face was found in it). The
+        values are float64 copies, so they can be changed without changing the cache.
+        """
+        if self.__rows_per_timestamp is None:
+            self.__rows_per_timestamp = defaultdict(list)
+            for row, timestamp in enumerate(self.__timestamps):
+                self.__rows_per_timestamp[timestamp].append(row)
+
+        faces = []
+        for row in self.__rows_per_timestamp.get(str(frame_timestamp), []):
+            values = {}
+            for name in VALUE_SHAPES:
+                value = self.__values[name][row].astype(np.float64)
+                values[name] = None if np.isnan(value).all() else value
+            faces.append(Face(**values))
+        return faces
+
+    def get_values(self, name):
+        """
+        Returns the cached values with the given name (one of VALUE_SHAPES) of all faces in the order they were added as
+        float64 array, e.g. to process the landmarks of a whole difficulty at once.
+        """
+        return np.array(self.__values[name], dtype=np.float64).reshape(-1, *VALUE_SHAPES[name])
+
+    def save(self, file_path):
+        arrays = {name: np.array(values, dtype=np.float32).reshape(-1, *VALUE_SHAPES[name])
+                  for name, values in self.__values.items()}
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(file_path, timestamps=np.array(self.__timestamps, dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, file_path):
+        landmark_cache = cls()
+        with np.load(file_path) as cache_file:
+            landmark_cache.__timestamps = cache_file["timestamps"].tolist()
+            landmark_cache.__values = {name: cache_file[name] for name in VALUE_SHAPES}
+        return landmark_cache
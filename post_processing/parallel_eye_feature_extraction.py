@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Runs the eye feature extraction for several participants and difficulties at the same time, or for the frames of a
+single difficulty (see `run_sharded_extraction()`).
+
+Every participant × difficulty is a separate task. The tasks are distributed over a pool of worker processes and
+every worker creates its own EyeTracker (i.e. its own model instances) once and reuses it for all of its tasks. As the
+EyeTracker is reset at the start of every difficulty, the output files are the same as the ones of the sequential
+`process_images()` in extract_eye_features.py.
+"""
+
+import multiprocessing
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import pandas as pd
+from post_processing.assign_load_classes import get_timestamp_from_image
+from post_processing.extract_downloaded_data import get_fps_info
+from post_processing.eye_tracking.landmark_cache import CACHE_WRITE
+from post_processing.post_processing_constants import post_processing_log_folder
+
+# the eye tracker of the current worker process; created once per process in `init_worker()`
+worker_eye_tracker = None
+
+
+def collect_difficulty_tasks(data_folder, participants_folders=list[str], is_evaluation_data=False):
+    """
+    Returns a list of (participant, difficulty, fps, image_paths, is_evaluation_data) tuples for all participants in
+    the data folder. Like in `process_images()` the user is asked first if an existing post processing folder should
+    be overwritten.
+    """
+    tasks = []
+    for participant in os.listdir(data_folder):
+        if len(participants_folders) > 0 and participant not in participants_folders:
+            print(f"\nSkipping folder '{participant}' as it is not in the specified folder names.\n")
+            continue
+
+        post_processing_log_path = os.path.join(data_folder, participant, post_processing_log_folder)
+        if os.path.exists(post_processing_log_path):
+            print(f"A post processing folder already exists for participant '{participant}'!")
+            answer = input("Do you want to overwrite it? [y/n]\n")
+            if str.lower(answer) == "y" or str.lower(answer) == "yes":
+                print(f"\nOverwriting {participant}...\n")
+                shutil.rmtree(post_processing_log_path)
+            else:
+                print(f"\nSkipping folder '{participant}'.\n")
+                continue
+
+        fps = get_fps_info(os.path.join(data_folder, participant, "fps_info.txt"))
+        labeled_images_df = pd.read_csv(os.path.join(data_folder, participant, "labeled_images.csv"))
+        for difficulty_level in labeled_images_df.difficulty.unique():
+            image_paths = labeled_images_df.image_path[labeled_images_df.difficulty == difficulty_level].tolist()
+            tasks.append((participant, difficulty_level, fps, image_paths, is_evaluation_data))
+
+    return tasks
+
+
+def init_worker(eye_tracker_kwargs):
+    global worker_eye_tracker
+    # imported here so the parent process doesn't have to load the models itself
+    from post_processing.eye_tracking.eye_tracker import EyeTracker
+    worker_eye_tracker = EyeTracker(debug_active=False, **eye_tracker_kwargs)
+
+
+def process_difficulty(participant, difficulty_level, fps, image_paths, is_evaluation_data):
+    """
+    Processes all images of one difficulty in the current worker process. The same steps as in `process_images()`.
+    """
+    start_time = time.perf_counter()
+    eye_tracker = worker_eye_tracker
+    eye_tracker.set_current_participant(participant, fps, is_evaluation_data=is_evaluation_data)
+    eye_tracker.set_current_difficulty(difficulty_level)
+
+    for image_path in image_paths:
+        current_image = cv2.imread(image_path)
+        image_timestamp = get_timestamp_from_image(image_path)
+        eye_tracker.process_current_frame(current_image, participant, difficulty_level, image_timestamp)
+
+    eye_tracker.movement_tracker.save_data(participant, difficulty_level, evaluation_study_data=is_evaluation_data)
+    eye_tracker.log_information()
+    eye_tracker.reset_blink_detector()
+
+    return os.getpid(), len(image_paths), time.perf_counter() - start_time
+
+
+def get_worker_eye_tracker_kwargs(num_workers, enable_annotation, landmark_flow, skip_closed_eyes, production_mode,
+                                  landmark_cache_mode=None):
+    if enable_annotation:
+        print("[WARNING] Annotations need OpenCV windows and are disabled for the worker processes!")
+
+    # every process gets an equal share of the cores instead of all processes starting a thread per core; needs to be
+    # set before the workers import mxnet
+    threads_per_worker = max(1, os.cpu_count() // num_workers)
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads_per_worker))
+    os.environ.setdefault("MXNET_CPU_WORKER_NTHREADS", str(threads_per_worker))
+    return {"enable_annotation": False, "landmark_flow": landmark_flow, "skip_closed_eyes": skip_closed_eyes,
+            "production_mode": production_mode, "inference_threads": threads_per_worker,
+            "landmark_cache_mode": landmark_cache_mode}
+
+
+def run_parallel_extraction(tasks, num_workers=None, enable_annotation=False, landmark_flow=False,
+                            skip_closed_eyes=False, production_mode=False, landmark_cache_mode=None):
+    """
+    Processes the given tasks (see `collect_difficulty_tasks()`) with num_workers processes (all cpu cores if None),
+    but never more processes than tasks. The workers never open OpenCV windows. Returns the names of the participants whose difficulties were all
+    processed successfully.
+    """
+    # every difficulty is processed by a single worker, so more workers would only idle and take away cores from the
+    # other workers
+    num_workers = max(1, min(num_workers or os.cpu_count(), len(tasks)))
+    eye_tracker_kwargs = get_worker_eye_tracker_kwargs(num_workers, enable_annotation, landmark_flow, skip_closed_eyes,
+                                                       production_mode, landmark_cache_mode)
+
+    # start with the largest tasks so no worker is left with a long difficulty at the end
+    tasks = sorted(tasks, key=lambda task: len(task[3]), reverse=True)
+    failed_participants = set()
+    worker_frames, worker_durations = defaultdict(int), defaultdict(float)
+    start_time = time.time()
+
+    print(f"[INFO] Processing {len(tasks)} difficulties with {num_workers} worker processes ...")
+    # spawn instead of fork on all systems, forking a process with an initialized mxnet engine isn't safe
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(eye_tracker_kwargs,)) as executor:
+        futures = {executor.submit(process_difficulty, *task): task for task in tasks}
+        for future in as_completed(futures):
+            participant, difficulty_level = futures[future][:2]
+            try:
+                worker_pid, frame_count, duration = future.result()
+            except Exception as e:
+                print(f"[WARNING] Processing '{participant}' ({difficulty_level}) failed: {e}")
+                failed_participants.add(participant)
+                continue
+
+            worker_frames[worker_pid] += frame_count
+            worker_durations[worker_pid] += duration
+            print(f"[INFO] Finished '{participant}' ({difficulty_level}): {frame_count} frames in {duration:.1f} "
+                  f"seconds ({frame_count / duration if duration > 0 else 0:.2f} fps)")
+
+    duration = time.time() - start_time
+    frame_count = sum(worker_frames.values())
+    print("\n[INFO] Throughput per worker:")
+    for i, worker_pid in enumerate(sorted(worker_frames)):
+        worker_fps = worker_frames[worker_pid] / worker_durations[worker_pid] if worker_durations[worker_pid] else 0
+        print(f"    worker {i} (pid {worker_pid}): {worker_frames[worker_pid]} frames, "
+              f"{worker_durations[worker_pid]:.1f} seconds busy, {worker_fps:.2f} fps")
+    print(f"[INFO]: Frame Count: {frame_count}")
+    print(f"[INFO]: Duration: {duration} seconds")
+    print(f"[INFO]: Throughput: {frame_count / duration if duration > 0 else 0:.2f} fps")
+
+    return [participant for participant in dict.fromkeys(task[0] for task in tasks)
+            if participant not in failed_participants]
+
+
+def run_inference_shard(image_paths):
+    """
+    First stage (face detection and alignment) for a shard of consecutive frames in the current worker process.
+    Returns the faces (see landmark_cache.py) of every frame.
+    """
+    return [worker_eye_tracker.run_inference(cv2.imread(image_path)) for image_path in image_paths]
+
+
+def extract_features_shard(image_paths, shard_faces):
+    """
+    Third stage (head pose, eye features, iris, crops and pupil diameters) for a shard of consecutive frames in the
+    current worker process. The head pose is warm-started from the previous frame only within the shard.
+    """
+    worker_eye_tracker.head_pose_estimator.reset_pose()
+    shard_features = []
+    for image_path, frame_faces in zip(image_paths, shard_faces):
+        frame = cv2.imread(image_path)
+        shard_features.append([worker_eye_tracker.extract_features(frame, *face) for face in frame_faces])
+    return shard_features
+
+
+def split_into_shards(items, num_shards):
+    shard_size = max(1, -(-len(items) // num_shards))  # ceil division
+    return [items[i: i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def run_sharded_extraction(tasks, num_workers=None, enable_annotation=False, skip_closed_eyes=False,
+                           production_mode=False, shards_per_worker=2, cache_landmarks=False):
+    """
+    Processes the given tasks (see `collect_difficulty_tasks()`) one after another, but splits the frames of every
+    difficulty into shards of consecutive frames that are processed by num_workers processes (all cpu cores if None).
+    Only the stages of the EyeTracker that need the frames in order (the landmark filter and the blink detection,
+    logging and gaze movement data) run in this process:
+
+        run_inference (shards in parallel) -> filter_landmarks (in order) -> extract_features (shards in parallel)
+        -> record_features (in order)
+
+    The landmark flow can't be used here as it needs the previous frame. Apart from the head pose, which starts from
+    the predefined pose at the start of every shard, the results are the same as those of `process_images()`.
+    With cache_landmarks the landmark cache is written (the cached landmarks can't be used here, see
+    `run_parallel_extraction()` for this).
+    Returns the names of the participants whose difficulties were all processed successfully.
+    """
+    from post_processing.eye_tracking.eye_tracker import EyeTracker
+
+    num_workers = num_workers or os.cpu_count()
+    eye_tracker_kwargs = get_worker_eye_tracker_kwargs(num_workers, enable_annotation, False, skip_closed_eyes,
+                                                       production_mode)
+    # this eye tracker only runs the ordered stages (and writes the landmark cache), so the models aren't loaded here
+    eye_tracker = EyeTracker(debug_active=False, load_models=False,
+                             **{**eye_tracker_kwargs, "landmark_cache_mode": CACHE_WRITE if cache_landmarks else None})
+
+    failed_participants = set()
+    stage_durations = defaultdict(float)
+    frame_count, start_time = 0, time.time()
+
+    print(f"[INFO] Processing {len(tasks)} difficulties with {num_workers} worker processes ...")
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(eye_tracker_kwargs,)) as executor:
+        for participant, difficulty_level, fps, image_paths, is_evaluation_data in tasks:
+            print(f"Processing images for '{participant}'; current difficulty: {difficulty_level}")
+            path_shards = split_into_shards(image_paths, num_workers * shards_per_worker)
+            try:
+                stage_start = time.perf_counter()
+                face_shards = list(executor.map(run_inference_shard, path_shards))
+                stage_durations["run_inference"] += time.perf_counter() - stage_start
+
+                stage_start = time.perf_counter()
+                eye_tracker.set_current_participant(participant, fps, is_evaluation_data=is_evaluation_data)
+                eye_tracker.set_current_difficulty(difficulty_level)
+                filtered_shards = [[[face._replace(landmarks=eye_tracker.filter_landmarks(face.landmarks))
+                                     for face in frame_faces] for frame_faces in face_shard]
+                                   for face_shard in face_shards]
+                stage_durations["filter_landmarks"] += time.perf_counter() - stage_start
+
+                stage_start = time.perf_counter()
+                feature_shards = list(executor.map(extract_features_shard, path_shards, filtered_shards))
+                stage_durations["extract_features"] += time.perf_counter() - stage_start
+            except Exception as e:
+                print(f"[WARNING] Processing '{participant}' ({difficulty_level}) failed: {e}")
+                failed_participants.add(participant)
+                continue
+
+            stage_start = time.perf_counter()
+            for path_shard, feature_shard in zip(path_shards, feature_shards):
+                for image_path, frame_features in zip(path_shard, feature_shard):
+                    image_timestamp = get_timestamp_from_image(image_path)
+                    for features in frame_features:
+                        eye_tracker.record_features(features, participant, difficulty_level, image_timestamp)
+
+            eye_tracker.movement_tracker.save_data(participant, difficulty_level,
+                                                   evaluation_study_data=is_evaluation_data)
+            eye_tracker.log_information()
+            eye_tracker.reset_blink_detector()
+            stage_durations["record_features"] += time.perf_counter() - stage_start
+            frame_count += len(image_paths)
+
+    duration = time.time() - start_time
+    print("\n[INFO] Time per stage:")
+    for stage, stage_duration in stage_durations.items():
+        print(f"    {stage}: {stage_duration:.1f} seconds")
+    print(f"[INFO]: Frame Count: {frame_count}")
+    print(f"[INFO]: Duration: {duration} seconds")
+    print(f"[INFO]: Throughput: {frame_count / duration if duration > 0 else 0:.2f} fps")
+
+    return [participant for participant in dict.fromkeys(task[0] for task in tasks)
+            if participant not in failed_participants]
@@ -4,6 +4,8 @@ download_folder = "tracking_data_download"
 image_folder = "extracted_images"
 logs_folder = "extracted_logs"
 post_processing_log_folder = "post_processing_data"
+# outside of the post processing folder on purpose, so it isn't removed if the post processing data is overwritten
+landmark_cache_folder = "landmark_cache"
 
 blur_threshold = 25  # determined by testing with different participants
 
@@ -1,7 +1,6 @@
 #!/usr/bin/python3
 # -*- coding:utf-8 -*-
 
-from machine_learning_predictor.feature_extraction.pupil_movement_calculation import PupilMovementCalculation
 from post_processing.download_data import download_data_from_server
 from post_processing.evaluation_study.assign_difficulty_labels_evaluation import assign_evaluation_labels
 from post_processing.evaluation_study.download_evaluation_data import download_evaluation_data_from_server
@@ -21,11 +20,10 @@ def start_train_pipeline():
     download_data_from_server(folder_names=[])
     extract_data(participant_list=[])
     assign_labels(participant_list=[])
+    # the pupil movement data is saved while extracting the eye features (the PupilMovementCalculation is only needed
+    # to calculate it again from existing eye movement data)
     start_extracting_eye_features(participant_list=[], debug=False, enable_annotation=False)
 
-    pupil_movement_calculator = PupilMovementCalculation()
-    pupil_movement_calculator.calculate_pupil_movement(is_evaluation_data=False)
-
 
 def start_evaluation_pipeline():
     download_evaluation_data_from_server(folder_names=[])
@@ -33,9 +31,6 @@ def start_evaluation_pipeline():
     assign_evaluation_labels(participant_list=[])
     start_extracting_evaluation_eye_features(participant_list=[], enable_annotation=False)
 
-    pupil_movement_calculator = PupilMovementCalculation()
-    pupil_movement_calculator.calculate_pupil_movement(is_evaluation_data=True)
-
 
 def main(train_pipeline_active=True, evaluation_pipeline_active=True):
     if train_pipeline_active:
@@ -13,6 +13,10 @@ class BlinkDetector:
     # 10(85), 20130227.
     BLINK_MAX_DURATION = 300  # in ms
 
+    # Below this (average) EAR the eyes are considered closed. Chosen conservatively as with the 8 eye markers the EAR
+    # of an open eye is usually far above this value and a half-closed eye should still be processed.
+    EYE_CLOSED_EAR_THRESHOLD = 0.15
+
     def __init__(self, show_annotation: bool):
         self.__show_annotation = show_annotation
         self.__init_values()
@@ -25,11 +29,17 @@ class BlinkDetector:
         self.eye_aspect_ratios = []
         self.blink_durations = []
 
-    def set_current_values(self, curr_frame, left_eye, right_eye, left_eye_size, right_eye_size):
+    def set_current_values(self, curr_frame, left_eye, right_eye, left_eye_size, right_eye_size,
+                           eye_aspect_ratio=None):
+        """
+        The eye aspect ratio for these values can be passed if it is already known, otherwise it is calculated on the
+        first call of `get_eye_aspect_ratio()`.
+        """
         self.__current_frame = curr_frame
         self.__left_eye, self.__right_eye = left_eye, right_eye
         self.__left_eye_width, self.__left_eye_height = left_eye_size
         self.__right_eye_width, self.__right_eye_height = right_eye_size
+        self.__current_ratio = eye_aspect_ratio
 
     def set_participant_fps(self, fps_val):
         self.__participant_fps = fps_val
@@ -59,6 +69,22 @@ class BlinkDetector:
                 "avg_blink_duration_in_ms": np.mean(self.blink_durations) if len(self.blink_durations) > 0 else 0,
                 }
 
+    def get_eye_aspect_ratio(self):
+        """
+        Returns the average EAR of both eyes for the current values; it is calculated only once per frame.
+        """
+        if self.__current_ratio is None:
+            # calculate the EAR for both eyes
+            leftEAR = eye_aspect_ratio(self.__left_eye)
+            rightEAR = eye_aspect_ratio(self.__right_eye)
+            # Take the average eye aspect ratio of both eyes as a better and more stable estimate,
+            # see Cech, J., & Soukupova, T. (2016). Real-time eye blink detection using facial landmarks.
+            # Cent. Mach. Perception, Dep. Cybern. Fac. Electr. Eng. Czech Tech. Univ. Prague, 1-8.
+            # Note: this assumes that a person blinks with both eyes at the same time!
+            # -> if the user blinks with one eye only this might not be detected
+            self.__current_ratio = (leftEAR + rightEAR) / 2.0
+        return self.__current_ratio
+
     def __reset_blink_onset(self):
         self.__blink_onset = False
         self.__consecutive_frames_counter = 0
@@ -77,15 +103,7 @@ class BlinkDetector:
         """
         self.__frame_count += 1
 
-        # calculate the EAR for both eyes
-        leftEAR = eye_aspect_ratio(self.__left_eye)
-        rightEAR = eye_aspect_ratio(self.__right_eye)
-        # Take the average eye aspect ratio of both eyes as a better and more stable estimate,
-        # see Cech, J., & Soukupova, T. (2016). Real-time eye blink detection using facial landmarks.
-        # Cent. Mach. Perception, Dep. Cybern. Fac. Electr. Eng. Czech Tech. Univ. Prague, 1-8.
-        # Note: this assumes that a person blinks with both eyes at the same time!
-        # -> if the user blinks with one eye only this might not be detected
-        ear = (leftEAR + rightEAR) / 2.0
+        ear = self.get_eye_aspect_ratio()
         self.eye_aspect_ratios.append(ear)
 
         if self.__last_ratio is None:
@@ -5,6 +5,8 @@ import numpy as np
 import cv2
 import collections
 import mxnet as mx
+from post_processing.eye_tracking.image_utils import EYE_BOUND
+from tracking_service.face_detector import QUANTIZED_SUFFIX
 
 pred_type = collections.namedtuple('prediction', ['slice', 'close', 'color'])
 pred_types = {'face': pred_type(slice(0, 17), False, (173.91, 198.9, 231.795, 0.5)),
@@ -18,15 +20,71 @@ pred_types = {'face': pred_type(slice(0, 17), False, (173.91, 198.9, 231.795, 0.
               'teeth': pred_type(slice(60, 68), True, (151.98, 223.125, 137.955, 0.4))}
 
 
+def calibrate_landmarks(pre_landmarks, pred, thd):
+    """
+    Temporal filter for the landmarks: every landmark that moved less than thd pixels along both axes since the last
+    frame keeps its previous position, all others are updated with the new prediction. pre_landmarks is updated in
+    place (on the first frame, i.e. if it is None, the prediction itself is used) and returned.
+    """
+    if pre_landmarks is None:
+        return pred
+
+    moved = (np.abs(pre_landmarks - pred) < thd).sum(axis=1) != 2
+    pre_landmarks[moved] = pred[moved]
+    return pre_landmarks
+
+
+class LandmarkTemporalFilter:
+    """
+    The landmark calibration of the CoordinateAlignmentModel as a standalone component, e.g. to filter stored landmark
+    sequences again without running the model.
+
+    Usage:
+        landmark_filter = LandmarkTemporalFilter()
+        filtered_landmarks = landmark_filter.filter_sequence(raw_landmarks)  # shape (frames, 106, 2)
+    """
+
+    def __init__(self, threshold=.8):
+        self.threshold = threshold
+        self.landmarks = None
+
+    def reset(self):
+        self.landmarks = None
+
+    def update(self, pred):
+        """
+        Filters the landmarks of the next frame. Like in the model, the returned array is the internal state of the
+        filter and changes with the next update.
+        """
+        self.landmarks = calibrate_landmarks(self.landmarks, pred, self.threshold)
+        return self.landmarks
+
+    def filter_sequence(self, landmark_sequence):
+        """
+        Filters a whole sequence of landmarks (starting with a new filter state) and returns the filtered landmarks
+        as a new array; the given landmarks are not modified.
+        """
+        self.reset()
+        landmark_sequence = np.asarray(landmark_sequence)
+        filtered_landmarks = np.empty_like(landmark_sequence)
+        for i, pred in enumerate(landmark_sequence):
+            filtered_landmarks[i] = self.update(pred.copy())
+        return filtered_landmarks
+
+
 class BaseAlignmentorModel:
-    def __init__(self, prefix, epoch, shape, gpu=-1, verbose=False):
+    def __init__(self, prefix, epoch, shape, gpu=-1, verbose=False, quantized=False):
         self._device = gpu
         self._ctx = mx.cpu() if self._device < 0 else mx.gpu(self._device)
 
+        # the int8 version of the model is created with `weights/quantize_models.py`
+        if quantized:
+            prefix = f"{prefix}{QUANTIZED_SUFFIX}"
         self.model = self._load_model(prefix, epoch, shape)
         self.exec_group = self.model._exec_group
 
         self.input_shape = shape[-2:]
+        self.batch_size = shape[0]
         self.pre_landmarks = None
 
     def _load_model(self, prefix, epoch, shape):
@@ -48,42 +106,67 @@ class BaseAlignmentorModel:
 
 
 class CoordinateAlignmentModel(BaseAlignmentorModel):
-    def __init__(self, prefix, epoch, gpu=-1, verbose=False):
+    # the eye landmarks of both eyes (defined in image_utils so they can be used without mxnet, e.g. with the
+    # landmark cache)
+    eye_bound = EYE_BOUND
+
+    def __init__(self, prefix, epoch, gpu=-1, verbose=False, quantized=False):
         shape = (1, 3, 192, 192)
-        super().__init__(prefix, epoch, shape, gpu, verbose)
+        super().__init__(prefix, epoch, shape, gpu, verbose, quantized)
         self.trans_distance = self.input_shape[-1] >> 1
+        # preallocated buffers for the preprocessing of a single face, see `_preprocess()`
+        self._crop_buffer = np.empty((*self.input_shape, 3), dtype=np.uint8)
+        self._input_buffer = np.empty(shape, dtype=np.float32)
         self.marker_nums = 106
-        # The eye bounds are based on the 68 facial points used in the predictor,
-        # see https://ibug.doc.ic.ac.uk/resources/facial-point-annotations/
-        # and slightly adjusted: see https://github.com/lincolnhard/head-pose-estimation
-        self.eye_bound = ([35, 41, 40, 42, 39, 37, 33, 36],
-                          [89, 95, 94, 96, 93, 91, 87, 90])
 
-    def _preprocess(self, img, bbox):
+    def _get_transform(self, bbox):
         maximum_edge = max(bbox[2:4] - bbox[:2]) * 3.0
         scale = (self.trans_distance << 2) / maximum_edge
         center = (bbox[2:4] + bbox[:2]) / 2.0
         cx, cy = self.trans_distance - scale * center
 
-        M = np.array([[scale, 0, cx], [0, scale, cy]])
+        return np.array([[scale, 0, cx], [0, scale, cy]])
 
-        cropped = cv2.warpAffine(img, M, self.input_shape, borderValue=0.0)
-        inp = cropped[..., ::-1].transpose(2, 0, 1)[None, ...]
+    def _warp(self, img, M):
+        """
+        Warps the face into the preallocated crop buffer and returns it as a (channels reversed, transposed) view, so
+        it has to be copied before the next call. OpenCV only reuses the buffer for 3-channel uint8 images and returns
+        a new array for all others.
+        """
+        crop = cv2.warpAffine(img, M, self.input_shape, dst=self._crop_buffer, borderValue=0.0)
+        return crop[..., ::-1].transpose(2, 0, 1)
+
+    def _preprocess(self, img, bbox):
+        """
+        Returns the model input in the preallocated float32 staging buffer (which is overwritten by the next call)
+        and the affine transformation matrix.
+        """
+        M = self._get_transform(bbox)
+        # the channel reversal, the transposition and the conversion to float32 all happen in this single copy
+        np.copyto(self._input_buffer[0], self._warp(img, M))
+
+        return self._input_buffer, M
 
-        return mx.nd.array(inp), M
+    def _set_batch_size(self, batch_size):
+        if batch_size != self.batch_size:
+            self.exec_group.reshape([mx.io.DataDesc('data', (batch_size, 3, *self.input_shape))], None)
+            self.batch_size = batch_size
 
     def _inference(self, x):
-        self.exec_group.data_arrays[0][0][1][:] = x.astype(np.float32)
+        self._set_batch_size(1)
+        # x is already float32, so this is only the copy into the bound input array
+        self.exec_group.data_arrays[0][0][1][:] = x
         self.exec_group.execs[0].forward(is_train=False)
         return self.exec_group.execs[0].outputs[-1][-1]
 
     def _postprocess(self, out, M):
+        return self._postprocess_prediction(out.asnumpy(), M)
+
+    def _postprocess_prediction(self, pred, M):
         iM = cv2.invertAffineTransform(M)
         col = np.ones((self.marker_nums, 1))
 
-        out = out.reshape((self.marker_nums, 2))
-
-        pred = out.asnumpy()
+        pred = pred.reshape((self.marker_nums, 2))
         pred += 1
         pred *= self.trans_distance
 
@@ -94,13 +177,7 @@ class CoordinateAlignmentModel(BaseAlignmentorModel):
         return pred @ iM.T  # dot product
 
     def _calibrate(self, pred, thd):
-        if self.pre_landmarks is not None:
-            for i in range(self.marker_nums):
-                if sum(abs(self.pre_landmarks[i] - pred[i]) < thd) != 2:
-                    self.pre_landmarks[i] = pred[i]
-        else:
-            self.pre_landmarks = pred
-
+        self.pre_landmarks = calibrate_landmarks(self.pre_landmarks, pred, thd)
         return self.pre_landmarks
 
     def get_landmarks(self, image, detected_faces=None, calibrate=False):
@@ -124,6 +201,41 @@ class CoordinateAlignmentModel(BaseAlignmentorModel):
 
             yield self._calibrate(pred, .8) if calibrate else pred
 
+    def get_landmarks_batch(self, images, bboxes, calibrate=False):
+        """Predict the landmarks for one face in each of the given images with a single forward pass.
+
+        Meant for the offline processing where the frames are already known in advance; the results are the same as
+        calling `get_landmarks()` for every image one after another (the calibration is applied in the given order).
+
+        Arguments:
+            images {list of numpy.array} -- The input images.
+            bboxes {list of numpy.array} -- One bounding box for each image (format: {x1, y1, x2, y2, score})
+
+        Returns:
+            list of numpy.array -- the landmarks for each image
+        """
+        if len(images) == 0:
+            return []
+
+        batch = np.empty((len(images), 3, *self.input_shape), dtype=np.float32)
+        transforms = []
+        for i, (image, bbox) in enumerate(zip(images, bboxes)):
+            M = self._get_transform(bbox)
+            np.copyto(batch[i], self._warp(image, M))
+            transforms.append(M)
+
+        self._set_batch_size(len(images))
+        self.exec_group.data_arrays[0][0][1][:] = batch
+        self.exec_group.execs[0].forward(is_train=False)
+        outputs = self.exec_group.execs[0].outputs[-1].asnumpy()
+
+        landmarks = []
+        for out, M in zip(outputs, transforms):
+            pred = self._postprocess_prediction(out, M)
+            # copy the calibrated landmarks as `_calibrate()` always returns the same array
+            landmarks.append(self._calibrate(pred, .8).copy() if calibrate else pred)
+        return landmarks
+
 
 if __name__ == '__main__':
 
@@ -2,11 +2,25 @@
 # -*- coding:utf-8 -*-
 
 import os
+import numpy as np
 import pandas as pd
+from post_processing_service.pupil_movement_tracker import PupilMovementTracker
 
 
 # SEQUENCE_LENGTH = 200
 
+# the csv columns of the eye movement data (the positions are written as "(x, y)" tuples)
+EYE_MOVEMENT_COLUMNS = ['participant', 'difficulty', 'left_pupil_position', 'right_pupil_position', 'left_eye_position',
+                        'right_eye_position', 'left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y',
+                        'right_eye_size_y', 'time_stamp']
+# the numeric columns of the buffer and the npz file (the positions are split into x and y)
+NUMERIC_COLUMNS = ['left_pupil_position_x', 'left_pupil_position_y', 'right_pupil_position_x',
+                   'right_pupil_position_y', 'left_eye_position_x', 'left_eye_position_y', 'right_eye_position_x',
+                   'right_eye_position_y', 'left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y', 'right_eye_size_y']
+# number of rows of every buffer chunk; a new chunk is allocated when the current one is full, so the rows that were
+# already added are never copied while a difficulty is processed
+CHUNK_ROWS = 4096
+
 
 class GazeMovementTracker:
     def __init__(self):
@@ -19,28 +33,65 @@ class GazeMovementTracker:
         self.last_time_stamp = None
         self.pupil_movement_array = []
         self.difficulties = []
-        self.movement_df = pd.DataFrame(
-            columns=['participant', 'difficulty', 'left_pupil_position', 'right_pupil_position', 'left_eye_position',
-                     'right_eye_position', 'left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y', 'right_eye_size_y',
-                     'time_stamp'])
+        # the pupil movement features are updated for every frame, so they don't have to be calculated from the saved
+        # eye movement data afterwards
+        self.pupil_movement_tracker = PupilMovementTracker()
+        self.__reset_buffer()
+
+    def __reset_buffer(self):
+        self.__chunks = []
+        self.__current_chunk = np.empty((CHUNK_ROWS, len(NUMERIC_COLUMNS)), dtype=np.float64)
+        self.__row_count = 0
+        self.__participants, self.__difficulties, self.__timestamps = [], [], []
 
     def save_eye_data_to_data_frame(self, left_pupil_position, right_pupil_position, left_eye_position,
                                     right_eye_position, left_eye_size_x, left_eye_size_y, right_eye_size_x,
                                     right_eye_size_y, difficulty, participant, timestamp):
+        row = self.__row_count % CHUNK_ROWS
+        if row == 0 and self.__row_count > 0:
+            self.__chunks.append(self.__current_chunk)
+            self.__current_chunk = np.empty((CHUNK_ROWS, len(NUMERIC_COLUMNS)), dtype=np.float64)
+
+        self.__current_chunk[row] = (*left_pupil_position, *right_pupil_position, *left_eye_position,
+                                     *right_eye_position, left_eye_size_x, right_eye_size_x, left_eye_size_y,
+                                     right_eye_size_y)
+        self.__participants.append(participant)
+        self.__difficulties.append(difficulty)
+        self.__timestamps.append(timestamp)
+        self.__row_count += 1
 
-        self.movement_df = self.movement_df.append({'participant': participant, 'difficulty': difficulty,
-                                                    'left_pupil_position': left_pupil_position,
-                                                    'right_pupil_position': right_pupil_position,
-                                                    'left_eye_position': left_eye_position,
-                                                    'right_eye_position': right_eye_position,
-                                                    'left_eye_size_x': left_eye_size_x,
-                                                    'right_eye_size_x': right_eye_size_x,
-                                                    'left_eye_size_y': left_eye_size_y,
-                                                    'right_eye_size_y': right_eye_size_y,
-                                                    'time_stamp': timestamp},
-                                                   ignore_index=True)
+        self.pupil_movement_tracker.add_frame(left_pupil_position, right_pupil_position, left_eye_position,
+                                              right_eye_position, left_eye_size_x, left_eye_size_y, right_eye_size_x,
+                                              right_eye_size_y, difficulty, participant, timestamp)
+
+    def get_values(self):
+        """
+        Returns the numeric values of all rows since the last `save_data()` as an array with the NUMERIC_COLUMNS.
+        """
+        values = np.concatenate([*self.__chunks, self.__current_chunk])
+        return values[:self.__row_count]
+
+    def get_data_frame(self):
+        """
+        The eye movement data in the csv format (EYE_MOVEMENT_COLUMNS).
+        """
+        values = self.get_values()
+        movement_df = pd.DataFrame({'participant': self.__participants, 'difficulty': self.__difficulties},
+                                   columns=EYE_MOVEMENT_COLUMNS)
+        for column, first_column in [('left_pupil_position', 0), ('right_pupil_position', 2),
+                                     ('left_eye_position', 4), ('right_eye_position', 6)]:
+            movement_df[column] = [f"({x}, {y})" for x, y in values[:, first_column: first_column + 2].tolist()]
+        for column in ['left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y', 'right_eye_size_y']:
+            movement_df[column] = values[:, NUMERIC_COLUMNS.index(column)]
+        movement_df['time_stamp'] = self.__timestamps
+        return movement_df
 
     def save_data(self, participant, difficulty, evaluation_study_data: bool):
+        """
+        Saves the eye movement data of the current difficulty as csv file and with the numeric columns as npz file
+        (which can be loaded without parsing the position strings) as well as its pupil movement data and resets the
+        buffer.
+        """
         # use os.path.dirname(__file__) to get the correct path to this file independent of the calling location
         ml_folder = os.path.join(os.path.dirname(__file__), "..", "machine_learning_predictor")
         if evaluation_study_data:
@@ -53,8 +104,15 @@ class GazeMovementTracker:
             os.makedirs(output_eye_data_folder)
 
         eye_movement_path = os.path.join(output_eye_data_folder, f"eye_movement_{participant}_{difficulty}.csv")
-        self.movement_df.to_csv(eye_movement_path, index=False)
-        self.movement_df = pd.DataFrame(
-            columns=['participant', 'difficulty', 'left_pupil_position', 'right_pupil_position', 'left_eye_position',
-                     'right_eye_position', 'left_eye_size_x', 'right_eye_size_x', 'left_eye_size_y', 'right_eye_size_y',
-                     'time_stamp'])
+        self.get_data_frame().to_csv(eye_movement_path, index=False)
+
+        values = self.get_values()
+        try:
+            # the timestamps of the images
+            timestamps = np.array(self.__timestamps, dtype=np.int64)
+        except (ValueError, TypeError):
+            timestamps = np.array(self.__timestamps, dtype=str)
+        np.savez(eye_movement_path.removesuffix(".csv") + ".npz", participant=participant, difficulty=difficulty,
+                 time_stamp=timestamps, **{column: values[:, i] for i, column in enumerate(NUMERIC_COLUMNS)})
+        self.__reset_buffer()
+        self.pupil_movement_tracker.save_data(participant, difficulty, evaluation_study_data)
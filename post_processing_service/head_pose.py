@@ -12,12 +12,26 @@ class HeadPoseEstimator:
         self.origin_width = 144.76935
         self.origin_height = 139.839
 
+        self.camera_size = None
+        self.reset_pose()
+
     def set_camera_matrix(self, W, H):
+        # the camera matrix only depends on the frame size, so it is created again only if the size changes
+        if self.camera_size == (W, H):
+            return
+        self.camera_size = W, H
         self.cam_matrix = np.array([[W, 0, W / 2.0],
                                     [0, W, H / 2.0],
                                     [0, 0, 1]])
 
-    def get_head_pose(self, shape):
+    def reset_pose(self):
+        """
+        Starts the next `get_euler_angle()` call from the predefined pose again, e.g. for a new video.
+        """
+        self.last_r_vec, self.last_t_vec = self.r_vec, self.t_vec
+
+    @staticmethod
+    def _get_image_points(shape):
         if len(shape) == 68:
             image_pts = shape
         elif len(shape) == 106:
@@ -44,6 +58,40 @@ class HeadPoseEstimator:
         else:
             raise RuntimeError('Unsupported shape format')
 
+        return image_pts
+
+    @staticmethod
+    def _get_euler_angle(rotation_vec, translation_vec):
+        rotation_mat, _ = cv2.Rodrigues(rotation_vec)
+        pose_mat = cv2.hconcat((rotation_mat, translation_vec))
+        return cv2.decomposeProjectionMatrix(pose_mat)[-1]
+
+    def get_euler_angle(self, shape):
+        """
+        Pose-only version of `get_head_pose()`: solvePnP starts from the pose of the last call instead of the
+        predefined one (which needs fewer iterations for consecutive frames) and the reprojection of the head pose box
+        is skipped.
+        """
+        image_pts = self._get_image_points(shape)
+        ret, rotation_vec, translation_vec = cv2.solvePnP(
+            self.object_pts,
+            image_pts,
+            cameraMatrix=self.cam_matrix,
+            distCoeffs=None,
+            rvec=self.last_r_vec,
+            tvec=self.last_t_vec,
+            useExtrinsicGuess=True)
+
+        if ret:
+            self.last_r_vec, self.last_t_vec = rotation_vec, translation_vec
+        else:
+            self.reset_pose()
+
+        return self._get_euler_angle(rotation_vec, translation_vec)
+
+    def get_head_pose(self, shape):
+        image_pts = self._get_image_points(shape)
+
         # start_time = time.perf_counter()
 
         ret, rotation_vec, translation_vec = cv2.solvePnP(
@@ -91,9 +139,7 @@ class HeadPoseEstimator:
         reprojectdst = reprojectdst.transpose((1, 0, 2)).astype(np.int32)
 
         # calc euler angle
-        rotation_mat, _ = cv2.Rodrigues(rotation_vec)
-        pose_mat = cv2.hconcat((rotation_mat, translation_vec))
-        euler_angle = cv2.decomposeProjectionMatrix(pose_mat)[-1]
+        euler_angle = self._get_euler_angle(rotation_vec, translation_vec)
 
         return reprojectdst, euler_angle
 
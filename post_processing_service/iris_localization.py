@@ -1,23 +1,80 @@
+import sys
 import cv2
-import tensorflow as tf
 import numpy as np
+
+# Only the tflite interpreter is needed for the iris model, so one of the lightweight tflite runtimes is used if it is
+# installed (`pip install tflite-runtime` or its successor `pip install ai-edge-litert`), as importing the full
+# tensorflow package takes several seconds and hundreds of MB of memory.
+try:
+    import tflite_runtime.interpreter as tflite
+    INTERPRETER_PACKAGE = "tflite_runtime"
+except ImportError:
+    try:
+        import ai_edge_litert.interpreter as tflite
+        INTERPRETER_PACKAGE = "ai_edge_litert"
+    except ImportError:
+        tflite = None
+        INTERPRETER_PACKAGE = "tensorflow"
+
+if tflite is not None:
+    Interpreter = tflite.Interpreter
+    # older versions don't have the op resolver option (and don't apply XNNPACK by default either)
+    OpResolverType = getattr(tflite, "OpResolverType", None)
+else:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+    OpResolverType = getattr(tf.lite.experimental, "OpResolverType", None)
 from post_processing.eye_tracking.image_utils import show_image_window
 
 
 class IrisLocalizationModel:
 
-    def __init__(self, filepath):
-        # Load the TFLite model and allocate tensors.
-        self.interpreter = tf.lite.Interpreter(model_path=filepath)
+    def __init__(self, filepath, num_threads=None, use_xnnpack=True):
+        """
+        Args:
+            num_threads: number of threads for the inference; if None tflite decides on its own
+            use_xnnpack: if False, the XNNPACK delegate that tflite applies by default for float models is disabled
+        """
+        self.__filepath = filepath
+        self.__num_threads = num_threads
+        self.__use_xnnpack = use_xnnpack
+
+        # Load the TFLite model and allocate tensors
+        self.interpreter = self._create_interpreter()
         self.interpreter.allocate_tensors()
 
         # Get input and output tensors.
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
 
+        # second interpreter with an input batch of 2 for both eyes, created on the first call of `get_meshes()`
+        self.batch_interpreter = None
+        self.__batch_supported = True
+
         self.trans_distance = 32
         self.input_shape = (64, 64)
 
+    def _create_interpreter(self):
+        options = {}
+        if not self.__use_xnnpack:
+            op_resolver_type = getattr(OpResolverType, "BUILTIN_WITHOUT_DEFAULT_DELEGATES", None)
+            if op_resolver_type is not None:
+                options["experimental_op_resolver_type"] = op_resolver_type
+
+        return Interpreter(model_path=self.__filepath, num_threads=self.__num_threads, **options)
+
+    def _create_batch_interpreter(self, batch_size):
+        interpreter = self._create_interpreter()
+        input_index = interpreter.get_input_details()[0]["index"]
+        interpreter.resize_tensor_input(input_index, [batch_size, *self.input_shape, 3])
+        try:
+            interpreter.allocate_tensors()
+        except (RuntimeError, ValueError) as e:
+            sys.stderr.write(f"[WARNING] The iris model doesn't support a batch size of {batch_size} ({e}); both eyes "
+                             f"are processed one after another instead!\n")
+            return None
+        return interpreter
+
     def _preprocess(self, img, length, center, name=None):
         """Preprocess the image to meet the model's input requirement.
         Args:
@@ -57,10 +114,9 @@ class IrisLocalizationModel:
         """
 
         # Preprocess the image before sending to the network.
+        # the preprocessed image is already float32, it only needs the batch dimension
         image, M = self._preprocess(image, length, center, name)
-
-        image = tf.image.convert_image_dtype(image, tf.float32)
-        image = image[tf.newaxis, :]
+        image = image[np.newaxis]
 
         # The actual detection.
         self.interpreter.set_tensor(self.input_details[0]["index"], image)
@@ -76,6 +132,44 @@ class IrisLocalizationModel:
 
         return iris @ iM.T
 
+    def get_meshes(self, image, lengths, centers):
+        """Detect the iris landmarks for both eyes with a single invoke.
+        Args:
+            image: An image in default BGR format.
+            lengths: The widths of both eyes.
+            centers: The centers of both eyes.
+
+        Returns:
+            irises: The iris landmarks of both eyes (in the same order as the given eyes).
+        """
+        if self.batch_interpreter is None and self.__batch_supported:
+            self.batch_interpreter = self._create_batch_interpreter(len(lengths))
+            self.__batch_supported = self.batch_interpreter is not None
+
+        if not self.__batch_supported:
+            return [self.get_mesh(image, length, center) for length, center in zip(lengths, centers)]
+
+        batch, transforms = [], []
+        for length, center in zip(lengths, centers):
+            eye_image, M = self._preprocess(image, length, center)
+            batch.append(eye_image)
+            transforms.append(M)
+
+        input_details = self.batch_interpreter.get_input_details()
+        output_details = self.batch_interpreter.get_output_details()
+        self.batch_interpreter.set_tensor(input_details[0]["index"], np.stack(batch))
+        self.batch_interpreter.invoke()
+        # the output layer of the model has a fixed batch dimension of 1, i.e. the landmarks of both eyes are
+        # concatenated in a single row
+        irises = self.batch_interpreter.get_tensor(output_details[1]["index"]).reshape(len(batch), -1)
+
+        results = []
+        for iris, M in zip(irises, transforms):
+            iris = iris.reshape(-1, 3)
+            iris[:, 2] = 1
+            results.append(iris @ cv2.invertAffineTransform(M).T)
+        return results
+
     @staticmethod
     def draw_pupil(iris, frame, annotations_on=False, color=(0, 0, 255), thickness=2):
         pupil = iris[0]
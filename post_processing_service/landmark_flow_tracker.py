@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+import cv2
+import numpy as np
+
+
+class LandmarkFlowTracker:
+    """
+    Propagates the face landmarks of the last frame to the current frame with sparse Lucas-Kanade optical flow so the
+    face detection and the alignment model don't have to run on every frame while the face is (almost) still.
+
+    `propagate()` returns None whenever the full model has to run again: if there is no keyframe yet, if the keyframe
+    interval is reached, if the frame size changed, if a landmark couldn't be tracked or its flow error is too high, or
+    if the head moved too much since the last frame. The landmarks of the full model are set as the new keyframe with
+    `set_keyframe()`.
+
+    The landmarks are propagated in image coordinates, so consecutive frames have to show the same view, i.e. full
+    frames of one video or webcam recording. Face crops with their own origin can't be used even if two of them have
+    the same size (only a different size is detected and forces a keyframe).
+
+    Args:
+        keyframe_interval: max. number of frames in a row whose landmarks are propagated
+        max_flow_error: max. mean flow error of the landmarks (the mean absolute intensity difference of the patches
+                        around the landmarks, see cv2.calcOpticalFlowPyrLK)
+        max_motion: max. median movement of the landmarks between two frames in pixels
+    """
+
+    def __init__(self, keyframe_interval=10, max_flow_error=8.0, max_motion=1.5, window_size=(15, 15), max_level=2):
+        self.keyframe_interval = keyframe_interval
+        self.max_flow_error = max_flow_error
+        self.max_motion = max_motion
+        self.__flow_params = dict(winSize=window_size, maxLevel=max_level,
+                                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+        self.processed_frames, self.propagated_frames = 0, 0
+        self.reset()
+
+    def reset(self):
+        self.__previous_gray = None
+        self.__previous_points = None
+        self.__keyframe_shape = None
+        self.__frames_since_keyframe = 0
+
+    def set_keyframe(self, gray_frame, landmarks):
+        """
+        Sets the landmarks the full model found in the given (grayscale) frame as the new starting point for the
+        propagation; the landmarks are copied.
+        """
+        self.__previous_gray = gray_frame
+        self.__keyframe_shape = gray_frame.shape
+        self.__previous_points = np.asarray(landmarks, dtype=np.float32)[:, :2].reshape(-1, 1, 2).copy()
+        self.__frames_since_keyframe = 0
+
+    def propagate(self, gray_frame):
+        """
+        Returns the propagated landmarks for the given (grayscale) frame or None if the full model has to run.
+        """
+        self.processed_frames += 1
+        if self.__previous_points is None or self.__frames_since_keyframe >= self.keyframe_interval:
+            return None
+        if gray_frame.shape != self.__keyframe_shape:
+            # the optical flow needs frames of the same size (and the landmarks wouldn't match the new frame anyway)
+            return None
+
+        next_points, status, error = cv2.calcOpticalFlowPyrLK(self.__previous_gray, gray_frame, self.__previous_points,
+                                                              None, **self.__flow_params)
+        if next_points is None or not status.all() or error.mean() > self.max_flow_error:
+            return None
+
+        motion = np.median(np.linalg.norm((next_points - self.__previous_points).reshape(-1, 2), axis=1))
+        if motion > self.max_motion:
+            return None
+
+        self.__previous_gray = gray_frame
+        self.__previous_points = next_points
+        self.__frames_since_keyframe += 1
+        self.propagated_frames += 1
+        return next_points.reshape(-1, 2).astype(np.float64)
+
+    @property
+    def skip_fraction(self):
+        """
+        The fraction of the processed frames whose landmarks were propagated instead of predicted.
+        """
+        return self.propagated_frames / self.processed_frames if self.processed_frames > 0 else 0.0
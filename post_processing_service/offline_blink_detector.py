@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Offline version of the BlinkDetector for the landmarks of a whole difficulty (e.g. from the landmark cache of the
+EyeTracker): the eye aspect ratios of all frames are calculated at once and the blinks are found with array operations
+instead of the per-frame state machine of `BlinkDetector.detect_blinks()`. The metrics are the same as the ones of
+`BlinkDetector.get_blink_metrics()`, so different values for diff_threshold can be tried on the same eye aspect ratios
+without running the EyeTracker again.
+
+Usage:
+    eye_aspect_ratios = get_eye_aspect_ratios(LandmarkCache.load(cache_path).get_values("landmarks"))
+    blink_metrics = get_blink_metrics(eye_aspect_ratios, fps, diff_threshold=0.04)
+"""
+
+from bisect import bisect_right
+import numpy as np
+from post_processing.eye_tracking.image_utils import EYE_BOUND, eye_aspect_ratios
+from post_processing_service.blink_detector import BlinkDetector
+
+# the classes of the frames, depending on the EAR change to the previous frame
+NEUTRAL_FRAME = 0
+CLOSING_FRAME = 1
+OPENING_FRAME = 2
+
+
+def get_eye_aspect_ratios(landmarks):
+    """
+    Returns the average EAR of both eyes for every face in the landmark array with the shape (num_faces, 106, 2); the
+    same value the EyeTracker passes to the BlinkDetector.
+    """
+    eye_markers = np.take(landmarks, EYE_BOUND, axis=1)
+    return eye_aspect_ratios(eye_markers).mean(axis=1)
+
+
+def classify_frames(eye_aspect_ratios, diff_threshold=0.045):
+    """
+    Compares every frame with the previous one: the eye is closing if the EAR got smaller by more than diff_threshold,
+    opening if it got larger by more than diff_threshold and otherwise the frame is neutral. The first frame has no
+    previous frame and is always neutral.
+    """
+    ratio_differences = eye_aspect_ratios[:-1] - eye_aspect_ratios[1:]
+    frame_classes = np.full(len(eye_aspect_ratios), NEUTRAL_FRAME, dtype=np.int8)
+    frame_classes[1:][-ratio_differences > diff_threshold] = OPENING_FRAME
+    frame_classes[1:][ratio_differences > diff_threshold] = CLOSING_FRAME
+    return frame_classes
+
+
+def find_blinks(eye_aspect_ratios, fps, diff_threshold=0.045):
+    """
+    Returns the frame indices of the blink onsets, the frame indices where the eyes opened again and the blink
+    durations in ms for the given eye aspect ratios of consecutive frames.
+
+    A blink onset is the first closing frame while no onset is active. From there on every frame is counted until
+    either an opening frame completes the blink or a neutral frame comes after more than the maximal blink duration and
+    discards the onset (closing frames are counted without a limit), exactly like in `BlinkDetector.detect_blinks()`.
+    The onsets therefore depend on each other, but only the few onsets have to be processed one after another.
+    """
+    frame_classes = classify_frames(np.asarray(eye_aspect_ratios, dtype=np.float64), diff_threshold)
+    # plain lists, as the onsets are searched one after another
+    closing_frames = np.flatnonzero(frame_classes == CLOSING_FRAME).tolist()
+    opening_frames = np.flatnonzero(frame_classes == OPENING_FRAME).tolist()
+    neutral_frames = np.flatnonzero(frame_classes == NEUTRAL_FRAME).tolist()
+    max_frame_count = int(round((BlinkDetector.BLINK_MAX_DURATION / 1000) * fps))
+
+    blink_onsets, blink_ends = [], []
+    onset_position = 0
+    while onset_position < len(closing_frames):
+        onset = closing_frames[onset_position]
+        # the number of counted frames before frame i is always i - onset
+        opening_position = bisect_right(opening_frames, onset)
+        timeout_position = bisect_right(neutral_frames, onset + max_frame_count)
+        opening = opening_frames[opening_position] if opening_position < len(opening_frames) else None
+        timeout = neutral_frames[timeout_position] if timeout_position < len(neutral_frames) else None
+
+        if opening is None and timeout is None:
+            # the onset is still active after the last frame
+            break
+        if timeout is None or (opening is not None and opening < timeout):
+            blink_onsets.append(onset)
+            blink_ends.append(opening)
+            onset_end = opening
+        else:
+            onset_end = timeout
+        # the next onset can only start after the current one is finished
+        onset_position = bisect_right(closing_frames, onset_end, lo=onset_position)
+
+    blink_onsets, blink_ends = np.array(blink_onsets, dtype=np.int64), np.array(blink_ends, dtype=np.int64)
+    blink_durations = (blink_ends - blink_onsets) * (1000 / fps)
+    return blink_onsets, blink_ends, blink_durations
+
+
+def get_blink_metrics(eye_aspect_ratios, fps, diff_threshold=0.045):
+    """
+    Returns the same metrics as `BlinkDetector.get_blink_metrics()` for the eye aspect ratios of a whole difficulty.
+    The min. and max. aspect ratio ignore NaN values (e.g. of degenerate landmarks) like the per-frame version does
+    (as long as the first frame isn't NaN), the average is NaN in both versions.
+    """
+    eye_aspect_ratios = np.asarray(eye_aspect_ratios, dtype=np.float64)
+    _, _, blink_durations = find_blinks(eye_aspect_ratios, fps, diff_threshold)
+
+    duration_in_minutes = (len(eye_aspect_ratios) / fps) / 60
+    blinks_per_minute = len(blink_durations) / duration_in_minutes
+    return {"total_blinks": len(blink_durations),
+            "avg_blinks_per_minute": blinks_per_minute,
+            "min_aspect_ratio": np.nanmin(eye_aspect_ratios) if len(eye_aspect_ratios) > 0 else 0,
+            "max_aspect_ratio": np.nanmax(eye_aspect_ratios) if len(eye_aspect_ratios) > 0 else 0,
+            "avg_aspect_ratio": np.mean(eye_aspect_ratios) if len(eye_aspect_ratios) > 0 else 0,
+            "min_blink_duration_in_ms": blink_durations.min() if len(blink_durations) > 0 else 0,
+            "max_blink_duration_in_ms": blink_durations.max() if len(blink_durations) > 0 else 0,
+            "avg_blink_duration_in_ms": np.mean(blink_durations) if len(blink_durations) > 0 else 0,
+            }
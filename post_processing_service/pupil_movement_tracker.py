@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+import os
+import numpy as np
+import pandas as pd
+from machine_learning_predictor.feature_extraction.pupil_movement_calculation import PUPIL_MOVEMENT_COLUMNS
+
+
+class PupilMovementTracker:
+    """
+    Calculates the pupil movement features of the PupilMovementCalculation frame by frame while the eye features are
+    extracted, so the pupil_movement_* files can be written directly instead of saving, loading and parsing the eye
+    movement data again. Every frame is compared with the previous frame of the same difficulty (the first frame has no
+    movement), the results are the same as `calculate_pupil_movement_data()` up to floating-point rounding.
+    """
+
+    def __init__(self):
+        self.__reset()
+
+    def __reset(self):
+        self.__rows = []
+        self.__last_relative_positions = None
+        self.__last_time_stamp = None
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def add_frame(self, left_pupil_position, right_pupil_position, left_eye_position, right_eye_position,
+                  left_eye_size_x, left_eye_size_y, right_eye_size_x, right_eye_size_y, difficulty, participant,
+                  timestamp):
+        # the pupil positions relative to the eye positions (left x, left y, right x, right y)
+        relative_positions = np.subtract((*left_pupil_position, *right_pupil_position),
+                                         (*left_eye_position, *right_eye_position), dtype=np.float64)
+        time_stamp = int(timestamp)
+
+        if self.__last_relative_positions is None:
+            # For the first row we add empty values
+            movement_features = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0)
+        else:
+            # the change of the pupil position relative to the eye position, normalized to the current eye size
+            with np.errstate(invalid="ignore", divide="ignore"):
+                movement = (self.__last_relative_positions - relative_positions) / np.array(
+                    (left_eye_size_x, left_eye_size_y, right_eye_size_x, right_eye_size_y), dtype=np.float64)
+            left_movement_x, left_movement_y, right_movement_x, right_movement_y = movement.tolist()
+            movement_features = (left_movement_x, left_movement_y, right_movement_x, right_movement_y,
+                                 *self.__get_average_movement_features(left_movement_x, left_movement_y,
+                                                                       right_movement_x, right_movement_y),
+                                 time_stamp - self.__last_time_stamp)
+
+        self.__rows.append((participant, difficulty, *movement_features, time_stamp))
+        self.__last_relative_positions = relative_positions
+        self.__last_time_stamp = time_stamp
+
+    @staticmethod
+    def __get_average_movement_features(left_movement_x, left_movement_y, right_movement_x, right_movement_y):
+        average_movement_x = (right_movement_x + left_movement_x) / 2
+        average_movement_y = (right_movement_y + left_movement_y) / 2
+        average_movement_distance = np.sqrt(average_movement_x ** 2 + average_movement_y ** 2)
+
+        # angle between the average movement and the x axis; 0 if there was no movement
+        with np.errstate(invalid="ignore", divide="ignore"):
+            movement_angle = float(np.arccos(np.float64(average_movement_x) / average_movement_distance))
+        if np.isnan(movement_angle):
+            movement_angle = 0.0
+
+        # Check if it was a strong movement and if the direction changed by more than 90° and less than 270°
+        direction_change = int(90 < movement_angle < 270)
+        strong_movement = int(average_movement_distance > 0.02)
+        return (average_movement_x, average_movement_y, float(average_movement_distance), movement_angle,
+                strong_movement, direction_change)
+
+    def get_data_frame(self):
+        """
+        The pupil movement data of the current difficulty with the PUPIL_MOVEMENT_COLUMNS.
+        """
+        return pd.DataFrame(self.__rows, columns=PUPIL_MOVEMENT_COLUMNS)
+
+    def save_data(self, participant, difficulty, evaluation_study_data: bool):
+        """
+        Saves the pupil movement data of the current difficulty in the same format as the PupilMovementCalculation and
+        starts with the next difficulty.
+        """
+        data_folder = os.path.join(os.path.dirname(__file__), "..", "machine_learning_predictor", "feature_extraction",
+                                   "data")
+        if evaluation_study_data:
+            output_folder = os.path.join(data_folder, "evaluation_pupil_movement_data")
+        else:
+            output_folder = os.path.join(data_folder, "pupil_movement_data")
+
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+        if len(self.__rows) == 0:
+            print(f"[WARNING] No frames for the pupil movement of {participant} ({difficulty})!")
+        else:
+            pupil_movement_path = os.path.join(output_folder, f"pupil_movement_{participant}_{difficulty}.csv")
+            self.get_data_frame().to_csv(pupil_movement_path)
+        self.__reset()
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+from post_processing_service.landmark_flow_tracker import LandmarkFlowTracker
+
+
+def create_frame(height, width, seed=0):
+    random_generator = np.random.default_rng(seed)
+    frame = random_generator.integers(0, 255, (height, width), dtype=np.uint8)
+    return cv2.GaussianBlur(frame, (5, 5), 0)
+
+
+def create_landmarks(height, width):
+    grid_x, grid_y = np.meshgrid(np.linspace(0.3, 0.7, 8) * width, np.linspace(0.3, 0.7, 8) * height)
+    return np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+
+
+def test_same_frame_is_propagated():
+    flow_tracker = LandmarkFlowTracker()
+    frame = create_frame(120, 100)
+    landmarks = create_landmarks(120, 100)
+    flow_tracker.set_keyframe(frame, landmarks)
+
+    propagated_landmarks = flow_tracker.propagate(frame.copy())
+    assert propagated_landmarks is not None
+    np.testing.assert_allclose(propagated_landmarks, landmarks, atol=0.1)
+
+
+def test_frames_of_different_size_force_a_keyframe():
+    flow_tracker = LandmarkFlowTracker()
+    frame = create_frame(120, 100)
+    flow_tracker.set_keyframe(frame, create_landmarks(120, 100))
+
+    for height, width in [(130, 100), (120, 90), (64, 48)]:
+        # cv2.calcOpticalFlowPyrLK would raise an error for frames of different size
+        assert flow_tracker.propagate(create_frame(height, width)) is None
+
+    # after a new keyframe with the new size the landmarks are propagated again
+    smaller_frame = create_frame(64, 48, seed=1)
+    flow_tracker.set_keyframe(smaller_frame, create_landmarks(64, 48))
+    assert flow_tracker.propagate(smaller_frame.copy()) is not None
+    assert flow_tracker.propagate(frame) is None
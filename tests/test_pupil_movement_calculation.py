@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from machine_learning_predictor.feature_extraction.pupil_movement_calculation import calculate_file_pupil_movement
+from post_processing_service.gaze_movement_tracker import EYE_MOVEMENT_COLUMNS, NUMERIC_COLUMNS
+
+
+def test_empty_csv_file(tmp_path):
+    # the GazeMovementTracker writes a file with only the header if no face was found in any frame of a difficulty
+    eye_movement_path = tmp_path / "eye_movement_participant_1_easy.csv"
+    pd.DataFrame(columns=EYE_MOVEMENT_COLUMNS).to_csv(eye_movement_path, index=False)
+
+    assert calculate_file_pupil_movement(str(eye_movement_path), str(tmp_path)) == (None, 0)
+
+
+def test_empty_npz_file(tmp_path):
+    eye_movement_path = tmp_path / "eye_movement_participant_1_easy.csv"
+    pd.DataFrame(columns=EYE_MOVEMENT_COLUMNS).to_csv(eye_movement_path, index=False)
+    np.savez(tmp_path / "eye_movement_participant_1_easy.npz", participant="participant_1", difficulty="easy",
+             time_stamp=np.array([], dtype=np.int64), **{column: np.empty(0) for column in NUMERIC_COLUMNS})
+
+    assert calculate_file_pupil_movement(str(eye_movement_path), str(tmp_path)) == (None, 0)
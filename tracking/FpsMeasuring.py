@@ -1,5 +1,7 @@
 import datetime
 import time
+from collections import defaultdict
+from contextlib import contextmanager
 from functools import wraps
 
 
@@ -72,3 +74,58 @@ class FpsMeasurer:
             return
         fps_ideal = int(1000 / max_fps)
         print(f'* Capture FPS: {max_fps}; ideal wait time between frames: {fps_ideal} ms')
+
+
+class StageTimer:
+    """
+    Collects the durations of the single stages of a frame, e.g. to find out where the time of the post processing
+    goes.
+
+    Usage:
+        timer = StageTimer()
+        with timer.measure("face_detection"):
+            ...
+        print(timer.get_summary())
+    """
+
+    def __init__(self):
+        self._durations = defaultdict(list)
+
+    @contextmanager
+    def measure(self, stage):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._durations[stage].append(time.perf_counter() - start_time)
+
+    def time_iteration(self, stage, iterable):
+        """
+        Yields the elements of the given iterable and measures the time of every single step, e.g. for generators.
+        """
+        iterator = iter(iterable)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                element = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._durations[stage].append(time.perf_counter() - start_time)
+            yield element
+
+    def reset(self):
+        self._durations.clear()
+
+    def get_summary(self, num_frames=None):
+        """
+        Returns the number of calls, the total and the mean duration in ms for every stage (in the order the stages
+        were measured first). If num_frames is given, the time per frame is added as well.
+        """
+        summary = {}
+        for stage, durations in self._durations.items():
+            total_ms = sum(durations) * 1000
+            summary[stage] = {"calls": len(durations), "total_ms": total_ms, "mean_ms": total_ms / len(durations)}
+            if num_frames:
+                summary[stage]["ms_per_frame"] = total_ms / num_frames
+        return summary
@@ -0,0 +1,69 @@
+import os
+import sys
+import psutil
+
+# environment variables that control how many threads mxnet (and the openmp / mkl kernels it uses) starts
+INFERENCE_THREAD_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "MXNET_CPU_WORKER_NTHREADS"]
+
+
+class ResourceGovernor:
+    """
+    Limits the cpu resources the tracking can use so the tracking never starves the game the participants are playing
+    at the same time. By default nothing is restricted at all; every limit has to be set on purpose (see
+    `benchmarks/resource_governor_benchmark.py` to find out how much tracker fps a limit costs and how many game fps it
+    saves).
+
+    Args:
+        max_inference_threads: max. number of threads for the model inference (mxnet and tflite); None for no limit
+        cpu_cores: list of core indexes the whole tracking process is pinned to; None to use all cores
+        lower_priority: if True, the priority of the tracking process is set below normal
+    """
+
+    def __init__(self, max_inference_threads=None, cpu_cores=None, lower_priority=False):
+        self.max_inference_threads = max_inference_threads
+        self.cpu_cores = cpu_cores
+        self.lower_priority = lower_priority
+
+    def limit_inference_threads(self):
+        """
+        Sets the thread limits for mxnet. This MUST be called BEFORE mxnet is imported as the engine reads these
+        variables only once at startup!
+        """
+        if self.max_inference_threads is None:
+            return
+
+        if "mxnet" in sys.modules:
+            sys.stderr.write("[WARNING] mxnet has already been imported, the inference thread limit won't have any "
+                             "effect on it!\n")
+
+        for variable in INFERENCE_THREAD_VARIABLES:
+            os.environ[variable] = str(self.max_inference_threads)
+
+    def restrict_process(self, process: psutil.Process = None):
+        """
+        Pins the given process (the current one per default) to the selected cores and lowers its priority if enabled.
+        Both settings apply to all threads of the process, i.e. the gui and the upload threads as well.
+        """
+        process = process if process is not None else psutil.Process()
+
+        if self.cpu_cores is not None:
+            # cpu_affinity() isn't available on macOS
+            if hasattr(process, "cpu_affinity"):
+                available_cores = psutil.cpu_count(logical=True)
+                process.cpu_affinity([core for core in self.cpu_cores if core < available_cores])
+            else:
+                sys.stderr.write("[WARNING] Pinning the process to cpu cores isn't supported on this system!\n")
+
+        if self.lower_priority:
+            if sys.platform == "win32":
+                process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+            else:
+                process.nice(10)
+
+    def apply(self):
+        self.limit_inference_threads()
+        self.restrict_process()
+
+    def __repr__(self):
+        return f"ResourceGovernor(threads: {self.max_inference_threads}, cores: {self.cpu_cores}, " \
+               f"lower priority: {self.lower_priority})"
@@ -19,6 +19,7 @@ pyinstaller --noconfirm --onefile --windowed --add-data "C:/Users/Michael/AppDat
 """
 
 import math
+import multiprocessing
 import platform
 import sys
 import threading
@@ -35,8 +36,30 @@ from gpuinfo.windows import get_gpus as get_amd  # pip install gpu-info
 from gpuinfo.nvidia import get_gpus as get_nvidia
 from plyer import notification
 from FpsMeasuring import FpsMeasurer
+from ResourceGovernor import ResourceGovernor
 from TrackingLogger import Logger as TrackingLogger
 from TrackingLogger import TrackingData, get_timestamp
+
+# Resource limits for the tracking so it doesn't take away too much cpu time from the game; None / False means no
+# limit. The cores are given as a list of core indexes, e.g. [2, 3].
+# Use benchmarks/resource_governor_benchmark.py to see how these settings affect the tracker and the game fps.
+INFERENCE_THREADS = None
+TRACKING_CPU_CORES = None
+LOWER_PROCESS_PRIORITY = False
+
+# If enabled, the face detection runs in a separate process and the frames are shared with it via shared memory, so the
+# detection doesn't compete with the gui, the image saving and the upload threads for the GIL.
+USE_DETECTION_PROCESS = False
+
+# the frame size of the webcam (height, width); the anchors of the face detector are prepared (and stored next to the
+# weights) for this size, other sizes still work but the anchors are generated when the first frame comes in
+WEBCAM_FRAME_SHAPE = (480, 640)
+
+resource_governor = ResourceGovernor(INFERENCE_THREADS, TRACKING_CPU_CORES, LOWER_PROCESS_PRIORITY)
+# the thread limits must be set BEFORE mxnet is imported with the face detector below!
+resource_governor.limit_inference_threads()
+
+from tracking_service.detection_worker import DetectionWorker, get_detection_input_shape
 from tracking_service.face_detector import MxnetDetectionModel
 from tracking_utils import find_face_mxnet_resized
 # import keyboard  # for hotkeys
@@ -84,7 +107,14 @@ class TrackingSystem(QtWidgets.QWidget):
             folder = Path(__file__).parent
             data_path = folder / '../weights/16and32'
 
-        self.face_detector = MxnetDetectionModel(data_path, 0, .6, gpu=-1)
+        self.__model_path = data_path
+        self.detection_worker = None
+        if not USE_DETECTION_PROCESS:
+            # otherwise the model is loaded in the detection process when the tracking starts
+            # the frames are resized before the detection in find_face_mxnet_resized()
+            self.face_detector = MxnetDetectionModel(data_path, 0, .6, gpu=-1,
+                                                     input_shapes=[get_detection_input_shape(WEBCAM_FRAME_SHAPE)],
+                                                     persist_anchors=True)
 
     def __setup_gui(self):
         self.layout = QtWidgets.QVBoxLayout()  # set base layout (vertically aligned box)
@@ -382,6 +412,23 @@ class TrackingSystem(QtWidgets.QWidget):
         self.__cleanup_webcam_capture()
 
     def __process_frame(self, frame: np.ndarray) -> np.ndarray:
+        if USE_DETECTION_PROCESS:
+            # the shared memory of the detection process is sized from the frames the camera actually delivers (which
+            # don't always have the size the capture properties report)
+            if self.detection_worker is not None and frame.shape != self.detection_worker.frame_shape:
+                print(f"[WARNING] The frame size changed from {self.detection_worker.frame_shape} to {frame.shape}; "
+                      f"restarting the detection process!")
+                self.__stop_detection_worker()
+            if self.detection_worker is None:
+                self.detection_worker = DetectionWorker(self.__model_path, frame.shape)
+                self.detection_worker.start()
+
+            # use the capture time as timestamp as the face is found asynchronously
+            self.detection_worker.submit(frame, get_timestamp())
+            for log_timestamp, face_image in self.detection_worker.get_faces():
+                self.logger.add_image_to_queue("capture", face_image, log_timestamp)
+            return frame
+
         face_image = find_face_mxnet_resized(self.face_detector, frame, show_result=True if self.__debug else False)
 
         if face_image is not None:
@@ -395,6 +442,15 @@ class TrackingSystem(QtWidgets.QWidget):
         self.capture.release()
         cv2.destroyAllWindows()
 
+        self.__stop_detection_worker()
+
+    def __stop_detection_worker(self):
+        if self.detection_worker is not None:
+            # save the faces of the last frames that were still processed when the detection process was stopped
+            for log_timestamp, face_image in self.detection_worker.stop():
+                self.logger.add_image_to_queue("capture", face_image, log_timestamp)
+            self.detection_worker = None
+
     def __log_system_data(self):
         # get the dimensions of the webcam
         video_width, video_height = self.__get_stream_dimensions()
@@ -547,6 +603,9 @@ def find_attached_cameras():
 
 
 def main():
+    # pin the process to the selected cores and lower its priority (if enabled)
+    resource_governor.restrict_process()
+
     app = QApplication(sys.argv)
     tracking_system = TrackingSystem()
     tracking_system.show()
@@ -555,4 +614,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # necessary for the detection process in the frozen exe, see
+    # https://docs.python.org/3/library/multiprocessing.html#multiprocessing.freeze_support
+    multiprocessing.freeze_support()
     main()
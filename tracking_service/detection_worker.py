@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Runs the face detection in a separate process so it doesn't compete for the GIL with the gui, the png encoding and
+the upload threads of the tracking system.
+
+The frames are copied into a ring buffer in shared memory (so they don't have to be pickled) and only the slot index
+is sent to the detection process, which answers with the face box for the frame in that slot. The slot stays reserved
+until the face region has been cropped from it in the main process.
+"""
+
+import multiprocessing
+import sys
+from collections import deque
+from multiprocessing import shared_memory
+from queue import Empty
+import cv2
+import numpy as np
+from tracking_service.face_detector import MxnetDetectionModel
+
+WORKER_READY = "ready"
+
+
+class SharedFrameRingBuffer:
+    def __init__(self, frame_shape, num_slots, name=None):
+        """
+        Creates a new shared memory block for num_slots frames if no name is given, otherwise the existing block with
+        the given name is attached.
+        """
+        frame_bytes = int(np.prod(frame_shape))
+        self.__is_owner = name is None
+        self.__memory = shared_memory.SharedMemory(name=name, create=self.__is_owner, size=num_slots * frame_bytes)
+        self.frames = np.ndarray((num_slots, *frame_shape), dtype=np.uint8, buffer=self.__memory.buf)
+
+    @property
+    def name(self):
+        return self.__memory.name
+
+    def close(self):
+        del self.frames  # the numpy view must be released before the memory can be closed
+        self.__memory.close()
+        if self.__is_owner:
+            self.__memory.unlink()
+
+
+def find_face_box(face_detector, frame, scale_factor=0.5):
+    """
+    The same as `find_face_mxnet_resized()` in tracking_utils but returns the box of the first face (in the
+    coordinates of the original frame) instead of the face region.
+    """
+    frame_small = cv2.resize(frame, (0, 0), fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_AREA)
+    scale_height = frame.shape[0] / (frame.shape[0] * scale_factor)
+    scale_width = frame.shape[1] / (frame.shape[1] * scale_factor)
+
+    for face in face_detector.detect(frame_small):
+        # take only the first face (in most cases there should be only one anyway)
+        return face[0] * scale_width, face[1] * scale_height, face[2] * scale_width, face[3] * scale_height
+    return None
+
+
+def get_detection_input_shape(frame_shape, scale_factor=0.5):
+    """
+    The (height, width) of the images the face detector gets from `find_face_box()` for frames of the given shape.
+    """
+    frame_small = cv2.resize(np.zeros(frame_shape[:2], dtype=np.uint8), (0, 0), fx=scale_factor, fy=scale_factor,
+                             interpolation=cv2.INTER_AREA)
+    return frame_small.shape[:2]
+
+
+def crop_face_region(image, x_start, y_start, x_end, y_end, padding=5):
+    # copy of `extract_image_region()` in tracking_utils as the tracking folder isn't bundled as a package in the exe
+    startX = max(0, x_start - padding)
+    startY = max(0, y_start - padding)
+    endX = min(x_end + padding, image.shape[1])
+    endY = min(y_end + padding, image.shape[0])
+    return image[int(round(startY)): int(round(endY)), int(round(startX)): int(round(endX))]
+
+
+def run_detection_worker(memory_name, frame_shape, num_slots, model_prefix, scale, resize_factor, request_queue,
+                         result_queue):
+    """
+    Entry point of the detection process; runs until None is put into the request queue.
+    """
+    ring_buffer = SharedFrameRingBuffer(frame_shape, num_slots, name=memory_name)
+    face_detector = MxnetDetectionModel(model_prefix, 0, scale, gpu=-1,
+                                        input_shapes=[get_detection_input_shape(frame_shape, resize_factor)],
+                                        persist_anchors=True)
+    result_queue.put(WORKER_READY)
+
+    for slot, frame_id in iter(request_queue.get, None):
+        face_box = find_face_box(face_detector, ring_buffer.frames[slot], resize_factor)
+        result_queue.put((slot, frame_id, face_box))
+
+    ring_buffer.close()
+
+
+class DetectionWorker:
+    """
+    Main process side of the detection process.
+
+    Usage:
+        worker = DetectionWorker(model_path, frame_shape=(480, 640, 3))
+        worker.start()
+        worker.submit(frame, timestamp)
+        for timestamp, face_region in worker.get_faces():
+            ...
+        remaining_faces = worker.stop()
+    """
+
+    def __init__(self, model_prefix, frame_shape, scale=.6, resize_factor=0.5, num_slots=4):
+        self.frame_shape = tuple(frame_shape)
+        self.__num_slots = num_slots
+        self.__ring_buffer = SharedFrameRingBuffer(self.frame_shape, num_slots)
+        self.__free_slots = deque(range(num_slots))
+        self.dropped_frames = 0
+
+        # spawn instead of fork on all systems, forking a process with an initialized mxnet engine isn't safe
+        context = multiprocessing.get_context("spawn")
+        self.__request_queue = context.Queue()
+        self.__result_queue = context.Queue()
+        self.__process = context.Process(target=run_detection_worker, name="DetectionWorker", daemon=True,
+                                         args=(self.__ring_buffer.name, self.frame_shape, num_slots, f"{model_prefix}",
+                                               scale, resize_factor, self.__request_queue, self.__result_queue))
+
+    def start(self):
+        self.__process.start()
+        # wait until the model has been loaded in the worker process
+        if self.__result_queue.get() != WORKER_READY:
+            raise RuntimeError("Detection worker couldn't be started!")
+
+    def submit(self, frame: np.ndarray, frame_id) -> bool:
+        """
+        Copies the frame into a free slot of the ring buffer and queues it for the detection. If all slots are still
+        in use (i.e. the detection is slower than the capture) the frame is dropped and False is returned.
+        """
+        if len(self.__free_slots) == 0:
+            self.dropped_frames += 1
+            return False
+
+        slot = self.__free_slots.popleft()
+        np.copyto(self.__ring_buffer.frames[slot], frame)
+        self.__request_queue.put((slot, frame_id))
+        return True
+
+    @property
+    def pending_frames(self):
+        return self.__num_slots - len(self.__free_slots)
+
+    def get_faces(self, timeout=None):
+        """
+        Yields (frame_id, face_region) for all finished detections; frames without a face are skipped. Without a
+        timeout only the results that are already available are returned, otherwise the first result is awaited for
+        at most timeout seconds.
+        """
+        block = timeout is not None
+        while self.pending_frames > 0:
+            try:
+                if block:
+                    slot, frame_id, face_box = self.__result_queue.get(timeout=timeout)
+                    block = False
+                else:
+                    slot, frame_id, face_box = self.__result_queue.get_nowait()
+            except Empty:
+                return
+
+            # copy the face region as the slot can be overwritten by the next frame as soon as it is released
+            face_region = crop_face_region(self.__ring_buffer.frames[slot], *face_box).copy() \
+                if face_box is not None else None
+            self.__free_slots.append(slot)
+
+            if face_region is not None:
+                yield frame_id, face_region
+
+    def stop(self, timeout=1):
+        """
+        Waits (at most timeout seconds per frame) until the outstanding frames have been processed, stops the
+        detection process and returns the faces of these last frames.
+        """
+        remaining_faces = []
+        while self.pending_frames > 0:
+            pending_before = self.pending_frames
+            remaining_faces.extend(self.get_faces(timeout))
+            if self.pending_frames == pending_before:
+                break  # no result arrived in time
+
+        self.__request_queue.put(None)
+        self.__process.join(timeout=5)
+        if self.__process.is_alive():
+            sys.stderr.write("Detection worker didn't stop in time and is terminated!")
+            self.__process.terminate()
+        self.__ring_buffer.close()
+        return remaining_faces
@@ -8,6 +8,7 @@ from queue import Queue, Full
 from numpy import frombuffer, uint8, concatenate, float32, maximum, minimum, prod
 from mxnet.ndarray import waitall, concat
 from functools import partial
+from collections import OrderedDict
 from threading import Thread
 import os
 import sys
@@ -15,6 +16,14 @@ import sys
 sys.path.append(os.path.dirname(__file__))
 from generate_anchor import generate_anchors_fpn, nonlinear_pred, generate_runtime_anchors
 
+# appended to the model prefix for the post-training quantized (int8) weights of the detection and the alignment
+# model (see weights/quantize_models.py)
+QUANTIZED_SUFFIX = "-int8"
+# appended to the model prefix for the file with the persisted anchor grids
+ANCHORS_SUFFIX = "-anchors.npz"
+# number of image sizes that weren't prepared with `input_shapes` whose anchors are kept in memory
+MAX_CACHED_SIZES = 4
+
 
 class BaseDetection:
     def __init__(self, *, thd, gpu, margin, nms_thd, verbose):
@@ -109,7 +118,16 @@ class BaseDetection:
 
 class MxnetDetectionModel(BaseDetection):
     def __init__(self, prefix, epoch, scale=1., gpu=-1, thd=0.6, margin=0,
-                 nms_thd=0.4, verbose=False):
+                 nms_thd=0.4, verbose=False, quantized=False, input_shapes=None,
+                 persist_anchors=False):
+        """
+        input_shapes: list of (height, width) of the images that will be passed
+            to `detect()`; the anchor grids for these are generated right away
+            and kept, so the first frame doesn't have to build them. The grids
+            of other sizes are only cached for the last MAX_CACHED_SIZES sizes.
+        persist_anchors: if True, the anchor grids of the input_shapes are
+            stored next to the weights and loaded from there the next time.
+        """
 
         super().__init__(thd=thd, gpu=gpu, margin=margin,
                          nms_thd=nms_thd, verbose=verbose)
@@ -120,11 +138,27 @@ class MxnetDetectionModel(BaseDetection):
 
         self._ctx = mx.cpu() if self.device < 0 else mx.gpu(self.device)
         self._fpn_anchors = generate_anchors_fpn()
+        # the anchors of the prepared input shapes, these are never removed
         self._runtime_anchors = {}
-
+        # the concatenated anchors of all fpn levels per feature map sizes
+        self._image_anchors = {}
+        # least recently used anchors of all other sizes
+        self._cached_runtime_anchors = OrderedDict()
+        self._cached_image_anchors = OrderedDict()
+
+        # the anchors only depend on the network architecture, so the float
+        # and the int8 model can share the same file
+        self._anchors_path = f"{prefix}{ANCHORS_SUFFIX}" if persist_anchors else None
+
+        # the int8 version of the model is created with `weights/quantize_models.py`
+        if quantized:
+            prefix = f"{prefix}{QUANTIZED_SUFFIX}"
         self.model = self._load_model(prefix, epoch)
         self.exec_group = self.model._exec_group
 
+        if input_shapes:
+            self.prepare_input_shapes(input_shapes)
+
     def _load_model(self, prefix, epoch):
         sym, arg_params, aux_params = mx.model.load_checkpoint(prefix, epoch)
         model = mx.mod.Module(sym, context=self._ctx, label_names=None)
@@ -133,12 +167,107 @@ class MxnetDetectionModel(BaseDetection):
         model.set_params(arg_params, aux_params)
         return model
 
-    def _get_runtime_anchors(self, height, width, stride, base_anchors):
-        key = height, width, stride
-        if key not in self._runtime_anchors:
-            self._runtime_anchors[key] = generate_runtime_anchors(
-                height, width, stride, base_anchors).reshape((-1, 4))
-        return self._runtime_anchors[key]
+    def prepare_input_shapes(self, input_shapes):
+        """
+        Generates the anchor grids for images with the given (height, width)
+        and reshapes the executor for the first of them.
+        """
+        stored_anchors = self._load_anchors() if self._anchors_path is not None else {}
+        new_anchors = False
+        for height, width in input_shapes:
+            # use the same resize as in `_retina_forward` so the sizes match exactly
+            rescaled = self._rescale(np.zeros((height, width, 3), dtype=uint8))
+            data_shape = (1, 3, *rescaled.shape[:2])
+            _, output_shapes, _ = self.model.symbol.infer_shape(data=data_shape)
+
+            # the outputs alternate between scores and deltas for every fpn level
+            feature_sizes = tuple(shape[2:4] for shape in output_shapes[1::2])
+            for fpn, (feature_height, feature_width) in zip(self._fpn_anchors, feature_sizes):
+                key = feature_height, feature_width, fpn.stride
+                if key in stored_anchors:
+                    self._runtime_anchors[key] = stored_anchors[key]
+                new_anchors |= key not in stored_anchors
+                self._get_runtime_anchors(*key, fpn.base_anchors, prepare=True)
+            self._get_image_anchors(feature_sizes, prepare=True)
+
+        if new_anchors and self._anchors_path is not None:
+            self._save_anchors()
+
+        height, width = input_shapes[0]
+        rescaled = self._rescale(np.zeros((height, width, 3), dtype=uint8))
+        self.exec_group.reshape([mx.io.DataDesc('data', (1, 3, *rescaled.shape[:2]))], None)
+
+    def _load_anchors(self):
+        if not os.path.exists(self._anchors_path):
+            return {}
+        try:
+            stored_anchors = {}
+            with np.load(self._anchors_path) as anchors_file:
+                for name in anchors_file.files:
+                    key = tuple(int(value) for value in name.split("_"))
+                    stored_anchors[key] = np.ascontiguousarray(anchors_file[name], dtype=float32)
+        except Exception as e:
+            # e.g. a file of an older version; the anchors are simply generated again
+            sys.stderr.write(f"Couldn't load the anchors from {self._anchors_path}: {e}\n")
+            return {}
+        return stored_anchors
+
+    def _save_anchors(self):
+        """
+        Only called from `prepare_input_shapes()`, so the file only contains
+        the anchors of the prepared sizes. It is written under a temporary name
+        first and then replaced, so other processes never load a partially
+        written file.
+        """
+        stored_anchors = {"_".join(map(str, key)): anchors for key, anchors in self._runtime_anchors.items()}
+        temp_path = f"{self._anchors_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as anchors_file:
+                np.savez(anchors_file, **stored_anchors)
+            os.replace(temp_path, self._anchors_path)
+        except OSError as e:
+            sys.stderr.write(f"Couldn't store the anchors at {self._anchors_path}: {e}\n")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _get_cached(prepared, cached, key, create, prepare, max_size):
+        """
+        Returns the entry for key from the prepared or the cached entries or
+        creates it. New entries are kept permanently if prepare is True, all
+        others only while they are among the last max_size used ones.
+        """
+        if key in prepared:
+            return prepared[key]
+        value = cached.pop(key, None)
+        if value is None:
+            value = create()
+        if prepare:
+            prepared[key] = value
+        else:
+            cached[key] = value
+            while len(cached) > max_size:
+                cached.popitem(last=False)
+        return value
+
+    def _get_runtime_anchors(self, height, width, stride, base_anchors, prepare=False):
+        return self._get_cached(
+            self._runtime_anchors, self._cached_runtime_anchors, (height, width, stride),
+            lambda: np.ascontiguousarray(generate_runtime_anchors(
+                height, width, stride, base_anchors).reshape((-1, 4)), dtype=float32),
+            prepare, MAX_CACHED_SIZES * len(self._fpn_anchors))
+
+    def _get_image_anchors(self, feature_sizes, prepare=False):
+        """
+        Returns the anchors of all fpn levels in one array so they don't have
+        to be concatenated again for every frame.
+        """
+        return self._get_cached(
+            self._image_anchors, self._cached_image_anchors, feature_sizes,
+            lambda: concatenate([
+                self._get_runtime_anchors(height, width, fpn.stride, fpn.base_anchors, prepare)
+                for fpn, (height, width) in zip(self._fpn_anchors, feature_sizes)]),
+            prepare, MAX_CACHED_SIZES)
 
     def _retina_detach(self, out):
         """ ##### Author 1996scarlet@gmail.com
@@ -174,7 +303,7 @@ class MxnetDetectionModel(BaseDetection):
         return deltas
 
     def _retina_solve(self):
-        out, res, anchors = iter(self.exec_group.execs[0].outputs), [], []
+        out, res, feature_sizes = iter(self.exec_group.execs[0].outputs), [], []
 
         for fpn in self._fpn_anchors:
             scores = next(out)[:, -fpn.scales_shape:, :, :].transpose((0, 2, 3, 1))
@@ -183,11 +312,9 @@ class MxnetDetectionModel(BaseDetection):
             res.append(concat(deltas.reshape((-1, 4)),
                               scores.reshape((-1, 1)), dim=1))
 
-            anchors.append(self._get_runtime_anchors(*deltas.shape[1:3],
-                                                     fpn.stride,
-                                                     fpn.base_anchors))
+            feature_sizes.append(tuple(deltas.shape[1:3]))
 
-        return concat(*res, dim=0), concatenate(anchors)
+        return concat(*res, dim=0), self._get_image_anchors(tuple(feature_sizes))
 
     def _retina_forward(self, src):
         """ ##### Author 1996scarlet@gmail.com
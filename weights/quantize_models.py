@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+
+"""
+Post-training int8 quantization of the mxnet face detector (`16and32`) and the 106-point face alignment model
+(`2d106det`) with mxnet's quantization toolkit.
+
+The scaling factors of the quantized layers are calibrated with stored face frames (e.g. the extracted images of some
+participants), so the calibration data has the same distribution as the data the models see during tracking.
+The quantized models are saved next to the float models with the suffix '-int8' and can be loaded with
+`MxnetDetectionModel(..., quantized=True)` and `CoordinateAlignmentModel(..., quantized=True)`.
+
+Quantized models on the cpu need an mxnet build with MKLDNN support (which is the default for the pip packages of
+mxnet 1.7). The accuracy of the quantized models should always be checked with `benchmarks/quantization_report.py`.
+
+Usage (from the repository root):
+    python -m weights.quantize_models --frames path/to/frames --model all
+"""
+
+import argparse
+import pathlib
+import sys
+import cv2
+import mxnet as mx
+import numpy as np
+from mxnet.contrib.quantization import quantize_model, quantize_model_mkldnn
+from benchmarks.benchmark_utils import load_frames
+from post_processing_service.face_alignment import CoordinateAlignmentModel
+from tracking_service.face_detector import MxnetDetectionModel, QUANTIZED_SUFFIX
+
+weights_path = pathlib.Path(__file__).parent
+DETECTOR_PREFIX = f"{weights_path / '16and32'}"
+ALIGNMENT_PREFIX = f"{weights_path / '2d106det'}"
+
+# The first convolution gets the raw (not normalized) image and the output layers directly produce the box deltas,
+# scores and landmark coordinates; keeping them in float32 costs almost nothing but keeps the outputs precise.
+EXCLUDED_LAYERS = {
+    "detector": ["mobilenet0_conv0_fwd", "face_rpn_cls_score_stride32", "face_rpn_bbox_pred_stride32",
+                 "face_rpn_cls_score_stride16", "face_rpn_bbox_pred_stride16"],
+    "alignment": ["conv_1_conv2d", "fc1"],
+}
+
+
+def get_detector_calibration_data(frames, scale):
+    """
+    Returns the frames exactly as the detector would feed them into the network (rescaled and in CHW format).
+    """
+    detector_input = []
+    frame_height, frame_width = frames[0].shape[:2]
+    for frame in frames:
+        # the calibration batches need the same shape, so frames with another size are resized first
+        if frame.shape[:2] != (frame_height, frame_width):
+            frame = cv2.resize(frame, (frame_width, frame_height))
+        rescaled = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        detector_input.append(rescaled.transpose((2, 0, 1)))
+
+    return np.stack(detector_input).astype(np.float32)
+
+
+def get_alignment_calibration_data(frames, face_detector, face_alignment):
+    """
+    Returns the warped face crops that the alignment model would get for the faces the (float) detector finds.
+    """
+    alignment_input = []
+    for frame in frames:
+        for bbox in face_detector.detect(frame):
+            inp, _ = face_alignment._preprocess(frame, bbox)
+            alignment_input.append(inp[0].copy())  # the input buffer is reused by the next call
+
+    if len(alignment_input) == 0:
+        sys.stderr.write("No faces were found in the calibration frames!")
+        sys.exit(1)
+
+    return np.stack(alignment_input).astype(np.float32)
+
+
+def quantize(prefix, epoch, calibration_data, excluded_layers, ctx, calib_mode="naive", batch_size=16):
+    sym, arg_params, aux_params = mx.model.load_checkpoint(prefix, epoch)
+    calib_iter = mx.io.NDArrayIter(data=calibration_data, batch_size=min(batch_size, len(calibration_data)),
+                                   data_name="data", last_batch_handle="discard")
+    num_calib_examples = (len(calibration_data) // calib_iter.batch_size) * calib_iter.batch_size
+
+    quantization_params = dict(arg_params=arg_params, aux_params=aux_params, ctx=ctx, label_names=None,
+                               excluded_sym_names=excluded_layers, calib_mode=calib_mode, calib_data=calib_iter,
+                               num_calib_examples=num_calib_examples, quantized_dtype="auto")
+
+    if ctx == mx.cpu():
+        # applies the MKLDNN_QUANTIZE backend pass (layer fusion) itself before and after the quantization
+        qsym, qarg_params, qaux_params = quantize_model_mkldnn(sym=sym, **quantization_params)
+    else:
+        qsym, qarg_params, qaux_params = quantize_model(sym=sym, **quantization_params)
+
+    mx.model.save_checkpoint(f"{prefix}{QUANTIZED_SUFFIX}", epoch, qsym, qarg_params, qaux_params)
+    print(f"[INFO] Saved quantized model to {prefix}{QUANTIZED_SUFFIX} (calibrated with {num_calib_examples} "
+          f"examples)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Creates int8 versions of the face detection and face alignment "
+                                                 "models with stored face frames as calibration data.")
+    parser.add_argument("-f", "--frames", help="folder with the frames used for the calibration", type=str,
+                        required=True)
+    parser.add_argument("-m", "--model", help="the model that should be quantized", type=str, default="all",
+                        choices=["detector", "alignment", "all"])
+    parser.add_argument("-n", "--num_frames", help="max. number of frames used for the calibration", type=int,
+                        default=500)
+    parser.add_argument("-s", "--scale", help="scale of the face detector", type=float, default=.6)
+    parser.add_argument("-c", "--calib_mode", help="how the thresholds of the quantized layers are determined",
+                        type=str, default="naive", choices=["naive", "entropy"])
+    parser.add_argument("-g", "--gpu", help="gpu index; -1 for the cpu", type=int, default=-1)
+    args = parser.parse_args()
+
+    ctx = mx.cpu() if args.gpu < 0 else mx.gpu(args.gpu)
+    frames = load_frames(args.frames, args.num_frames)
+    print(f"[INFO] Loaded {len(frames)} calibration frames from {args.frames}")
+
+    if args.model in ["detector", "all"]:
+        calibration_data = get_detector_calibration_data(frames, args.scale)
+        quantize(DETECTOR_PREFIX, 0, calibration_data, EXCLUDED_LAYERS["detector"], ctx, args.calib_mode)
+
+    if args.model in ["alignment", "all"]:
+        # the crops for the alignment model are always generated with the float detector
+        face_detector = MxnetDetectionModel(DETECTOR_PREFIX, 0, args.scale, gpu=args.gpu)
+        face_alignment = CoordinateAlignmentModel(ALIGNMENT_PREFIX, 0, gpu=args.gpu)
+        calibration_data = get_alignment_calibration_data(frames, face_detector, face_alignment)
+        quantize(ALIGNMENT_PREFIX, 0, calibration_data, EXCLUDED_LAYERS["alignment"], ctx, args.calib_mode)
+
+
+if __name__ == "__main__":
+    main()